@@ -0,0 +1,122 @@
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Q
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from account.fast_read import get_members_data
+from account.models import Group, Member
+from common.async_utils import database_sync_to_async, json_response
+
+NOT_AUTHENTICATED = {"detail": "Authentication credentials were not provided."}
+NOT_FOUND = {"detail": "Not found"}
+
+
+def get_request_user(request):
+    """
+    Authenticate the request like the DRF views do, with a JWT or the session.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        User: The authenticated user, or None.
+    """
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if result is not None:
+        return result[0]
+
+    user = getattr(request, "user", AnonymousUser())
+    return user if user.is_authenticated else None
+
+
+authenticate = database_sync_to_async(get_request_user)
+
+
+@database_sync_to_async
+def can_access_group(user, group_id):
+    """
+    Check if the user owns or is a member of the group.
+
+    Args:
+        user (User): The authenticated user.
+        group_id (str): The ID of the group.
+
+    Returns:
+        bool: True if the user can read the group's data.
+    """
+    return Group.objects.filter(
+        Q(members__user=user) | Q(owner=user), id=group_id
+    ).exists()
+
+
+@database_sync_to_async
+def get_groups_data(user):
+    """
+    Build the GroupSerializer output of the groups the user is a member of.
+
+    Args:
+        user (User): The authenticated user.
+
+    Returns:
+        list: The serialized groups.
+    """
+    rows = (
+        Group.objects.filter(Q(members__user=user) | Q(owner=user))
+        .distinct()
+        .values_list(
+            "id", "name", "owner_id", "note", "public_permission", "primary_currency"
+        )
+    )
+    return [
+        {
+            "id": str(group_id),
+            "name": name,
+            "owner": owner_id,
+            "note": note,
+            "public_permission": public_permission,
+            "primary_currency": primary_currency,
+        }
+        for group_id, name, owner_id, note, public_permission, primary_currency in rows
+    ]
+
+
+async def group_list(request):
+    """
+    Asynchronously list the groups that the authenticated user is a member of.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The same JSON response as GET /group.
+    """
+    user = await authenticate(request)
+    if user is None:
+        return json_response(NOT_AUTHENTICATED, status=401)
+    return json_response(await get_groups_data(user))
+
+
+async def member_list(request, group_id):
+    """
+    Asynchronously list the members of a group with their balances.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        group_id (str): The ID of the group.
+
+    Returns:
+        HttpResponse: The same JSON response as GET /group/<group_id>/members.
+    """
+    user = await authenticate(request)
+    if user is None:
+        return json_response(NOT_AUTHENTICATED, status=401)
+    if not await can_access_group(user, group_id):
+        return json_response(NOT_FOUND, status=404)
+
+    data, is_exact = await database_sync_to_async(get_members_data)(
+        Member.objects.filter(group__id=group_id)
+    )
+    return json_response(data, is_exact)
@@ -0,0 +1,219 @@
+import asyncio
+import io
+import json
+import re
+
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.module_loading import import_string
+from loguru import logger
+
+from account.async_views import (
+    NOT_AUTHENTICATED,
+    NOT_FOUND,
+    can_access_group,
+    get_request_user,
+)
+from account.versions import aget_group_version, bump_group_version
+from common.async_utils import database_sync_to_async
+from common.events import get_broker
+
+GROUP_CHANNEL = "group_changes_%s"
+CHANGE_STREAM_PATH = re.compile(
+    r"^/async/group/(?P<group_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-"
+    r"[0-9a-f]{12})/changes$"
+)
+# Send a comment this often so proxies don't close idle streams.
+KEEPALIVE_SECONDS = 15
+
+
+def notify_group_change(group_id, event_type, object_id=None):
+    """
+    Bump the data version of a group and push the change to its subscribers.
+
+    Call it once the change is committed, e.g. with `transaction.on_commit`.
+    Failures are only logged, since the change itself is already committed.
+
+    Args:
+        group_id (str): The ID of the changed group.
+        event_type (str): The kind of change, e.g. "record.created".
+        object_id (str): The ID of the changed object, if any.
+    """
+    try:
+        version = bump_group_version(group_id)
+    except redis.RedisError:
+        logger.exception(f"Failed to bump the version of group {group_id}")
+        return
+    get_broker().publish(
+        GROUP_CHANNEL % group_id,
+        {
+            "type": event_type,
+            "id": str(object_id) if object_id is not None else None,
+            "version": version,
+        },
+    )
+
+
+@database_sync_to_async
+def authenticate_scope(scope):
+    """
+    Authenticate an ASGI connection with a JWT or the session cookie.
+
+    Browsers can't set headers on an EventSource, so the JWT may also be passed
+    in the `token` query parameter.
+
+    Args:
+        scope (dict): The ASGI connection scope.
+
+    Returns:
+        User: The authenticated user, or None.
+    """
+    request = ASGIRequest(scope, io.BytesIO())
+    token = request.GET.get("token")
+    if token and "HTTP_AUTHORIZATION" not in request.META:
+        request.META["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+
+    session_store = import_string(f"{settings.SESSION_ENGINE}.SessionStore")
+    request.session = session_store(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    request.user = get_user(request)
+    return get_request_user(request)
+
+
+def format_event(event_type, data, event_id=None):
+    """
+    Format a Server-Sent Event.
+
+    Args:
+        event_type (str): The event name.
+        data (dict): The JSON serializable event data.
+        event_id (int): The event ID, if any.
+
+    Returns:
+        bytes: The encoded event.
+    """
+    lines = [f"event: {event_type}", f"data: {json.dumps(data)}"]
+    if event_id is not None:
+        lines.insert(0, f"id: {event_id}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+async def send_json(send, data, status):
+    """
+    Send a complete JSON response.
+
+    Args:
+        send (Callable): The ASGI send callable.
+        data (dict): The response data.
+        status (int): The HTTP status code.
+    """
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": json.dumps(data).encode()})
+
+
+async def wait_for_disconnect(receive):
+    """
+    Wait until the client disconnects.
+
+    Args:
+        receive (Callable): The ASGI receive callable.
+    """
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+class ChangeStreamApplication:
+    """
+    ASGI application pushing the changes of a group as Server-Sent Events.
+
+    GET /async/group/<group_id>/changes streams a "version" event with the
+    current data version of the group, followed by one event per committed
+    change, named by its type and carrying the record ID and the new version.
+    Clients refetch whatever changed instead of polling. Every other request
+    is passed on to the Django application, which can't stream asynchronously.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        match = scope["type"] == "http" and CHANGE_STREAM_PATH.match(scope["path"])
+        if not match:
+            return await self.application(scope, receive, send)
+        if scope["method"] != "GET":
+            return await send_json(
+                send, {"detail": f'Method "{scope["method"]}" not allowed.'}, 405
+            )
+        await self.stream(scope, receive, send, match["group_id"])
+
+    async def stream(self, scope, receive, send, group_id):
+        """
+        Stream the changes of the group until the client disconnects.
+
+        Args:
+            scope (dict): The ASGI connection scope.
+            receive (Callable): The ASGI receive callable.
+            send (Callable): The ASGI send callable.
+            group_id (str): The ID of the group.
+        """
+        user = await authenticate_scope(scope)
+        if user is None:
+            return await send_json(send, NOT_AUTHENTICATED, 401)
+        if not await can_access_group(user, group_id):
+            return await send_json(send, NOT_FOUND, 404)
+
+        async with get_broker().subscribe(GROUP_CHANNEL % group_id) as subscription:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            # Subscribed before reading the version, so no change is missed.
+            version = await aget_group_version(group_id)
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": format_event("version", {"version": version}, version),
+                    "more_body": True,
+                }
+            )
+
+            disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+            next_event = None
+            try:
+                while True:
+                    if next_event is None:
+                        next_event = asyncio.ensure_future(subscription.get())
+                    done, _ = await asyncio.wait(
+                        {disconnected, next_event},
+                        timeout=KEEPALIVE_SECONDS,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if disconnected in done:
+                        break
+                    if next_event in done:
+                        event = next_event.result()
+                        next_event = None
+                        body = format_event(event["type"], event, event["version"])
+                    else:
+                        body = b": keepalive\n\n"
+                    await send(
+                        {"type": "http.response.body", "body": body, "more_body": True}
+                    )
+            finally:
+                disconnected.cancel()
+                if next_event is not None:
+                    next_event.cancel()
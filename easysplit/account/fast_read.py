@@ -0,0 +1,73 @@
+from collections import defaultdict
+
+from django.utils import timezone
+
+from common.profiling import timed
+from common.renderers import datetime_to_representation, is_orjson_exact
+from record.models import Balance
+
+
+@timed("serialize")
+def get_members_data(queryset):
+    """
+    Build the MemberSerializer output of the members from plain row tuples.
+
+    Args:
+        queryset (QuerySet[Member]): The members to serialize.
+
+    Returns:
+        tuple[list, bool]: The serialized members, and whether orjson renders
+            every float in them exactly like the standard json module.
+    """
+    is_exact = True
+    tz = timezone.get_current_timezone()
+
+    balances_by_member = defaultdict(list)
+    rows = (
+        Balance.objects.filter(member__in=queryset.values("id"))
+        .order_by("id")
+        .values_list("member_id", "balance", "currency")
+    )
+    for member_id, balance, currency in rows:
+        balances_by_member[member_id].append({"balance": balance, "currency": currency})
+        is_exact = is_exact and is_orjson_exact(balance)
+
+    data = []
+    rows = queryset.values_list(
+        "id",
+        "user_id",
+        "group_id",
+        "created_at",
+        "updated_at",
+        "name",
+        "permission",
+        "primary_balance",
+    )
+    for (
+        member_id,
+        user_id,
+        group_id,
+        created_at,
+        updated_at,
+        name,
+        permission,
+        primary_balance,
+    ) in rows:
+        data.append(
+            {
+                "id": str(member_id),
+                "balances": balances_by_member.get(member_id, []),
+                "user_id": user_id,
+                "group_id": group_id,
+                "created_at": datetime_to_representation(created_at, tz),
+                "updated_at": datetime_to_representation(updated_at, tz),
+                "name": name,
+                "permission": permission,
+                "primary_balance": primary_balance,
+                "user": user_id,
+                "group": group_id,
+            }
+        )
+        is_exact = is_exact and is_orjson_exact(primary_balance)
+
+    return data, is_exact
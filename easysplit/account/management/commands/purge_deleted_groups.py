@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from account.models import Group
+from account.purge import PURGE_BATCH_SIZE, purge_group
+
+
+class Command(BaseCommand):
+    help = "Delete the data of deleted groups in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=PURGE_BATCH_SIZE,
+            help="Maximum number of rows deleted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        group_ids = Group.all_objects.filter(deleted_at__isnull=False).values_list(
+            "id", flat=True
+        )
+        for group_id in group_ids:
+            deleted = purge_group(group_id, options["batch_size"])
+            self.stdout.write(f"Purged group {group_id}: {deleted} rows")
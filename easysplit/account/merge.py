@@ -0,0 +1,247 @@
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+
+from account.change_stream import notify_group_change
+from account.models import Member
+from account.rollup import apply_user_balance_deltas
+from common.money import apply_minor_unit_deltas
+from record.archive import add_opening_balances
+from record.exchange_rates import convert_minor_units
+from record.models import (
+    ArchivedFrom,
+    ArchivedRecord,
+    ArchivedTo,
+    Balance,
+    BalanceCheckpoint,
+    FeedItem,
+    From,
+    Record,
+    To,
+)
+from record.splits import get_balance_deltas
+
+
+def merge_participants(participants, split_rule, source_id, target_id):
+    """
+    Replace the source member with the target member in the participants of a
+    rule-based split.
+
+    When both participate, the target takes over the source's weight, so an
+    equal split becomes a split by shares.
+
+    Args:
+        participants (list[dict]): The participants, each containing member_id
+            and weight.
+        split_rule (str): "equal", "shares" or "percent".
+        source_id (str): The ID of the merged member.
+        target_id (str): The ID of the member merged into.
+
+    Returns:
+        tuple[list[dict], str]: The new participants and split rule.
+    """
+    member_ids = [participant["member_id"] for participant in participants]
+    if target_id not in member_ids:
+        return [
+            {**participant, "member_id": target_id}
+            if participant["member_id"] == source_id
+            else participant
+            for participant in participants
+        ], split_rule
+
+    if split_rule == Record.SPLIT_EQUAL:
+        participants = [{**participant, "weight": 1} for participant in participants]
+        split_rule = Record.SPLIT_SHARES
+    source_weight = participants[member_ids.index(source_id)].get("weight", 1)
+    return [
+        {**participant, "weight": participant.get("weight", 1) + source_weight}
+        if participant["member_id"] == target_id
+        else participant
+        for participant in participants
+        if participant["member_id"] != source_id
+    ], split_rule
+
+
+def get_member_records(model, from_model, to_model, member):
+    """
+    Get the records of a member's group that involve the member.
+
+    Args:
+        model (type): Record or ArchivedRecord.
+        from_model (type): The From model of the records.
+        to_model (type): The To model of the records.
+        member (Member): The member.
+
+    Returns:
+        QuerySet: The records, with their From and To rows prefetched.
+    """
+    member_id = str(member.id)
+    record_ids = {
+        record_id
+        for rows in (from_model, to_model)
+        for record_id in rows.objects.filter(member=member).values_list(
+            "record_id", flat=True
+        )
+    }
+    record_ids.update(
+        record_id
+        for record_id, participants in model.objects.filter(group_id=member.group_id)
+        .exclude(split_rule=Record.SPLIT_EXACT)
+        .values_list("id", "split_participants")
+        if any(participant["member_id"] == member_id for participant in participants)
+    )
+    return model.objects.filter(id__in=record_ids).prefetch_related(
+        "from_members", "to_members"
+    )
+
+
+def get_record_deltas(records, primary_currency):
+    """
+    Get how much records add to the balances and primary balances of members.
+
+    Each record's deltas are converted at its exchange rate and rounded on their
+    own, like when the record was saved.
+
+    Args:
+        records (Iterable[Record | ArchivedRecord]): The records, with their
+            From and To rows prefetched.
+        primary_currency (str): The primary currency of the group.
+
+    Returns:
+        tuple[dict[str, dict[str, int]], dict[str, int]]: The balance deltas in
+            minor units of each member ID by currency, and the primary balance
+            deltas of each member ID.
+    """
+    balance_deltas = defaultdict(lambda: defaultdict(int))
+    primary_deltas = defaultdict(int)
+    for record in records:
+        for member_id, delta in get_balance_deltas(record).items():
+            balance_deltas[record.currency][member_id] += delta
+            primary_deltas[member_id] += convert_minor_units(
+                delta, record.currency, primary_currency, record.exchange_rate
+            )
+    return balance_deltas, primary_deltas
+
+
+def subtract_deltas(new, old):
+    """
+    Get the changes from old to new deltas of members.
+
+    Args:
+        new (dict[str, int]): The new delta of each member ID.
+        old (dict[str, int]): The old delta of each member ID.
+
+    Returns:
+        dict[str, int]: The non-zero change of each member ID.
+    """
+    changes = {
+        member_id: new.get(member_id, 0) - old.get(member_id, 0)
+        for member_id in {*new, *old}
+    }
+    return {member_id: change for member_id, change in changes.items() if change}
+
+
+@transaction.atomic
+def merge_members(source, target):
+    """
+    Merge a member into another member of the same group and deactivate it.
+
+    The splits, balances, archived history and feed of the source move to the
+    target with bulk updates, so the number of queries doesn't grow with the source's history.
+
+    The balances of the records involving the source are computed before and
+    after the merge, since merged weights may round to different minor units
+    than the separate ones, and a record's deltas are converted to the primary
+    currency as a whole.
+
+    Args:
+        source (Member): The member to merge and deactivate.
+        target (Member): The member taking over the source's history.
+    """
+    # Lock both members.
+    locked = Member.objects.select_for_update().in_bulk([source.id, target.id])
+    source = locked[source.id]
+    source_id, target_id = str(source.id), str(target.id)
+    primary_currency = target.group.primary_currency
+
+    # The balance changes of the records involving the source. Archived records
+    # also change the opening balances.
+    balance_deltas = defaultdict(lambda: defaultdict(int))
+    opening_deltas = defaultdict(lambda: defaultdict(int))
+    primary_deltas = defaultdict(int)
+    for model, from_model, to_model in (
+        (Record, From, To),
+        (ArchivedRecord, ArchivedFrom, ArchivedTo),
+    ):
+        records = list(get_member_records(model, from_model, to_model, source))
+        old_balances, old_primary = get_record_deltas(records, primary_currency)
+
+        split_records = [
+            record for record in records if record.split_rule != Record.SPLIT_EXACT
+        ]
+        for record in split_records:
+            record.split_participants, record.split_rule = merge_participants(
+                record.split_participants, record.split_rule, source_id, target_id
+            )
+        model.objects.bulk_update(
+            split_records, ["split_rule", "split_participants"], batch_size=1000
+        )
+        for rows in (from_model, to_model):
+            rows.objects.filter(member=source).update(member=target)
+
+        new_balances, new_primary = get_record_deltas(
+            model.objects.filter(
+                id__in=[record.id for record in records]
+            ).prefetch_related("from_members", "to_members"),
+            primary_currency,
+        )
+        for currency in {*old_balances, *new_balances}:
+            for member_id, change in subtract_deltas(
+                new_balances[currency], old_balances[currency]
+            ).items():
+                balance_deltas[currency][member_id] += change
+                if model is ArchivedRecord:
+                    opening_deltas[currency][member_id] += change
+        for member_id, change in subtract_deltas(new_primary, old_primary).items():
+            primary_deltas[member_id] += change
+
+    add_opening_balances(target.group_id, opening_deltas)
+    Balance.objects.bulk_create(
+        Balance(member=target, currency=currency)
+        for currency in set(balance_deltas)
+        - set(target.balances.values_list("currency", flat=True))
+    )
+    for currency, deltas in balance_deltas.items():
+        apply_minor_unit_deltas(
+            Balance.objects.filter(currency=currency, member__group_id=target.group_id),
+            "member_id",
+            deltas,
+            "balance",
+            currency,
+        )
+        apply_user_balance_deltas(currency, deltas)
+
+    apply_minor_unit_deltas(
+        Member.objects.filter(group_id=target.group_id),
+        "id",
+        primary_deltas,
+        "primary_balance",
+        primary_currency,
+    )
+
+    # Merged shares may round differently in any period of the history.
+    BalanceCheckpoint.objects.filter(group_id=target.group_id).delete()
+
+    FeedItem.objects.filter(
+        member=source,
+        record__in=FeedItem.objects.filter(member=target).values("record"),
+    ).delete()
+    FeedItem.objects.filter(member=source).update(member=target, user=target.user)
+
+    source.permission = "deactivated"
+    source.save(update_fields=["permission", "updated_at"])
+
+    transaction.on_commit(
+        partial(notify_group_change, target.group_id, "members.updated")
+    )
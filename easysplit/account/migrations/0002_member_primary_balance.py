@@ -0,0 +1,36 @@
+# Generated by Django 4.0.4 on 2026-10-18 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='group',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AlterModelOptions(
+            name='member',
+            options={'ordering': ['created_at']},
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='primary_balance',
+            field=models.FloatField(blank=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='primary_balance_minor',
+            field=models.BigIntegerField(blank=True, default=0),
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='primary_currency',
+            field=models.CharField(choices=[('TWD', 'TWD'), ('USD', 'USD'), ('EUR', 'EUR'), ('JPY', 'JPY')], default='TWD', max_length=10),
+        ),
+    ]
@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+from common.money import to_major_units
+from record.exchange_rates import convert_minor_units
+from record.splits import get_balance_deltas
+
+# Groups updated per transaction, so the backfill never locks a table for long.
+BATCH_SIZE = 100
+
+
+def backfill_primary_balance(apps, schema_editor):
+    """
+    Fill the primary balances from the balances in the groups' primary currency
+    and the records in other currencies, each converted at its stored exchange
+    rate like when it is saved.
+    """
+    Group = apps.get_model("account", "Group")
+    Member = apps.get_model("account", "Member")
+    Balance = apps.get_model("record", "Balance")
+    Record = apps.get_model("record", "Record")
+
+    last_pk = None
+    while True:
+        queryset = Group.objects.order_by("pk")
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        groups = {group.pk: group for group in queryset[:BATCH_SIZE]}
+        if not groups:
+            return
+
+        totals = {
+            (member_id, currency): balance
+            for member_id, currency, balance in Balance.objects.filter(
+                member__group__in=groups
+            ).values_list("member_id", "currency", "balance_minor")
+        }
+        members = list(Member.objects.filter(group__in=groups))
+        primary_balances = defaultdict(int)
+        for member in members:
+            primary_balances[str(member.pk)] = totals.get(
+                (member.pk, groups[member.group_id].primary_currency), 0
+            )
+        records = Record.objects.filter(group__in=groups).prefetch_related(
+            "from_members", "to_members"
+        )
+        for record in records:
+            primary_currency = groups[record.group_id].primary_currency
+            if record.currency == primary_currency:
+                continue
+            for member_id, delta in get_balance_deltas(record).items():
+                primary_balances[member_id] += convert_minor_units(
+                    delta, record.currency, primary_currency, record.exchange_rate
+                )
+
+        for member in members:
+            currency = groups[member.group_id].primary_currency
+            member.primary_balance_minor = primary_balances[str(member.pk)]
+            member.primary_balance = to_major_units(
+                member.primary_balance_minor, currency
+            )
+        Member.objects.bulk_update(
+            members, ["primary_balance", "primary_balance_minor"]
+        )
+        last_pk = list(groups)[-1]
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own instead of one transaction over all rows.
+    atomic = False
+
+    dependencies = [
+        ("account", "0002_member_primary_balance"),
+        ("record", "0008_backfill_money_minor_units"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_primary_balance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.0.4 on 2026-10-18 23:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('account', '0003_backfill_primary_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.FloatField(blank=True, default=0)),
+                ('balance_minor', models.BigIntegerField(blank=True, default=0)),
+                ('currency', models.CharField(choices=[('TWD', 'TWD'), ('USD', 'USD'), ('EUR', 'EUR'), ('JPY', 'JPY')], default='TWD', max_length=10)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='overall_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='userbalance',
+            constraint=models.UniqueConstraint(fields=('user', 'currency'), name='unique_user_balance'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+from django.db.models import Sum
+
+from common.money import to_major_units
+
+# Users summed per transaction, so the backfill never locks a table for long.
+BATCH_SIZE = 1000
+
+
+def backfill_user_balances(apps, schema_editor):
+    """
+    Sum the balances of the members bound to each user into their overall balances.
+    """
+    User = apps.get_model("auth", "User")
+    Balance = apps.get_model("record", "Balance")
+    UserBalance = apps.get_model("account", "UserBalance")
+
+    last_pk = None
+    while True:
+        queryset = User.objects.order_by("pk")
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        user_ids = list(queryset.values_list("pk", flat=True)[:BATCH_SIZE])
+        if not user_ids:
+            return
+
+        totals = (
+            Balance.objects.filter(member__user_id__in=user_ids)
+            .values_list("member__user_id", "currency")
+            .annotate(total=Sum("balance_minor"))
+            .order_by()
+        )
+        UserBalance.objects.bulk_create(
+            [
+                UserBalance(
+                    user_id=user_id,
+                    currency=currency,
+                    balance=to_major_units(total, currency),
+                    balance_minor=total,
+                )
+                for user_id, currency, total in totals
+                if total
+            ],
+            ignore_conflicts=True,
+        )
+        last_pk = user_ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own instead of one transaction over all rows.
+    atomic = False
+
+    dependencies = [
+        ("account", "0004_userbalance"),
+        ("record", "0009_exchangerate"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_user_balances, migrations.RunPython.noop),
+    ]
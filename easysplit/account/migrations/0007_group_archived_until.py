@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 23:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0006_group_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='archived_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -4,6 +4,15 @@ from django.db import models
 from common.models import CURRENCY_CHOICES, BasicModelMixin
 
 
+class GroupManager(models.Manager):
+    """
+    Manager of the groups which aren't deleted.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Group(BasicModelMixin):
     """
     Model representing a group.
@@ -25,6 +34,13 @@ class Group(BasicModelMixin):
         default="TWD", max_length=10, choices=CURRENCY_CHOICES
     )
     # image = models.ImageField()
+    # Set when the group is deleted. Its data is purged in the background.
+    deleted_at = models.DateTimeField(blank=True, null=True)
+    # Records created before it are archived into the members' opening balances.
+    archived_until = models.DateTimeField(blank=True, null=True)
+
+    objects = GroupManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ["-created_at"]
@@ -45,7 +61,33 @@ class Member(BasicModelMixin):
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name="members")
     name = models.CharField(max_length=50)
     permission = models.CharField(max_length=20, choices=PERMISSION_CHOICES)
-    # primary_balance
+    # The balance over all currencies converted to the group's primary currency
+    # at the records' exchange rates, kept up to date when records change.
+    primary_balance = models.FloatField(default=0, blank=True)
+    primary_balance_minor = models.BigIntegerField(default=0, blank=True)
 
     class Meta:
         ordering = ["created_at"]
+
+
+class UserBalance(models.Model):
+    """
+    Model representing the balance of a user over all groups in a specific currency.
+
+    It's the sum of the balances of the members bound to the user, kept up to
+    date when those change.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="overall_balances"
+    )
+    balance = models.FloatField(default=0, blank=True)
+    balance_minor = models.BigIntegerField(default=0, blank=True)
+    currency = models.CharField(default="TWD", max_length=10, choices=CURRENCY_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "currency"], name="unique_user_balance"
+            )
+        ]
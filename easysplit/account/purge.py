@@ -0,0 +1,125 @@
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from loguru import logger
+
+from account.change_stream import notify_group_change
+from account.models import Group, Member
+from account.rollup import apply_member_balances
+from record.models import (
+    ArchivedFrom,
+    ArchivedRecord,
+    ArchivedTo,
+    Balance,
+    BalanceCheckpoint,
+    FeedItem,
+    From,
+    OpeningBalance,
+    Record,
+    To,
+)
+
+# Rows deleted per statement, so no DELETE holds its locks for long.
+PURGE_BATCH_SIZE = 1000
+
+
+@transaction.atomic
+def soft_delete_group(group):
+    """
+    Mark a group as deleted and schedule the purge of its data.
+
+    The group disappears from the API at once, and its balances from the
+    overall balances of its members' users.
+
+    Args:
+        group (Group): The group to delete.
+    """
+    apply_member_balances(group.members.all(), -1)
+    group.deleted_at = timezone.now()
+    group.save(update_fields=["deleted_at", "updated_at"])
+
+    transaction.on_commit(partial(notify_group_change, group.id, "group.deleted"))
+    if settings.GROUP_PURGE_IN_BACKGROUND:
+        transaction.on_commit(partial(purge_group_in_background, group.id))
+
+
+def get_purge_steps(group_id):
+    """
+    Get the rows of a group in the order they can be deleted, children first.
+
+    Args:
+        group_id (str): The ID of the group.
+
+    Returns:
+        list[QuerySet]: The rows of each model.
+    """
+    return [
+        FeedItem.objects.filter(record__group_id=group_id),
+        From.objects.filter(record__group_id=group_id),
+        To.objects.filter(record__group_id=group_id),
+        Record.objects.filter(group_id=group_id),
+        ArchivedFrom.objects.filter(record__group_id=group_id),
+        ArchivedTo.objects.filter(record__group_id=group_id),
+        ArchivedRecord.objects.filter(group_id=group_id),
+        OpeningBalance.objects.filter(group_id=group_id),
+        BalanceCheckpoint.objects.filter(group_id=group_id),
+        Balance.objects.filter(member__group_id=group_id),
+        FeedItem.objects.filter(member__group_id=group_id),
+        Member.objects.filter(group_id=group_id),
+        Group.all_objects.filter(id=group_id),
+    ]
+
+
+def purge_group(group_id, batch_size=PURGE_BATCH_SIZE):
+    """
+    Delete a group and all its data in bounded batches.
+
+    Every batch is deleted with one raw DELETE by primary keys and commits on
+    its own. Django's cascade collector would load every row into memory
+    instead, and a single transaction would lock the tables for the whole purge.
+
+    Args:
+        group_id (str): The ID of the group.
+        batch_size (int): The maximum number of rows deleted per statement.
+
+    Returns:
+        int: The number of deleted rows.
+    """
+    deleted = 0
+    for queryset in get_purge_steps(group_id):
+        model = queryset.model
+        while True:
+            pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            # The children are already gone, so nothing is left to cascade to.
+            deleted += model._base_manager.filter(pk__in=pks)._raw_delete(
+                DEFAULT_DB_ALIAS
+            )
+    logger.info(f"Purged group {group_id}: {deleted} rows")
+    return deleted
+
+
+def purge_group_in_background(group_id):
+    """
+    Purge a deleted group in a background thread.
+
+    Groups whose purge didn't finish, e.g. because the process stopped, are
+    purged by the purge_deleted_groups command.
+
+    Args:
+        group_id (str): The ID of the group.
+    """
+
+    def run():
+        try:
+            purge_group(group_id)
+        except Exception:
+            logger.exception(f"Failed to purge group {group_id}")
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, daemon=True).start()
@@ -0,0 +1,74 @@
+from collections import defaultdict
+
+from django.db.models import Sum
+
+from account.models import Member, UserBalance
+from common.money import apply_minor_unit_deltas
+from record.models import Balance
+
+
+def add_to_user_balances(currency, user_deltas):
+    """
+    Add deltas to the overall balances of users, creating missing balances.
+
+    Args:
+        currency (str): The currency of the deltas.
+        user_deltas (dict[int, int]): The delta in minor units of each user ID.
+    """
+    user_deltas = {user_id: delta for user_id, delta in user_deltas.items() if delta}
+    if not user_deltas:
+        return
+    UserBalance.objects.bulk_create(
+        [UserBalance(user_id=user_id, currency=currency) for user_id in user_deltas],
+        ignore_conflicts=True,
+    )
+    apply_minor_unit_deltas(
+        UserBalance.objects.filter(currency=currency),
+        "user_id",
+        user_deltas,
+        "balance",
+        currency,
+    )
+
+
+def apply_user_balance_deltas(currency, deltas):
+    """
+    Add the balance deltas of members to the overall balances of their users.
+
+    Args:
+        currency (str): The currency of the deltas.
+        deltas (dict[str, int]): The delta in minor units of each member ID.
+    """
+    user_ids = dict(
+        Member.objects.filter(id__in=list(deltas), user__isnull=False).values_list(
+            "id", "user_id"
+        )
+    )
+    user_deltas = defaultdict(int)
+    for member_id, user_id in user_ids.items():
+        user_deltas[user_id] += deltas[str(member_id)]
+    add_to_user_balances(currency, user_deltas)
+
+
+def apply_member_balances(members, sign=1):
+    """
+    Add the whole balances of members to the overall balances of their users, or
+    remove them, e.g. when members are bound to other users or deleted.
+
+    Args:
+        members (QuerySet[Member]): The members, bound to the users they
+            currently have in the database.
+        sign (int): 1 to add the balances, -1 to remove them.
+    """
+    totals = (
+        Balance.objects.filter(member__in=members, member__user__isnull=False)
+        .values_list("member__user_id", "currency")
+        .annotate(total=Sum("balance_minor"))
+        .order_by()
+    )
+    deltas_by_currency = defaultdict(dict)
+    for user_id, currency, total in totals:
+        deltas_by_currency[currency][user_id] = sign * total
+
+    for currency, user_deltas in deltas_by_currency.items():
+        add_to_user_balances(currency, user_deltas)
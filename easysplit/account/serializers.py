@@ -1,4 +1,5 @@
 from django.contrib.auth.models import User
+from django.db import transaction
 from rest_framework.serializers import ModelSerializer, PrimaryKeyRelatedField
 from rest_framework_simplejwt.serializers import (
     TokenObtainPairSerializer,
@@ -6,6 +7,9 @@ from rest_framework_simplejwt.serializers import (
 )
 
 from account.models import Group, Member
+from common.profiling import TimedSerializerMixin
+from common.serializers import SparseFieldsetMixin
+from record.exchange_rates import recalculate_primary_balances
 from record.serializers import BalanceSerializer
 
 
@@ -55,7 +59,7 @@ class CustomTokenRefreshSerializer(TokenRefreshSerializer):
         return data
 
 
-class GroupSerializer(ModelSerializer):
+class GroupSerializer(TimedSerializerMixin, SparseFieldsetMixin, ModelSerializer):
     """
     Serializer for the Group model.
     """
@@ -70,6 +74,17 @@ class GroupSerializer(ModelSerializer):
 
         return obj
 
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        primary_currency = instance.primary_currency
+        obj = super().update(instance, validated_data)
+
+        # Primary balances are kept in the primary currency, so convert them.
+        if obj.primary_currency != primary_currency:
+            recalculate_primary_balances(obj)
+
+        return obj
+
     class Meta:
         model = Group
         fields = [
@@ -82,17 +97,19 @@ class GroupSerializer(ModelSerializer):
         ]
 
 
-class MemberSerializer(ModelSerializer):
+class MemberSerializer(TimedSerializerMixin, SparseFieldsetMixin, ModelSerializer):
     """
     Serializer for the Member model.
     """
 
     balances = BalanceSerializer(many=True, read_only=True)
     user_id = PrimaryKeyRelatedField(
-        allow_null=True, queryset=User.objects.all(), required=False, source="user"
+        allow_null=True, queryset=User.objects, required=False, source="user"
     )
-    group_id = PrimaryKeyRelatedField(queryset=Group.objects.all(), source="group")
+    group_id = PrimaryKeyRelatedField(queryset=Group.objects, source="group")
 
     class Meta:
         model = Member
-        fields = "__all__"
+        exclude = ["primary_balance_minor"]
+        read_only_fields = ["primary_balance"]
+        expandable_fields = {"balances": "balances"}
@@ -1,10 +1,19 @@
+from io import StringIO
 from typing import Optional
 
+from django.core.management import call_command
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from pydantic import BaseModel, ValidationError
 from rest_framework import status
 
+from account.models import Group, Member, UserBalance
+from account.purge import soft_delete_group
 from common.tests import BaseTestCase, incorrect_format_message
+from record.archive import archive_group_history
+from record.integrity import check_group
+from record.models import Balance, From, OpeningBalance, Record
 
 
 class UserDataModel(BaseModel):
@@ -44,6 +53,55 @@ class AccountTests(BaseTestCase):
         except ValidationError as e:
             self.fail(incorrect_format_message(e))
 
+    def test_retrieve_user_balances(self):
+        """
+        Test the overall balances follow records and rebound members.
+        """
+        response = self.client.post(
+            reverse("record-list", kwargs={"group_id": self.default_group.id}),
+            data={
+                "group_id": self.default_group.id,
+                "what": "Dinner",
+                "amount": 100,
+                "type": "expense",
+                "from_members": [{"amount": 100, "member_id": self.owner_member.id}],
+                "to_members": [{"amount": -100, "member_id": self.binded_member.id}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(reverse("user_balances"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [{"currency": "TWD", "balance": 100.0}])
+        self.assertEqual(
+            UserBalance.objects.get(user=self.user1, currency="TWD").balance, -100
+        )
+
+        # The binded member's balance moves to the user it's bound to.
+        response = self.client.post(
+            reverse("members", kwargs={"group_id": self.default_group.id}),
+            data={
+                "create": [],
+                "update": [
+                    {
+                        "id": self.binded_member.id,
+                        "user_id": self.user.id,
+                        "name": self.binded_member.name,
+                        "permission": "edit",
+                    }
+                ],
+                "delete": [],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse("user_balances"))
+        self.assertEqual(response.json(), [])
+        self.assertEqual(
+            UserBalance.objects.get(user=self.user1, currency="TWD").balance, 0
+        )
+
 
 class GroupDataModel(BaseModel):
     """
@@ -148,6 +206,56 @@ class GroupTests(BaseTestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+        # the group is hidden at once and its data purged afterwards
+        response = self.client.get(
+            reverse("group-detail", kwargs={"pk": self.default_group.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Member.objects.filter(group=self.default_group).exists())
+
+        # so are its records, which can't change the users' balances any more
+        record = Record.objects.create(
+            group=self.default_group, what="Record", amount=100, type="expense"
+        )
+        records_url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+        record_url = reverse(
+            "record-detail", kwargs={"group_id": self.default_group.id, "pk": record.id}
+        )
+        for fast_read_path in (True, False):
+            with override_settings(FAST_READ_PATH=fast_read_path):
+                self.assertEqual(self.client.get(records_url).json(), [])
+        response = self.client.delete(record_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Record.objects.filter(id=record.id).exists())
+
+    def test_purge_deleted_group(self):
+        """
+        Test purging a deleted group removes all its rows in batches.
+        """
+        response = self.client.post(
+            reverse("record-list", kwargs={"group_id": self.default_group.id}),
+            data={
+                "group_id": self.default_group.id,
+                "what": "Dinner",
+                "amount": 100,
+                "type": "expense",
+                "from_members": [{"amount": 100, "member_id": self.owner_member.id}],
+                "to_members": [{"amount": -100, "member_id": self.binded_member.id}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        soft_delete_group(self.default_group)
+        self.assertEqual(
+            UserBalance.objects.get(user=self.user, currency="TWD").balance, 0
+        )
+
+        call_command("purge_deleted_groups", batch_size=1, stdout=StringIO())
+        self.assertFalse(Group.all_objects.filter(id=self.default_group.id).exists())
+        self.assertFalse(Member.objects.filter(group_id=self.default_group.id).exists())
+        self.assertFalse(Record.objects.exists())
+        self.assertFalse(Balance.objects.exists())
+
 
 class MemberDataModel(BaseModel):
     """
@@ -186,6 +294,50 @@ class MemberTests(BaseTestCase):
         except ValidationError as e:
             self.fail(incorrect_format_message(e))
 
+    def test_list_member_fast_read_path(self):
+        """
+        Test the fast read path renders the same bytes as the serializer.
+        """
+        Balance.objects.create(member=self.owner_member, balance=0.1 + 0.2)
+        Balance.objects.create(member=self.binded_member, balance=-300)
+        url = reverse("members", kwargs={"group_id": self.default_group.id})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with override_settings(FAST_READ_PATH=False):
+            serializer_response = self.client.get(url)
+        self.assertEqual(response.content, serializer_response.content)
+
+        # Tiny floats are written differently by orjson, so they fall back to
+        # the standard renderer.
+        Balance.objects.create(member=self.non_binded_member, balance=1e-05)
+        response = self.client.get(url)
+        with override_settings(FAST_READ_PATH=False):
+            serializer_response = self.client.get(url)
+        self.assertEqual(response.content, serializer_response.content)
+
+    def test_list_member_sparse_fields(self):
+        """
+        Test listing members with only the requested fields.
+        """
+        url = reverse("members", kwargs={"group_id": self.default_group.id})
+
+        # 2 session authentication queries, then the group and members without
+        # prefetching balances.
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {"fields": "id,name"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for item in response.json():
+            self.assertEqual(set(item), {"id", "name"})
+
+        response = self.client.get(url, {"expand": "balances"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        try:
+            for item in response.json():
+                member_data = MemberDataModel(**item)
+        except ValidationError as e:
+            self.fail(incorrect_format_message(e))
+
     def test_create_member(self):
         """
         Test creating member.
@@ -287,3 +439,175 @@ class MemberTests(BaseTestCase):
             data=members_data,
         )
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_merge_member(self):
+        """
+        Test merging a member moves its splits and balances to the target.
+        """
+        url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+        response = self.client.post(
+            url,
+            data={
+                "group_id": self.default_group.id,
+                "what": "Exact record",
+                "amount": 100,
+                "type": "expense",
+                "from_members": [
+                    {"amount": 100, "member_id": self.non_binded_member.id}
+                ],
+                "to_members": [{"amount": -100, "member_id": self.owner_member.id}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(
+            url,
+            data={
+                "group_id": self.default_group.id,
+                "what": "Equal record",
+                "amount": 0.1,
+                "type": "expense",
+                "from_members": [{"amount": 0.1, "member_id": self.owner_member.id}],
+                "split_rule": "equal",
+                "split_participants": [
+                    {"member_id": self.owner_member.id},
+                    {"member_id": self.binded_member.id},
+                    {"member_id": self.non_binded_member.id},
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        record_id = response.json()["id"]
+
+        merge_url = reverse("member_merge", kwargs={"group_id": self.default_group.id})
+        merge_data = {
+            "source_id": self.non_binded_member.id,
+            "target_id": self.binded_member.id,
+        }
+
+        # Users who aren't in the group can't merge its members.
+        self.create_user(username="outsider", password="outsider")
+        outsider = self.client_class()
+        outsider.login(username="outsider", password="outsider")
+        response = outsider.post(merge_url, data=merge_data)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.non_binded_member.refresh_from_db()
+        self.assertEqual(self.non_binded_member.permission, "edit")
+
+        response = self.client.post(merge_url, data=merge_data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.non_binded_member.refresh_from_db()
+        self.assertEqual(self.non_binded_member.permission, "deactivated")
+        self.assertFalse(From.objects.filter(member=self.non_binded_member).exists())
+
+        # The merged equal split is split by shares, which rounds 0.1 to
+        # -0.03 and -0.07 instead of -0.04, -0.03 and -0.03.
+        response = self.client.get(
+            reverse(
+                "record-detail",
+                kwargs={"group_id": self.default_group.id, "pk": record_id},
+            )
+        )
+        self.assertEqual(response.json()["split_rule"], "shares")
+        self.assertEqual(
+            response.json()["to_members"],
+            [
+                {"member_id": str(self.owner_member.id), "amount": -0.03},
+                {"member_id": str(self.binded_member.id), "amount": -0.07},
+            ],
+        )
+        balances = dict(Balance.objects.values_list("member_id", "balance_minor"))
+        self.assertEqual(
+            balances,
+            {
+                self.owner_member.id: -10000 + 10 - 3,
+                self.binded_member.id: 10000 - 7,
+                self.non_binded_member.id: 0,
+            },
+        )
+        self.binded_member.refresh_from_db()
+        self.assertEqual(self.binded_member.primary_balance_minor, 10000 - 7)
+        self.assertEqual(
+            UserBalance.objects.get(user=self.user1).balance_minor, 10000 - 7
+        )
+
+        # can't merge the owner member or deactivated members
+        for source, target in (
+            (self.owner_member, self.binded_member),
+            (self.binded_member, self.non_binded_member),
+        ):
+            response = self.client.post(
+                merge_url, data={"source_id": source.id, "target_id": target.id}
+            )
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_merge_member_primary_balances(self):
+        """
+        Test merging a member keeps the balances consistent with the records,
+        archived or not, converting each record to the primary currency as a whole.
+        """
+        url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+        member_ids = [
+            self.owner_member.id,
+            self.binded_member.id,
+            self.non_binded_member.id,
+        ]
+        response = self.client.post(
+            url,
+            data={
+                "group_id": self.default_group.id,
+                "what": "Archived record",
+                "amount": 0.1,
+                "type": "expense",
+                "from_members": [{"amount": 0.1, "member_id": self.owner_member.id}],
+                "split_rule": "equal",
+                "split_participants": [
+                    {"member_id": member_id} for member_id in member_ids
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        archive_group_history(self.default_group, timezone.now())
+
+        # Each cent converts to 1.5 cents, rounded to 2, but the two merged
+        # cents convert to 3.
+        response = self.client.post(
+            url,
+            data={
+                "group_id": self.default_group.id,
+                "what": "Euro record",
+                "amount": 0.03,
+                "type": "expense",
+                "currency": "EUR",
+                "exchange_rate": 1.5,
+                "from_members": [{"amount": 0.03, "member_id": self.owner_member.id}],
+                "to_members": [
+                    {"amount": -0.01, "member_id": member_id}
+                    for member_id in member_ids
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(
+            reverse("member_merge", kwargs={"group_id": self.default_group.id}),
+            data={
+                "source_id": self.non_binded_member.id,
+                "target_id": self.binded_member.id,
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(check_group(self.default_group.id), [])
+        self.assertEqual(
+            dict(OpeningBalance.objects.values_list("member_id", "balance_minor")),
+            {
+                self.owner_member.id: 10 - 3,
+                self.binded_member.id: -7,
+                self.non_binded_member.id: 0,
+            },
+        )
+        self.binded_member.refresh_from_db()
+        self.assertEqual(self.binded_member.primary_balance_minor, -7 - 3)
@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
-from account import views
+from account import async_views, views
 
 router = SimpleRouter(trailing_slash=False)
 router.register("group", views.GroupViewSet, basename="group")
@@ -25,6 +25,27 @@ urlpatterns = [
         name="google_token",
     ),
     path("account/user", views.UserView.as_view(), name="user_data"),
+    path(
+        "account/user/balances",
+        views.UserBalanceView.as_view(),
+        name="user_balances",
+    ),
     path("", include(router.urls)),
     path("group/<uuid:group_id>/members", views.MembersView.as_view(), name="members"),
+    path(
+        "group/<uuid:group_id>/members/merge",
+        views.MemberMergeView.as_view(),
+        name="member_merge",
+    ),
+    path("async/group", async_views.group_list, name="async_group_list"),
+    path(
+        "async/group/<uuid:group_id>/members",
+        async_views.member_list,
+        name="async_members",
+    ),
+    path(
+        "group/<uuid:group_id>/dashboard",
+        views.GroupDashboardView.as_view(),
+        name="group_dashboard",
+    ),
 ]
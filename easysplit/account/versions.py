@@ -0,0 +1,51 @@
+from django.core.cache import cache
+
+GROUP_VERSION_KEY = "group_version_%s"
+
+
+def get_group_version(group_id):
+    """
+    Get the current data version of a group.
+
+    Args:
+        group_id (str): The ID of the group.
+
+    Returns:
+        int: The version, which grows with every change to the group's data.
+    """
+    return cache.get(GROUP_VERSION_KEY % group_id, 0)
+
+
+async def aget_group_version(group_id):
+    """
+    Asynchronously get the current data version of a group.
+
+    Args:
+        group_id (str): The ID of the group.
+
+    Returns:
+        int: The version, which grows with every change to the group's data.
+    """
+    return await cache.aget(GROUP_VERSION_KEY % group_id, 0)
+
+
+def bump_group_version(group_id):
+    """
+    Increase the data version of a group after its data changed.
+
+    Cached data of the group is keyed by version, so bumping the version
+    invalidates all of it at once.
+
+    Args:
+        group_id (str): The ID of the group.
+
+    Returns:
+        int: The new version.
+    """
+    key = GROUP_VERSION_KEY % group_id
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
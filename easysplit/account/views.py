@@ -1,5 +1,8 @@
+from functools import partial
 from typing import List
+from uuid import UUID
 
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Q, QuerySet
 from django_simple_third_party_jwt.views import GoogleLogin
@@ -16,22 +19,36 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 
-from account.models import Group, Member
+from account.change_stream import notify_group_change
+from account.fast_read import get_members_data
+from account.merge import merge_members
+from account.models import Group, Member, UserBalance
+from account.purge import soft_delete_group
+from account.rollup import apply_member_balances
 from account.serializers import (
     CustomTokenObtainPairSerializer,
     CustomTokenRefreshSerializer,
     GroupSerializer,
     MemberSerializer,
 )
+from common.money import to_major_units
+from common.renderers import ORJSONRenderer
+from common.tracing import TracedViewMixin, traced
+from record.feed import rebind_feed_items
+from record.models import Record
+from record.serializers import RecordSerializer
+from record.settlement import get_settlements
+from record.splits import get_split_member_ids
 
 
-class CustomTokenObtainPairView(TokenObtainPairView):
+class CustomTokenObtainPairView(TracedViewMixin, TokenObtainPairView):
     """
     Takes a set of user credentials and returns an access and refresh JSON web
     token pair to prove the authentication of those credentials.
     """
 
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_scope = "token"
 
     @swagger_auto_schema(
         responses={
@@ -62,13 +79,14 @@ class CustomTokenObtainPairView(TokenObtainPairView):
         return super().post(request, *args, **kwargs)
 
 
-class CustomTokenRefreshView(TokenRefreshView):
+class CustomTokenRefreshView(TracedViewMixin, TokenRefreshView):
     """
     Takes a refresh type JSON web token and returns an access type JSON web
     token if the refresh token is valid.
     """
 
     serializer_class = CustomTokenRefreshSerializer
+    throttle_scope = "token"
 
     @swagger_auto_schema(
         responses={
@@ -94,12 +112,14 @@ class CustomTokenRefreshView(TokenRefreshView):
         return super().post(request, *args, **kwargs)
 
 
-class CustomTokenVerifyView(TokenVerifyView):
+class CustomTokenVerifyView(TracedViewMixin, TokenVerifyView):
     """
     Takes a token and indicates if it is valid.  This view provides no
     information about a token's fitness for a particular use.
     """
 
+    throttle_scope = "token"
+
     @swagger_auto_schema(
         responses={
             "200": openapi.Response(
@@ -118,11 +138,13 @@ class CustomTokenVerifyView(TokenVerifyView):
         return super().post(request, *args, **kwargs)
 
 
-class CustomGoogleLoginView(GoogleLogin):
+class CustomGoogleLoginView(TracedViewMixin, GoogleLogin):
     """
     API endpoint for Google 3rd part login.
     """
 
+    throttle_scope = "token"
+
     @swagger_auto_schema(
         responses={
             "200": openapi.Response(
@@ -150,7 +172,7 @@ class CustomGoogleLoginView(GoogleLogin):
         return super().post(request, *args, **kwargs)
 
 
-class UserView(APIView):
+class UserView(TracedViewMixin, APIView):
     """
     API endpoint for retrieving the logged-in user's data.
     """
@@ -199,7 +221,52 @@ class UserView(APIView):
         )
 
 
-class GroupViewSet(ModelViewSet):
+class UserBalanceView(TracedViewMixin, APIView):
+    """
+    API endpoint for retrieving the logged-in user's balances over all groups.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    @swagger_auto_schema(
+        responses={
+            "200": openapi.Response(
+                description="",
+                examples={
+                    "application/json": [
+                        {"currency": "TWD", "balance": 150.5},
+                        {"currency": "USD", "balance": -20.0},
+                    ]
+                },
+            )
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Get the logged-in user's balances over all groups.
+
+        The balances are kept up to date when records or members change, so they
+        are read from one row per currency however many groups the user is in.
+
+        Args:
+            request (HttpRequest): The HTTP request object containing user authentication.
+
+        Returns:
+            Response: A JSON response containing a list of balances.
+                - currency (str): The currency of the balance.
+                - balance (float): The sum of the balances of the members bound
+                  to the user, positive if the user is owed money.
+        """
+        balances = (
+            UserBalance.objects.filter(user=request.user)
+            .exclude(balance_minor=0)
+            .order_by("currency")
+            .values("currency", "balance")
+        )
+        return Response(list(balances))
+
+
+class GroupViewSet(TracedViewMixin, ModelViewSet):
     """
     API endpoint for managing groups.
     """
@@ -208,6 +275,7 @@ class GroupViewSet(ModelViewSet):
     serializer_class = GroupSerializer
     permission_classes = (IsAuthenticated,)
 
+    @traced("queryset")
     def get_queryset(self):
         """
         Get the queryset for the GroupViewSet.
@@ -221,7 +289,7 @@ class GroupViewSet(ModelViewSet):
         queryset = self.queryset.filter(
             Q(members__user=self.request.user) | Q(owner=self.request.user)
         ).distinct()
-        return queryset
+        return self.get_serializer_class().prune_queryset(queryset, self.request)
 
     @swagger_auto_schema(
         operation_description="Return groups that the authenticated user is a member of."
@@ -229,13 +297,24 @@ class GroupViewSet(ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        """
+        Mark a group as deleted. Its data is purged in batches afterwards, since
+        the cascade would load every row of a large group into memory.
+
+        Args:
+            instance (Group): The group to delete.
+        """
+        soft_delete_group(instance)
+
 
-class MembersView(APIView):
+class MembersView(TracedViewMixin, APIView):
     """
     This view handles the retrieval and updating of members for a specific group.
     """
 
     permission_classes = (IsAuthenticated,)
+    throttle_scope = "members_write"
 
     @staticmethod
     def validate_post_data(group: Group, post_data: dict) -> tuple:
@@ -256,6 +335,8 @@ class MembersView(APIView):
 
             - If an update is attempted on the group owner, it is considered invalid.
             - If a deletion is attempted on the group owner, it is considered invalid.
+            - If a deletion is attempted on a participant of a rule-based split, it is
+              considered invalid.
         """
         is_valid = True
         error_msg = ""
@@ -271,6 +352,13 @@ class MembersView(APIView):
                 is_valid = False
                 error_msg = "Can't delete group owner"
 
+        # Rule-based splits have no To rows protecting their participants.
+        if is_valid and {
+            str(item["id"]) for item in post_data["delete"]
+        } & get_split_member_ids(group.id):
+            is_valid = False
+            error_msg = "Can't delete members participating in records"
+
         return is_valid, error_msg
 
     @staticmethod
@@ -310,11 +398,21 @@ class MembersView(APIView):
         create_objs = self.get_member_objs(group_id, post_data["create"])
         Member.objects.bulk_create(create_objs)
 
+        # The balances and feeds of rebound members move to their new users.
         update_objs = self.get_member_objs(group_id, post_data["update"])
+        update_members = Member.objects.filter(id__in=[obj.id for obj in update_objs])
+        apply_member_balances(update_members, -1)
         Member.objects.bulk_update(update_objs, fields=["user", "name", "permission"])
+        apply_member_balances(update_members)
+        rebind_feed_items(update_objs)
+
+        delete_members = Member.objects.filter(
+            id__in=[item["id"] for item in post_data["delete"]]
+        )
+        apply_member_balances(delete_members, -1)
+        delete_members.delete()
 
-        delete_list = post_data["delete"]
-        Member.objects.filter(id__in=[item["id"] for item in delete_list]).delete()
+        transaction.on_commit(partial(notify_group_change, group_id, "members.updated"))
 
     @swagger_auto_schema(
         responses={
@@ -350,6 +448,10 @@ class MembersView(APIView):
 
         Raises:
             NotFound (HTTP_404_NOT_FOUND): If the group with the specified group_id does not exist.
+
+        Note:
+            Unless sparse fields are requested, the members are built from plain rows
+            and rendered with orjson, giving the same output as the serializer.
         """
         group_id = kwargs["group_id"]
         try:
@@ -357,8 +459,20 @@ class MembersView(APIView):
         except Group.DoesNotExist:
             return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        if settings.FAST_READ_PATH and not {"fields", "expand"} & set(
+            request.query_params
+        ):
+            data, is_exact = get_members_data(Member.objects.filter(group__id=group.id))
+            if is_exact:
+                request.accepted_renderer = ORJSONRenderer()
+            return Response(data)
+
         member_serializer = MemberSerializer(
-            Member.objects.filter(group__id=group.id), many=True
+            MemberSerializer.prune_queryset(
+                Member.objects.filter(group__id=group.id), request
+            ),
+            many=True,
+            context={"request": request},
         )
         return Response(member_serializer.data)
 
@@ -470,6 +584,233 @@ class MembersView(APIView):
         self.update_data(group.id, post_data)
 
         member_serializer = MemberSerializer(
-            Member.objects.filter(group__id=group.id), many=True
+            MemberSerializer.prune_queryset(
+                Member.objects.filter(group__id=group.id), requset
+            ),
+            many=True,
+            context={"request": requset},
         )
         return Response(member_serializer.data)
+
+
+class MemberMergeView(TracedViewMixin, APIView):
+    """
+    API endpoint for merging a member into another member of the same group.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = "members_write"
+
+    @swagger_auto_schema(
+        responses={
+            "200": openapi.Response(
+                description="",
+                examples={
+                    "application/json": {
+                        "id": "579ca85c-dab2-44b3-a01b-eb49ef77a463",
+                        "balances": [{"balance": 300.0, "currency": "TWD"}],
+                        "created_at": "2023-06-18T09:23:04.668668+08:00",
+                        "updated_at": "2023-06-18T09:23:04.668676+08:00",
+                        "name": "User1",
+                        "permission": "edit",
+                        "user_id": 1,
+                        "group_id": "aff6e4b8-ec21-4cc8-b7ed-c5e9ea12c76b",
+                    }
+                },
+            )
+        },
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "source_id": openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    example="0b5bbd4e-0c4e-4a8f-a1a4-5a0a8e3a9d7c",
+                ),
+                "target_id": openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    example="579ca85c-dab2-44b3-a01b-eb49ef77a463",
+                ),
+            },
+            required=["source_id", "target_id"],
+        ),
+    )
+    def post(self, request, *args, **kwargs):
+        """
+        Move the splits and balances of the source member to the target member and
+        deactivate the source, e.g. to clean up a member created twice.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+            group_id (str): The ID of the group.
+
+        Returns:
+            Response: The HTTP response containing the target member's data.
+
+        Raises:
+            BadRequest (HTTP_400_BAD_REQUEST): If a member ID is missing or invalid.
+            NotFound (HTTP_404_NOT_FOUND): If the user can't access the group, or
+                one of the members does not exist.
+            Forbidden (HTTP_403_FORBIDDEN): If the user can't edit the group, or the
+                members can't be merged.
+        """
+        group = (
+            Group.objects.filter(
+                Q(members__user=request.user) | Q(owner=request.user),
+                id=kwargs["group_id"],
+            )
+            .distinct()
+            .first()
+        )
+        if group is None:
+            return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        if (
+            group.owner_id != request.user.id
+            and not group.members.filter(user=request.user, permission="edit").exists()
+        ):
+            return Response(
+                {"detail": "Permission denied"}, status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            source_id = UUID(str(request.data["source_id"]))
+            target_id = UUID(str(request.data["target_id"]))
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "source_id and target_id must be member IDs"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        members = group.members.in_bulk([source_id, target_id])
+        if source_id not in members or target_id not in members:
+            return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        source, target = members[source_id], members[target_id]
+
+        if source.id == target.id:
+            error_msg = "Can't merge a member into itself"
+        elif source.user_id is not None and source.user_id == group.owner_id:
+            error_msg = "Can't merge group owner"
+        elif "deactivated" in (source.permission, target.permission):
+            error_msg = "Can't merge deactivated members"
+        else:
+            error_msg = None
+        if error_msg:
+            return Response({"detail": error_msg}, status=status.HTTP_403_FORBIDDEN)
+
+        merge_members(source, target)
+        return Response(MemberSerializer(Member.objects.get(id=target.id)).data)
+
+
+class GroupDashboardView(TracedViewMixin, APIView):
+    """
+    API endpoint returning everything needed to open a group in one round trip.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    records_page_size = 20
+
+    @swagger_auto_schema(
+        responses={
+            "200": openapi.Response(
+                description="",
+                examples={
+                    "application/json": {
+                        "group": {
+                            "id": "aff6e4b8-ec21-4cc8-b7ed-c5e9ea12c76b",
+                            "name": "Group1",
+                            "owner": 1,
+                            "note": "",
+                            "public_permission": "limited",
+                            "primary_currency": "TWD",
+                        },
+                        "members": [
+                            {
+                                "id": "579ca85c-dab2-44b3-a01b-eb49ef77a463",
+                                "balances": [{"balance": 300.0, "currency": "TWD"}],
+                                "created_at": "2023-06-18T09:23:04.668668+08:00",
+                                "updated_at": "2023-06-18T09:23:04.668676+08:00",
+                                "name": "User1",
+                                "permission": "edit",
+                                "user_id": 1,
+                                "group_id": "aff6e4b8-ec21-4cc8-b7ed-c5e9ea12c76b",
+                            }
+                        ],
+                        "records": [],
+                        "has_more_records": False,
+                        "settlements": [
+                            {
+                                "from_member_id": "0b5bbd4e-0c4e-4a8f-a1a4-5a0a8e3a9d7c",
+                                "to_member_id": "579ca85c-dab2-44b3-a01b-eb49ef77a463",
+                                "amount": 300.0,
+                                "currency": "TWD",
+                            }
+                        ],
+                    }
+                },
+            )
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Retrieve a group with its members, balances, latest records and settlements.
+
+        The response is built from a fixed number of queries: the group, its
+        members, their balances, the first page of records and their splits.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+            group_id (str): The ID of the group.
+
+        Returns:
+            Response: The HTTP response containing the group dashboard data.
+                - group (dict): The group data.
+                - members (list): The members of the group with their balances.
+                - records (list): The latest records of the group.
+                - has_more_records (bool): Whether older records exist.
+                - settlements (list): The transfers that settle all balances.
+
+        Raises:
+            NotFound (HTTP_404_NOT_FOUND): If the user can't access the group.
+        """
+        group = (
+            Group.objects.filter(
+                Q(members__user=request.user) | Q(owner=request.user),
+                id=kwargs["group_id"],
+            )
+            .distinct()
+            .first()
+        )
+        if group is None:
+            return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        members = list(
+            Member.objects.filter(group_id=group.id).prefetch_related("balances")
+        )
+        records = list(
+            Record.objects.filter(group_id=group.id)
+            .order_by("-created_at")
+            .prefetch_related("from_members", "to_members")[
+                : self.records_page_size + 1
+            ]
+        )
+        has_more_records = len(records) > self.records_page_size
+        records = records[: self.records_page_size]
+
+        # Settle the exact minor unit balances, then convert the transfers.
+        settlements = get_settlements(
+            (member.id, balance.currency, balance.balance_minor)
+            for member in members
+            for balance in member.balances.all()
+        )
+        for settlement in settlements:
+            settlement["amount"] = to_major_units(
+                settlement["amount"], settlement["currency"]
+            )
+
+        return Response(
+            {
+                "group": GroupSerializer(group).data,
+                "members": MemberSerializer(members, many=True).data,
+                "records": RecordSerializer(records, many=True).data,
+                "has_more_records": has_more_records,
+                "settlements": settlements,
+            }
+        )
@@ -0,0 +1,93 @@
+"""
+Compare the sync and async read endpoints of a running deployment under load.
+
+Every endpoint is requested concurrently by a pool of client threads, and the
+throughput and latency percentiles are reported side by side.
+
+Usage:
+    python -m benchmarks.async_load --base-url http://localhost \
+        --token <access token> --group-id <group id> --concurrency 50
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.utils import percentile
+
+# (name, sync path, async path) of the compared endpoints.
+ENDPOINTS = [
+    ("groups", "/group", "/async/group"),
+    ("members", "/group/{group_id}/members", "/async/group/{group_id}/members"),
+    ("records", "/group/{group_id}/record", "/async/group/{group_id}/record"),
+]
+
+
+def run_load(url, token, requests_count, concurrency):
+    """
+    Request the URL concurrently and measure every request.
+
+    Args:
+        url (str): The URL to request.
+        token (str): The JWT access token.
+        requests_count (int): The total number of requests.
+        concurrency (int): The number of concurrent client threads.
+
+    Returns:
+        dict: The throughput, latency percentiles and number of errors.
+    """
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+    session.mount(
+        url, requests.adapters.HTTPAdapter(pool_maxsize=concurrency, pool_block=True)
+    )
+
+    def fetch(_):
+        start = time.perf_counter()
+        response = session.get(url)
+        return time.perf_counter() - start, response.status_code == 200
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(fetch, range(requests_count)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        "rps": requests_count / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "errors": sum(not ok for _, ok in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://localhost")
+    parser.add_argument("--token", required=True, help="JWT access token")
+    parser.add_argument("--group-id", required=True)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    print(
+        f"{'endpoint':<10}{'mode':<7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'errors':>8}"
+    )
+    for name, sync_path, async_path in ENDPOINTS:
+        for mode, path in (("sync", sync_path), ("async", async_path)):
+            url = args.base_url.rstrip("/") + path.format(group_id=args.group_id)
+            result = run_load(url, args.token, args.requests, args.concurrency)
+            print(
+                f"{name:<10}{mode:<7}{result['rps']:>9.1f}"
+                f"{result['p50'] * 1000:>9.1f}{result['p95'] * 1000:>9.1f}"
+                f"{result['p99'] * 1000:>9.1f}{result['errors']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
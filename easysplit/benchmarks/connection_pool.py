@@ -0,0 +1,74 @@
+"""
+Measure the per-request cost of opening database connections with and without
+the connection pool.
+
+Each iteration runs what a request does: connect, run one query, and close the
+connection as Django does when the request finishes. Needs the configured
+MariaDB, but only runs "SELECT 1".
+
+Usage (from the directory containing manage.py):
+    python -m benchmarks.connection_pool --requests 500
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks.utils import setup_django
+
+ENGINES = {
+    "direct": "django.db.backends.mysql",
+    "pooled": "common.db_backends.mysql_pool",
+}
+
+
+def run_requests(wrapper, requests):
+    """
+    Simulate requests that each run one query on a fresh connection.
+
+    Args:
+        wrapper (BaseDatabaseWrapper): The database connection wrapper.
+        requests (int): The number of simulated requests.
+
+    Returns:
+        list[float]: The duration of every request in seconds.
+    """
+    durations = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        wrapper.close()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--alias", default="default")
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import connections
+    from django.db.utils import load_backend
+
+    print(f"{'engine':<8}{'mean':>10}{'p50':>10}{'p95':>10}")
+    results = {}
+    for name, engine in ENGINES.items():
+        settings_dict = {**connections.settings[args.alias], "ENGINE": engine}
+        wrapper = load_backend(engine).DatabaseWrapper(settings_dict, args.alias)
+        durations = sorted(run_requests(wrapper, args.requests))
+        results[name] = statistics.mean(durations)
+        print(
+            f"{name:<8}{results[name] * 1000:>8.2f}ms"
+            f"{durations[len(durations) // 2] * 1000:>8.2f}ms"
+            f"{durations[int(len(durations) * 0.95)] * 1000:>8.2f}ms"
+        )
+    print(f"Saved {(results['direct'] - results['pooled']) * 1000:.2f}ms per request.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Measure the main endpoints through the Django test client at several dataset
+sizes.
+
+Every size gets a synthetic dataset in a throwaway test database of the
+configured engine, e.g. SQLite or a local MariaDB. Each endpoint reports its
+latency percentiles, SQL queries per request and peak memory allocated by a
+request. The results are saved as JSON, so runs can be compared across commits.
+
+Usage (from the directory containing manage.py):
+    python -m benchmarks.endpoints --sizes 100 1000 10000 --requests 50
+"""
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from benchmarks.utils import benchmark_databases, percentile, setup_django
+
+# Throttles would reject the repeated writes of one user.
+UNTHROTTLED_RATE = "1000000/min"
+
+
+def get_commit():
+    """
+    Returns:
+        str: The checked out git commit, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def create_dataset(size, seed):
+    """
+    Generate the synthetic dataset of a size.
+
+    Args:
+        size (int): The number of records of each group.
+        seed (int): The seed of the generator.
+
+    Returns:
+        Group: The benchmarked group, owned by a user with the dataset password.
+    """
+    from account.models import Group
+    from record.dataset import DatasetGenerator
+
+    prefix = f"bench{size}_"
+    DatasetGenerator(
+        users=50,
+        groups=5,
+        members_per_group=10,
+        records_per_group=size,
+        split_fanout=4,
+        currency_mix={"TWD": 8, "USD": 1, "JPY": 1},
+        seed=seed,
+        username_prefix=prefix,
+    ).generate()
+    return Group.objects.select_related("owner").get(
+        name="Group 0", owner__username__startswith=prefix
+    )
+
+
+def get_endpoints(group):
+    """
+    Get the benchmarked requests of a group.
+
+    Record updates and deletes act on the records created by the create
+    requests, so the endpoints run in order and the dataset keeps its size.
+
+    Args:
+        group (Group): The benchmarked group.
+
+    Returns:
+        list[tuple[str, Callable]]: The name of each endpoint and a function
+            sending its i-th request.
+    """
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from record.dataset import DATASET_PASSWORD
+
+    anonymous = APIClient()
+    client = APIClient()
+    response = anonymous.post(
+        reverse("token_get"),
+        {"username": group.owner.username, "password": DATASET_PASSWORD},
+    )
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access_token']}")
+
+    members = list(group.members.order_by("created_at", "id"))
+    owner_member = next(
+        member for member in members if member.user_id == group.owner_id
+    )
+    renamed = next(
+        (member for member in members if member.user_id is None), members[-1]
+    )
+    split_members = members[:3]
+    members_url = reverse("members", kwargs={"group_id": group.id})
+    records_url = reverse("record-list", kwargs={"group_id": group.id})
+    record_ids = []
+
+    def record_url(i):
+        return reverse(
+            "record-detail", kwargs={"group_id": group.id, "pk": record_ids[i]}
+        )
+
+    def record_data(amount):
+        return {
+            "group_id": str(group.id),
+            "what": "Benchmark record",
+            "amount": amount,
+            "type": "expense",
+            "from_members": [{"amount": amount, "member_id": str(owner_member.id)}],
+            "to_members": [
+                {"amount": -amount / len(split_members), "member_id": str(member.id)}
+                for member in split_members
+            ],
+        }
+
+    def create_record(i):
+        response = client.post(records_url, record_data(90), format="json")
+        if response.status_code == 201:
+            record_ids.append(response.json()["id"])
+        return response
+
+    return [
+        (
+            "token_obtain",
+            lambda i: anonymous.post(
+                reverse("token_get"),
+                {"username": group.owner.username, "password": DATASET_PASSWORD},
+            ),
+        ),
+        ("group_list", lambda i: client.get(reverse("group-list"))),
+        ("members_get", lambda i: client.get(members_url)),
+        (
+            "members_post",
+            lambda i: client.post(
+                members_url,
+                {
+                    "create": [],
+                    "update": [
+                        {
+                            "id": str(renamed.id),
+                            "user_id": None,
+                            "name": f"Renamed {i}",
+                            "permission": renamed.permission,
+                        }
+                    ],
+                    "delete": [],
+                },
+                format="json",
+            ),
+        ),
+        ("record_list", lambda i: client.get(records_url)),
+        ("record_create", create_record),
+        (
+            "record_update",
+            lambda i: client.patch(record_url(i), record_data(120), format="json"),
+        ),
+        ("record_delete", lambda i: client.delete(record_url(i))),
+    ]
+
+
+def measure(send, requests_count, memory_requests):
+    """
+    Send an endpoint's requests and measure them.
+
+    Latencies and queries are measured first. Peak memory is measured by extra
+    requests afterwards, since tracing allocations slows requests down.
+
+    Args:
+        send (Callable): The function sending the i-th request.
+        requests_count (int): The number of timed requests.
+        memory_requests (int): The number of requests traced for memory.
+
+    Returns:
+        dict: The latency percentiles in milliseconds, the median number of
+            queries, the peak memory in KiB and the number of failed requests.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    latencies = []
+    queries = []
+    errors = 0
+    for i in range(requests_count):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = send(i)
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(context.captured_queries))
+        errors += response.status_code >= 400
+
+    peak = 0
+    for i in range(requests_count, requests_count + memory_requests):
+        tracemalloc.start()
+        response = send(i)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        errors += response.status_code >= 400
+
+    latencies.sort()
+    return {
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "queries": statistics.median(queries),
+        "peak_memory_kib": round(peak / 1024, 1),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--memory-requests", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", help="JSON file of the results, endpoints-<commit>.json by default"
+    )
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test import override_settings
+
+    commit = get_commit()
+    rest_framework = {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {
+            scope: UNTHROTTLED_RATE
+            for scope in settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]
+        },
+    }
+    results = []
+    with benchmark_databases(), override_settings(REST_FRAMEWORK=rest_framework):
+        print(
+            f"{'endpoint':<15}{'records':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'queries':>9}{'peak KiB':>10}{'errors':>8}"
+        )
+        for size in args.sizes:
+            group = create_dataset(size, args.seed)
+            for name, send in get_endpoints(group):
+                # The record creates of the warm-up are updated and deleted
+                # by the warm-up too, so the indexes of every endpoint match.
+                for i in range(args.warmup):
+                    send(i)
+                result = measure(
+                    lambda i: send(args.warmup + i),
+                    args.requests,
+                    args.memory_requests,
+                )
+                results.append({"endpoint": name, "records": size, **result})
+                print(
+                    f"{name:<15}{size:>8}{result['p50_ms']:>9.1f}"
+                    f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+                    f"{result['queries']:>9}{result['peak_memory_kib']:>10.1f}"
+                    f"{result['errors']:>8}"
+                )
+        database = connection.vendor
+
+    output = args.output or f"endpoints-{commit or 'unknown'}.json"
+    with open(output, "w") as file:
+        json.dump(
+            {
+                "commit": commit,
+                "database": database,
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "requests": args.requests,
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+    print(f"Saved the results to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compare the serializer and fast read paths of the record and member lists.
+
+Usage (from the directory containing manage.py):
+    python -m benchmarks.fast_read_path --sizes 1000 10000
+"""
+
+import argparse
+
+from benchmarks.utils import benchmark_databases, setup_django, time_call
+
+
+def create_group(rows, splits_per_record):
+    """
+    Create a group with the given number of members and records.
+
+    Args:
+        rows (int): The number of members and of records to create.
+        splits_per_record (int): The number of To rows of each record.
+
+    Returns:
+        Group: The created group.
+    """
+    from django.contrib.auth.models import User
+
+    from account.models import Group, Member
+    from record.models import Balance, From, Record, To
+
+    user = User.objects.create(username=f"benchmark{rows}")
+    group = Group.objects.create(
+        owner=user, name=f"Benchmark {rows}", public_permission="limited"
+    )
+    members = Member.objects.bulk_create(
+        Member(group=group, name=f"Member {i}", permission="edit") for i in range(rows)
+    )
+    Balance.objects.bulk_create(
+        Balance(member=member, balance=i * 1.5) for i, member in enumerate(members)
+    )
+    records = Record.objects.bulk_create(
+        Record(group=group, what=f"Record {i}", amount=90.3, type="expense")
+        for i in range(rows)
+    )
+    From.objects.bulk_create(
+        From(record=record, member=members[i], amount=90.3)
+        for i, record in enumerate(records)
+    )
+    To.objects.bulk_create(
+        To(
+            record=record,
+            member=members[(i + j) % rows],
+            amount=-90.3 / splits_per_record,
+        )
+        for i, record in enumerate(records)
+        for j in range(splits_per_record)
+    )
+    return group
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--splits", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from rest_framework.renderers import JSONRenderer
+
+    from account.fast_read import get_members_data
+    from account.models import Member
+    from account.serializers import MemberSerializer
+    from common.renderers import ORJSONRenderer
+    from record.fast_read import get_records_data
+    from record.models import Record
+    from record.serializers import RecordSerializer
+
+    def serializer_records(group):
+        queryset = Record.objects.filter(group=group).prefetch_related(
+            "from_members", "to_members"
+        )
+        return JSONRenderer().render(RecordSerializer(queryset, many=True).data)
+
+    def fast_records(group):
+        data, _ = get_records_data(Record.objects.filter(group=group))
+        return ORJSONRenderer().render(data)
+
+    def serializer_members(group):
+        queryset = Member.objects.filter(group=group).prefetch_related("balances")
+        return JSONRenderer().render(MemberSerializer(queryset, many=True).data)
+
+    def fast_members(group):
+        data, _ = get_members_data(Member.objects.filter(group=group))
+        return ORJSONRenderer().render(data)
+
+    with benchmark_databases():
+        print(
+            f"{'endpoint':<10}{'rows':>8}{'serializer':>14}{'fast':>12}{'speedup':>10}"
+        )
+        for size in args.sizes:
+            group = create_group(size, args.splits)
+            for name, slow, fast in (
+                ("records", serializer_records, fast_records),
+                ("members", serializer_members, fast_members),
+            ):
+                slow_time, slow_body = time_call(lambda: slow(group), args.repeat)
+                fast_time, fast_body = time_call(lambda: fast(group), args.repeat)
+                if slow_body != fast_body:
+                    raise AssertionError(f"{name} output differs at {size} rows")
+                print(
+                    f"{name:<10}{size:>8}{slow_time * 1000:>12.1f}ms"
+                    f"{fast_time * 1000:>10.1f}ms{slow_time / fast_time:>9.1f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
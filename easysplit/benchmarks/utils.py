@@ -0,0 +1,72 @@
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup_django():
+    """
+    Configure Django for a standalone benchmark script.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "easysplit.settings")
+    django.setup()
+
+
+@contextmanager
+def benchmark_databases():
+    """
+    Create throwaway test databases for the duration of a benchmark.
+
+    The configured databases are only used to create the test databases, so
+    benchmarks never touch real data.
+    """
+    from django.test.utils import (
+        setup_databases,
+        setup_test_environment,
+        teardown_databases,
+        teardown_test_environment,
+    )
+
+    setup_test_environment(debug=False)
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+def time_call(func, repeat):
+    """
+    Call the function repeatedly and measure its duration.
+
+    Args:
+        func (Callable): The function to call.
+        repeat (int): The number of calls.
+
+    Returns:
+        tuple[float, object]: The median duration in seconds and the last result.
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def percentile(values, fraction):
+    """
+    Get the value below which the given fraction of the sorted values fall.
+
+    Args:
+        values (list[float]): The sorted values.
+        fraction (float): The fraction between 0 and 1.
+
+    Returns:
+        float: The percentile value.
+    """
+    return values[min(len(values) - 1, int(len(values) * fraction))]
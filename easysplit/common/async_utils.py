@@ -0,0 +1,53 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from common.renderers import ORJSONRenderer
+
+
+def database_sync_to_async(func):
+    """
+    Make a function using the ORM awaitable without blocking the event loop.
+
+    The function runs in a thread pool instead of the single thread shared by
+    thread-sensitive code, so slow queries of concurrent requests overlap. The
+    thread's connections are released afterwards (back to the pool with the
+    pooled backend), so idle threads don't hold connections.
+
+    Args:
+        func (Callable): The synchronous function.
+
+    Returns:
+        Callable: The coroutine function running it.
+    """
+
+    @wraps(func)
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+def json_response(data, is_exact=True, status=200):
+    """
+    Render data into a JSON response like the DRF views do.
+
+    Args:
+        data (object): The data to render.
+        is_exact (bool): Whether orjson renders the data like the standard renderer.
+        status (int): The HTTP status code.
+
+    Returns:
+        HttpResponse: The JSON response.
+    """
+    renderer = ORJSONRenderer() if is_exact else JSONRenderer()
+    return HttpResponse(
+        renderer.render(data), content_type=renderer.media_type, status=status
+    )
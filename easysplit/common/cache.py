@@ -0,0 +1,89 @@
+from contextlib import contextmanager
+
+from django.core.cache.backends.redis import RedisCache as BaseRedisCache
+
+from common.metrics import CACHE_REQUESTS
+from common.profiling import timed
+from common.tracing import SPAN_KIND_CLIENT, traced
+
+# Returned by get() for missing keys, so hits of None values count as hits.
+MISSING = object()
+
+
+@contextmanager
+def cache_call(operation):
+    """
+    Count the time of a cache call to the "cache" category of the request's
+    profile, and trace it as a client span.
+
+    Args:
+        operation (str): The cache operation, e.g. "get".
+    """
+    with timed("cache"), traced(
+        f"cache {operation}", {"cache.operation": operation}, SPAN_KIND_CLIENT
+    ):
+        yield
+
+
+class InstrumentedCacheMixin:
+    """
+    Cache backend mixin profiling and tracing cache calls, and counting the hits
+    and misses of lookups.
+    """
+
+    def get(self, key, default=None, version=None):
+        with cache_call("get"):
+            value = super().get(key, MISSING, version)
+        if value is MISSING:
+            CACHE_REQUESTS.inc(result="miss")
+            return default
+        CACHE_REQUESTS.inc(result="hit")
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with cache_call("get_many"):
+            values = super().get_many(keys, version)
+        if values:
+            CACHE_REQUESTS.inc(len(values), result="hit")
+        if len(keys) > len(values):
+            CACHE_REQUESTS.inc(len(keys) - len(values), result="miss")
+        return values
+
+    def set(self, *args, **kwargs):
+        with cache_call("set"):
+            return super().set(*args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        with cache_call("set_many"):
+            return super().set_many(*args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        with cache_call("add"):
+            return super().add(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with cache_call("delete"):
+            return super().delete(*args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        with cache_call("delete_many"):
+            return super().delete_many(*args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        with cache_call("incr"):
+            return super().incr(*args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        with cache_call("touch"):
+            return super().touch(*args, **kwargs)
+
+    def has_key(self, *args, **kwargs):
+        with cache_call("has_key"):
+            return super().has_key(*args, **kwargs)
+
+
+class RedisCache(InstrumentedCacheMixin, BaseRedisCache):
+    """
+    Redis cache backend whose calls are profiled, traced and counted.
+    """
@@ -0,0 +1,90 @@
+import os
+import threading
+from functools import partial
+
+from django.db.backends.mysql import base as mysql
+from django.utils.asyncio import async_unsafe
+from pymysql.constants import SERVER_STATUS
+
+from common.db_backends.mysql_pool.pool import ConnectionPool
+
+# Pools by process ID, database alias and server. A forked uWSGI worker never
+# reuses the sockets of its parent.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _ping(connection):
+    connection.ping(reconnect=False)
+
+
+class DatabaseWrapper(mysql.DatabaseWrapper):
+    """
+    MySQL backend handing out pooled connections instead of opening new ones.
+
+    Configure the pool with OPTIONS["pool"], a dict of ConnectionPool keyword
+    arguments (max_size, timeout, recycle). Closing a connection, e.g. at the
+    end of each request, returns it to the pool of the worker process.
+    """
+
+    is_reused_connection = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pool_options = kwargs.pop("pool", {})
+        return kwargs
+
+    def get_pool(self, conn_params):
+        """
+        Get the pool of this database alias in the current process.
+
+        Args:
+            conn_params (dict): The parameters to open new connections with.
+
+        Returns:
+            ConnectionPool: The connection pool.
+        """
+        key = (
+            os.getpid(),
+            self.alias,
+            conn_params.get("host"),
+            conn_params.get("port"),
+            conn_params.get("database"),
+            conn_params.get("user"),
+        )
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = ConnectionPool(
+                    connect=partial(
+                        mysql.DatabaseWrapper.get_new_connection, self, conn_params
+                    ),
+                    health_check=_ping,
+                    **self.pool_options,
+                )
+            return _pools[key]
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        connection, is_new = self.pool.acquire()
+        self.is_reused_connection = not is_new
+        return connection
+
+    def init_connection_state(self):
+        # Session settings survive in pooled connections, so only new
+        # connections need them.
+        if not self.is_reused_connection:
+            super().init_connection_state()
+
+    @async_unsafe
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        reusable = not self.errors_occurred or self.is_usable()
+        if reusable and connection.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            try:
+                connection.rollback()
+            except Exception:
+                reusable = False
+        self.pool.release(connection, reusable=reusable)
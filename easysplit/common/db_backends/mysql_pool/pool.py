@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections shared by the threads of a process.
+
+    Idle connections are reused last-in first-out, so the warmest connections
+    are handed out first and the others age out. At most `max_size` connections
+    are open at once; callers wait up to `timeout` seconds for one to be free.
+    """
+
+    def __init__(self, connect, health_check, max_size, timeout=5, recycle=None):
+        """
+        Args:
+            connect (Callable): Open a new connection.
+            health_check (Callable): Raise if the given connection is unusable.
+            max_size (int): The maximum number of open connections.
+            timeout (float): The seconds to wait for a free connection.
+            recycle (float): The seconds after which a connection is reopened,
+                e.g. to stay under the server's wait_timeout.
+        """
+        self.connect = connect
+        self.health_check = health_check
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._opened_at = {}
+
+    def acquire(self):
+        """
+        Take a healthy connection from the pool, opening one if none is idle.
+
+        Returns:
+            tuple[object, bool]: The connection and whether it was just opened.
+
+        Raises:
+            OperationalError: If no connection is free within the timeout.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                f"No database connection was free within {self.timeout} seconds "
+                f"(pool size {self.max_size})."
+            )
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    break
+                if self._is_usable(connection):
+                    return connection, False
+                self._discard(connection)
+
+            connection = self.connect()
+            with self._lock:
+                self._opened_at[id(connection)] = time.monotonic()
+            return connection, True
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, reusable=True):
+        """
+        Return a connection to the pool.
+
+        Args:
+            connection (object): A connection taken with acquire().
+            reusable (bool): False to close the connection instead of keeping it.
+        """
+        try:
+            if reusable:
+                with self._lock:
+                    self._idle.append(connection)
+            else:
+                self._discard(connection)
+        finally:
+            self._slots.release()
+
+    def close_idle(self):
+        """
+        Close every idle connection of the pool.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection in idle:
+            self._discard(connection)
+
+    def _is_usable(self, connection):
+        opened_at = self._opened_at.get(id(connection), 0)
+        if self.recycle is not None and time.monotonic() - opened_at > self.recycle:
+            return False
+        try:
+            self.health_check(connection)
+        except Exception:
+            return False
+        return True
+
+    def _discard(self, connection):
+        with self._lock:
+            self._opened_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
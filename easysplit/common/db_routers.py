@@ -0,0 +1,51 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# The replica serving reads of the current request, or None to use the primary.
+_read_replica = ContextVar("read_replica", default=None)
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    """
+    Route reads inside the block to one randomly chosen replica.
+
+    Args:
+        enabled (bool): Whether reads may go to a replica at all.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    token = _read_replica.set(random.choice(replicas) if enabled and replicas else None)
+    try:
+        yield
+    finally:
+        _read_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Database router sending reads to a replica when the request allows it.
+
+    Reads only go to the replica chosen by `read_from_replica()`, and never
+    while a transaction is open on the primary, so writes and everything inside
+    `transaction.atomic` stay on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = _read_replica.get()
+        if replica is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so every object lives in the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from loguru import logger
+
+
+class InProcessSubscription:
+    """
+    Subscription of one consumer to a channel of the in-process broker.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    async def get(self):
+        """
+        Wait for the next message of the channel.
+
+        Returns:
+            dict: The published message.
+        """
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """
+    Publish/subscribe broker delivering messages within the current process.
+
+    It is meant for local development and tests, where a single process serves
+    all requests. Messages may be published from any thread.
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        """
+        Deliver a message to every current subscriber of the channel.
+
+        Args:
+            channel (str): The channel name.
+            message (dict): The JSON serializable message.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions[channel])
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.queue.put_nowait, message
+                )
+            except RuntimeError:
+                # The subscriber's event loop has been closed.
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        """
+        Subscribe to the channel for the duration of the block.
+
+        Args:
+            channel (str): The channel name.
+
+        Yields:
+            InProcessSubscription: The subscription to get messages from.
+        """
+        subscription = InProcessSubscription()
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                self._subscriptions[channel].discard(subscription)
+                if not self._subscriptions[channel]:
+                    del self._subscriptions[channel]
+
+
+class RedisSubscription:
+    """
+    Subscription of one consumer to a Redis pub/sub channel.
+    """
+
+    def __init__(self, pubsub):
+        self.messages = pubsub.listen()
+
+    async def get(self):
+        """
+        Wait for the next message of the channel.
+
+        Returns:
+            dict: The published message.
+        """
+        async for message in self.messages:
+            if message["type"] == "message":
+                return json.loads(message["data"])
+
+
+class RedisBroker:
+    """
+    Publish/subscribe broker on Redis pub/sub, shared by all server processes.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+
+    def publish(self, channel, message):
+        """
+        Publish a message to the channel.
+
+        Failures are only logged, since subscribers catch up with the next
+        message anyway.
+
+        Args:
+            channel (str): The channel name.
+            message (dict): The JSON serializable message.
+        """
+        try:
+            self.client.publish(channel, json.dumps(message))
+        except redis.RedisError:
+            logger.exception(f"Failed to publish to {channel}")
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        """
+        Subscribe to the channel for the duration of the block.
+
+        Args:
+            channel (str): The channel name.
+
+        Yields:
+            RedisSubscription: The subscription to get messages from.
+        """
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            yield RedisSubscription(pubsub)
+        finally:
+            await pubsub.reset()
+            await client.close()
+
+
+_brokers = {}
+
+
+def get_broker():
+    """
+    Get the broker selected by the `CHANGE_STREAM_BROKER` setting.
+
+    Returns:
+        InProcessBroker | RedisBroker: The broker shared by the whole process.
+
+    Raises:
+        ImproperlyConfigured: If the setting names an unknown broker.
+    """
+    name = settings.CHANGE_STREAM_BROKER
+    if name not in _brokers:
+        if name == "redis":
+            _brokers[name] = RedisBroker(settings.CHANGE_STREAM_REDIS_URL)
+        elif name == "memory":
+            _brokers[name] = InProcessBroker()
+        else:
+            raise ImproperlyConfigured(f"Unknown CHANGE_STREAM_BROKER: {name}")
+    return _brokers[name]
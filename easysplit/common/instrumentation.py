@@ -0,0 +1,46 @@
+import time
+
+from common.metrics import record_query
+from common.profiling import add_query_time
+from common.query_log import log_query
+from common.tracing import start_query_span
+
+
+def instrument_query(execute, sql, params, many, context):
+    """
+    Execute wrapper timing each query once for the trace, the profile, the
+    metrics and the query log of the current request.
+
+    Each of them does nothing when it is off or outside its requests.
+    """
+    connection = context["connection"]
+    span = start_query_span(sql, connection)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    except Exception as error:
+        if span is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        if span is not None:
+            span.finish()
+        add_query_time(duration)
+        record_query(connection.alias, duration)
+        log_query(sql, connection.alias, duration)
+
+
+def install_query_instrumentation(connection, **kwargs):
+    """
+    Add the query instrumentation to a database connection, e.g. when it is
+    created.
+
+    It stays installed, since queries of async views run on the connections of
+    worker threads.
+
+    Args:
+        connection (BaseDatabaseWrapper): The connection.
+    """
+    if instrument_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(instrument_query)
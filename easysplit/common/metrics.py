@@ -0,0 +1,477 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Upper bounds of the latency histograms in seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 1)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Size of a new values file, doubled whenever it is full.
+INITIAL_FILE_SIZE = 1 << 16
+# Header of a values file: the number of bytes in use.
+HEADER = struct.Struct("q")
+VALUE = struct.Struct("d")
+
+_registry = []
+# The number of queries of the current request, in a list so that threads
+# running the request's queries can update it.
+_request_queries = ContextVar("request_queries", default=None)
+_values = None
+_values_path = None
+_values_lock = threading.Lock()
+
+
+def get_key_size(key):
+    """
+    Get the padded size of an encoded key, so the value after it is aligned.
+
+    Args:
+        key (bytes): The UTF-8 encoded key.
+
+    Returns:
+        int: The size in bytes.
+    """
+    return len(key) + (8 - (4 + len(key)) % 8) % 8
+
+
+def read_values(data):
+    """
+    Read the values of a values file.
+
+    Args:
+        data (bytes | mmap): The content of the file.
+
+    Yields:
+        tuple[str, float, int]: The key, value and offset of the value.
+    """
+    used = HEADER.unpack_from(data, 0)[0]
+    position = HEADER.size
+    while position < used:
+        length = struct.unpack_from("i", data, position)[0]
+        position += 4
+        key = bytes(data[position : position + length]).decode()
+        position += get_key_size(key.encode())
+        yield key, VALUE.unpack_from(data, position)[0], position
+        position += VALUE.size
+
+
+class MmapedValues:
+    """
+    The metric values of one process, in a memory-mapped file.
+
+    Every process only writes its own file, so updates need no locks between
+    processes, and the metrics endpoint of any process adds up the files of all
+    of them. The file holds the number of bytes in use, followed by entries of a
+    4-byte key length, the UTF-8 key padded to 8 bytes and the value as a double.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The path of the file, created if missing.
+        """
+        self.file = open(path, "a+b")
+        size = os.fstat(self.file.fileno()).st_size
+        if size == 0:
+            self.file.truncate(INITIAL_FILE_SIZE)
+            size = INITIAL_FILE_SIZE
+        self.capacity = size
+        self.mmap = mmap.mmap(self.file.fileno(), self.capacity)
+        self.used = HEADER.unpack_from(self.mmap, 0)[0]
+        if not self.used:
+            self.used = HEADER.size
+            HEADER.pack_into(self.mmap, 0, self.used)
+        self.positions = {key: position for key, _, position in read_values(self.mmap)}
+
+    def add(self, key, amount):
+        """
+        Add an amount to a value.
+
+        Args:
+            key (str): The key of the value, created with 0 if missing.
+            amount (float): The amount to add.
+        """
+        position = self.positions.get(key)
+        if position is None:
+            position = self.create_value(key)
+        value = VALUE.unpack_from(self.mmap, position)[0]
+        VALUE.pack_into(self.mmap, position, value + amount)
+
+    def create_value(self, key):
+        """
+        Append a value of 0 to the file.
+
+        Args:
+            key (str): The key of the value.
+
+        Returns:
+            int: The offset of the value.
+        """
+        encoded = key.encode()
+        key_size = get_key_size(encoded)
+        entry = struct.pack(
+            f"i{key_size}sd", len(encoded), encoded.ljust(key_size, b" "), 0.0
+        )
+        while self.used + len(entry) > self.capacity:
+            self.capacity *= 2
+            self.file.truncate(self.capacity)
+            self.mmap.close()
+            self.mmap = mmap.mmap(self.file.fileno(), self.capacity)
+
+        self.mmap[self.used : self.used + len(entry)] = entry
+        position = self.used + 4 + key_size
+        self.used += len(entry)
+        # The entry is complete before readers see it.
+        HEADER.pack_into(self.mmap, 0, self.used)
+        self.positions[key] = position
+        return position
+
+
+def add_value(key, amount):
+    """
+    Add an amount to a value of the current process.
+
+    The file is opened on first use in each process, since uWSGI forks its
+    workers after loading the application, so the file name holds the pid.
+
+    Args:
+        key (str): The key of the value.
+        amount (float): The amount to add.
+    """
+    global _values, _values_path
+
+    if not settings.METRICS_ENABLED:
+        return
+    with _values_lock:
+        path = os.path.join(settings.METRICS_DIR, f"{os.getpid()}.db")
+        if _values_path != path:
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            _values = MmapedValues(path)
+            _values_path = path
+        _values.add(key, amount)
+
+
+def collect_values():
+    """
+    Add up the values of all processes.
+
+    Returns:
+        dict[str, float]: The total of each key.
+    """
+    totals = defaultdict(float)
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, "*.db")):
+        with open(path, "rb") as file:
+            data = file.read()
+        if len(data) < HEADER.size:
+            continue
+        for key, value, _ in read_values(data):
+            totals[key] += value
+    return totals
+
+
+class Metric:
+    """
+    Base class of the metrics, whose values are shared between processes.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Args:
+            name (str): The metric name, e.g. "easysplit_http_requests_total".
+            documentation (str): The help text.
+            labelnames (tuple[str]): The names of the labels.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        _registry.append(self)
+
+    def add(self, sample, labels, amount):
+        """
+        Add an amount to a sample.
+
+        Args:
+            sample (str): The sample name, e.g. with a "_bucket" suffix.
+            labels (dict[str, str]): The labels of the sample.
+            amount (float): The amount to add.
+        """
+        key = json.dumps([self.name, sample, labels], sort_keys=True)
+        add_value(key, amount)
+
+    def get_labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}.")
+        return {name: str(value) for name, value in labels.items()}
+
+
+class Counter(Metric):
+    """
+    A value which only goes up, like the number of requests.
+    """
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        """
+        Increase the counter.
+
+        Args:
+            amount (float): The increase.
+            **labels: The labels of the counted sample.
+        """
+        self.add(self.name, self.get_labels(labels), amount)
+
+
+class Histogram(Metric):
+    """
+    Counts of observed values in cumulative buckets, with their sum and count.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        """
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labelnames (tuple[str]): The names of the labels.
+            buckets (tuple[float]): The upper bounds of the buckets, ascending.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        """
+        Count an observed value.
+
+        Args:
+            value (float): The value, e.g. a duration in seconds.
+            **labels: The labels of the sample.
+        """
+        labels = self.get_labels(labels)
+        bound = next((bucket for bucket in self.buckets if value <= bucket), None)
+        le = "+Inf" if bound is None else format_number(bound)
+        self.add(f"{self.name}_bucket", {**labels, "le": le}, 1)
+        self.add(f"{self.name}_sum", labels, value)
+        self.add(f"{self.name}_count", labels, 1)
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the duration of the block, or of the decorated function, in
+        seconds.
+
+        Args:
+            **labels: The labels of the sample.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+def format_number(value):
+    """
+    Format a number in the text exposition format.
+
+    Args:
+        value (float): The number.
+
+    Returns:
+        str: The number, without a decimal point for integers.
+    """
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def format_labels(labels):
+    """
+    Format the labels of a sample in the text exposition format.
+
+    Args:
+        labels (dict[str, str]): The labels.
+
+    Returns:
+        str: The labels in braces, or an empty string without labels.
+    """
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\""))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def generate_latest():
+    """
+    Render the metrics of all processes in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition.
+    """
+    samples_by_metric = defaultdict(list)
+    for key, value in collect_values().items():
+        name, sample, labels = json.loads(key)
+        samples_by_metric[name].append((sample, labels, value))
+
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        samples = samples_by_metric[metric.name]
+        if metric.type == "histogram":
+            samples = get_cumulative_buckets(samples)
+        for sample, labels, value in sorted(samples, key=get_sample_order):
+            lines.append(f"{sample}{format_labels(labels)} {format_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def get_cumulative_buckets(samples):
+    """
+    Turn the counts of each histogram bucket into cumulative counts.
+
+    Args:
+        samples (list[tuple[str, dict, float]]): The samples of a histogram.
+
+    Returns:
+        list[tuple[str, dict, float]]: The samples with every bucket of each
+            label set, counting the values up to its bound.
+    """
+    buckets = defaultdict(dict)
+    others = []
+    for sample, labels, value in samples:
+        if sample.endswith("_bucket"):
+            labels = dict(labels)
+            le = labels.pop("le")
+            buckets[(sample, json.dumps(labels, sort_keys=True))][le] = value
+        else:
+            others.append((sample, labels, value))
+
+    cumulative = []
+    for (sample, labels), counts in buckets.items():
+        bounds = [format_number(bucket) for bucket in get_buckets(sample)]
+        total = 0
+        for le in bounds + ["+Inf"]:
+            total += counts.get(le, 0)
+            cumulative.append((sample, {**json.loads(labels), "le": le}, total))
+    return cumulative + others
+
+
+def get_buckets(sample):
+    """
+    Get the bucket bounds of a histogram's bucket sample.
+
+    Args:
+        sample (str): The sample name, ending with "_bucket".
+
+    Returns:
+        tuple[float]: The bounds.
+    """
+    name = sample[: -len("_bucket")]
+    return next(metric.buckets for metric in _registry if metric.name == name)
+
+
+def get_sample_order(sample):
+    """
+    Sort samples by name and labels, with buckets in ascending order.
+    """
+    name, labels, _ = sample
+    le = labels.get("le")
+    bound = float("inf") if le == "+Inf" else float(le or 0)
+    labels = {key: value for key, value in labels.items() if key != "le"}
+    return name, json.dumps(labels, sort_keys=True), bound
+
+
+REQUESTS_TOTAL = Counter(
+    "easysplit_http_requests_total",
+    "Number of HTTP requests.",
+    ("view", "method", "status"),
+)
+REQUEST_DURATION = Histogram(
+    "easysplit_http_request_duration_seconds",
+    "Duration of HTTP requests in seconds.",
+    ("view", "method"),
+)
+REQUEST_QUERIES = Histogram(
+    "easysplit_http_request_queries",
+    "Number of SQL queries per HTTP request.",
+    ("view",),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+QUERY_DURATION = Histogram(
+    "easysplit_db_query_duration_seconds",
+    "Duration of SQL queries in seconds.",
+    ("alias",),
+    buckets=QUERY_DURATION_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "easysplit_cache_requests_total",
+    "Number of cache lookups by result, hit or miss.",
+    ("result",),
+)
+BALANCE_RECOMPUTE_DURATION = Histogram(
+    "easysplit_balance_recompute_duration_seconds",
+    "Duration of balance recomputations in seconds.",
+    ("operation",),
+)
+
+
+def record_query(alias, duration):
+    """
+    Observe the duration of a query and count it for the current request.
+
+    Args:
+        alias (str): The alias of the query's database.
+        duration (float): The duration of the query in seconds.
+    """
+    if not settings.METRICS_ENABLED:
+        return
+    QUERY_DURATION.observe(duration, alias=alias)
+    queries = _request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+
+
+def start_request_metrics():
+    """
+    Start counting the queries of the current request.
+
+    Returns:
+        tuple[list[int], Token]: The query count and the token to reset the
+            context with.
+    """
+    queries = [0]
+    return queries, _request_queries.set(queries)
+
+
+def finish_request_metrics(request, response, duration, queries, token):
+    """
+    Record the metrics of a finished request.
+
+    Args:
+        request (HttpRequest): The request.
+        response (HttpResponse): The response.
+        duration (float): The duration of the request in seconds.
+        queries (list[int]): The query count returned by start_request_metrics.
+        token (Token): The token returned by start_request_metrics.
+    """
+    _request_queries.reset(token)
+    match = request.resolver_match
+    view = match.view_name if match is not None else "unmatched"
+    REQUESTS_TOTAL.inc(view=view, method=request.method, status=response.status_code)
+    REQUEST_DURATION.observe(duration, view=view, method=request.method)
+    REQUEST_QUERIES.observe(queries[0], view=view)
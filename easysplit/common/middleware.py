@@ -0,0 +1,281 @@
+import asyncio
+import cProfile
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+from loguru import logger
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from common.async_utils import database_sync_to_async
+from common.db_routers import read_from_replica
+from common.instrumentation import install_query_instrumentation
+from common.metrics import finish_request_metrics, start_request_metrics
+from common.profiling import (
+    dump_profile,
+    get_current_profile,
+    start_profile,
+    stop_profile,
+)
+from common.query_log import finish_query_log, start_query_log
+from common.tracing import finish_trace, get_current_span, start_trace
+
+
+def get_request_user_id(request):
+    """
+    Get the ID of the user making the request without querying the database.
+
+    The ID is read from the claims of a valid JWT access token, or else from the
+    session.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        The user ID, or None for anonymous requests.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return request.session.get(SESSION_KEY)
+    # Malformed headers and invalid tokens are rejected by DRF's authentication
+    # later on.
+    try:
+        raw_token = authentication.get_raw_token(header)
+        if raw_token is None:
+            return request.session.get(SESSION_KEY)
+        token = authentication.get_validated_token(raw_token)
+    except AuthenticationFailed:
+        return None
+    return token.get(jwt_settings.USER_ID_CLAIM)
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """
+    Middleware sending the reads of safe requests to a read replica.
+
+    After a user makes a write request, their requests stick to the primary for
+    `REPLICA_STICKY_SECONDS`, so they never read data older than their own
+    writes while the replicas catch up.
+    """
+
+    sticky_key_format = "replica_sticky_%s"
+
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            if not settings.DATABASE_REPLICAS:
+                return await get_response(request)
+
+            user_id = await database_sync_to_async(get_request_user_id)(request)
+            is_read = request.method in SAFE_METHODS
+            is_sticky = user_id is not None and await cache.aget(
+                sticky_key_format % user_id
+            )
+
+            with read_from_replica(is_read and not is_sticky):
+                response = await get_response(request)
+
+            if not is_read and user_id is not None:
+                await cache.aset(
+                    sticky_key_format % user_id, True, settings.REPLICA_STICKY_SECONDS
+                )
+            return response
+
+    else:
+
+        def middleware(request):
+            if not settings.DATABASE_REPLICAS:
+                return get_response(request)
+
+            user_id = get_request_user_id(request)
+            is_read = request.method in SAFE_METHODS
+            is_sticky = user_id is not None and cache.get(sticky_key_format % user_id)
+
+            with read_from_replica(is_read and not is_sticky):
+                response = get_response(request)
+
+            if not is_read and user_id is not None:
+                cache.set(
+                    sticky_key_format % user_id, True, settings.REPLICA_STICKY_SECONDS
+                )
+            return response
+
+    return middleware
+
+
+def finish_profile(request, response, profile, profiler=None):
+    """
+    Add a request's timings to its response and log them.
+
+    Args:
+        request (HttpRequest): The request.
+        response (HttpResponse): The response.
+        profile (RequestProfile): The profile of the request.
+        profiler (cProfile.Profile): The profiler of a sampled request, whose
+            stats are dumped if the request was slow.
+    """
+    timings = profile.get_timings()
+    response["Server-Timing"] = profile.get_server_timing()
+
+    fields = {
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        **{f"{name}_ms": round(duration, 2) for name, duration in timings.items()},
+        **{f"{name}_calls": count for name, count in profile.counts.items()},
+    }
+    if profiler is not None and timings["total"] >= settings.REQUEST_PROFILING_SLOW_MS:
+        fields["profile_path"] = dump_profile(profiler, request, timings["total"])
+    logger.bind(**fields).info(
+        f"{request.method} {request.path} {response.status_code} "
+        f"in {timings['total']:.1f}ms"
+    )
+
+
+class InstrumentationMiddleware:
+    """
+    Middleware running the opt-in instrumentation of each request.
+
+    - Tracing exports the spans of a sample of the requests,
+      `TRACING_SAMPLE_RATE`, to `TRACING_FILE`. The views, serializers, queries
+      and cache calls of a traced request add their spans to its trace.
+    - Profiling, `REQUEST_PROFILING`, sends the time of queries, cache calls,
+      serializers, rendering and the rest in the view in a `Server-Timing`
+      header and logs it. A sample of the sync requests runs under cProfile,
+      and its stats are dumped to `REQUEST_PROFILING_DIR` if the request takes
+      `REQUEST_PROFILING_SLOW_MS` or longer.
+    - Metrics, `METRICS_ENABLED`, record the latency, status and number of
+      queries of each request for the metrics endpoint.
+    - The query log, `QUERY_LOG`, logs the slow queries of each request and the
+      query shapes it repeats, e.g. in a loop over members, with the view and
+      the call site which ran them. In strict mode, for tests, repeats from
+      call sites which are not in `QUERY_LOG_ALLOWED_REPEATS` fail the request
+      with an NPlusOneError.
+
+    One execute wrapper, instrument_query, times each query for all of them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """
+        Raises:
+            MiddlewareNotUsed: If all the instrumentation is off, so it costs
+                nothing.
+        """
+        self.tracing = bool(settings.TRACING_SAMPLE_RATE)
+        self.profiling = settings.REQUEST_PROFILING
+        self.metrics = settings.METRICS_ENABLED
+        self.query_log = settings.QUERY_LOG or settings.QUERY_LOG_STRICT
+        if not (self.tracing or self.profiling or self.metrics or self.query_log):
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function for Django.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+        connection_created.connect(install_query_instrumentation)
+        for connection in connections.all():
+            install_query_instrumentation(connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        profiler = None
+        if self.profiling and random.random() < settings.REQUEST_PROFILING_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+        state = self.start(request)
+        if profiler is None:
+            response = self.get_response(request)
+        else:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        self.finish(request, response, state, profiler)
+        return response
+
+    async def __acall__(self, request):
+        state = self.start(request)
+        response = await self.get_response(request)
+        self.finish(request, response, state)
+        return response
+
+    def start(self, request):
+        """
+        Start the enabled instrumentation of a request.
+
+        Args:
+            request (HttpRequest): The request.
+
+        Returns:
+            dict: The state of each enabled instrumentation, for finish.
+        """
+        state = {}
+        if self.tracing:
+            state["trace"] = start_trace(request)
+        if self.profiling:
+            state["profile"] = start_profile()
+        if self.metrics:
+            state["metrics"] = (*start_request_metrics(), time.perf_counter())
+        if self.query_log:
+            state["query_log"] = start_query_log(request)
+        return state
+
+    def finish(self, request, response, state, profiler=None):
+        """
+        Finish the instrumentation of a request.
+
+        The query log finishes last, since it fails the request in strict mode.
+
+        Args:
+            request (HttpRequest): The request.
+            response (HttpResponse): The response.
+            state (dict): The state returned by start.
+            profiler (cProfile.Profile): The profiler of a sampled request.
+        """
+        if "metrics" in state:
+            queries, token, start = state["metrics"]
+            finish_request_metrics(
+                request, response, time.perf_counter() - start, queries, token
+            )
+        if "profile" in state:
+            profile, token = state["profile"]
+            stop_profile(token)
+            finish_profile(request, response, profile, profiler)
+        if "trace" in state:
+            root, token = state["trace"]
+            if root is not None:
+                finish_trace(request, response, root, token)
+        if "query_log" in state:
+            finish_query_log(*state["query_log"])
+
+    def process_template_response(self, request, response):
+        """
+        Time and trace the rendering of DRF responses, which happens right after
+        this.
+        """
+        profile = get_current_profile()
+        if profile is not None and profile.enter("render"):
+            response.add_post_render_callback(lambda response: profile.exit())
+        parent = get_current_span()
+        if parent is not None:
+            span = parent.trace.start_span("render", parent)
+            if span is not None:
+                response.add_post_render_callback(lambda response: span.finish())
+        return response
@@ -4,7 +4,17 @@ from django.db import models
 
 CURRENCY_CHOICES = [
     ("TWD", "TWD"),
+    ("USD", "USD"),
+    ("EUR", "EUR"),
+    ("JPY", "JPY"),
 ]
+# Number of decimal places of each currency's minor unit (ISO 4217).
+CURRENCY_MINOR_UNITS = {
+    "TWD": 2,
+    "USD": 2,
+    "EUR": 2,
+    "JPY": 0,
+}
 
 
 class BasicModelMixin(models.Model):
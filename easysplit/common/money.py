@@ -0,0 +1,82 @@
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+from common.models import CURRENCY_MINOR_UNITS
+
+
+def get_minor_unit_factor(currency):
+    """
+    Get the number of minor units in one major unit of a currency.
+
+    Args:
+        currency (str): The currency code.
+
+    Returns:
+        int: The factor, e.g. 100 for a currency with cents.
+    """
+    return 10 ** CURRENCY_MINOR_UNITS.get(currency, 2)
+
+
+def to_minor_units(amount, currency):
+    """
+    Convert an amount in major units to integer minor units, rounding half up.
+
+    The amount goes through its shortest decimal representation, so floats like
+    0.29 convert to exactly 29 cents.
+
+    Args:
+        amount (float | int | Decimal): The amount in major units.
+        currency (str): The currency code.
+
+    Returns:
+        int: The amount in minor units.
+    """
+    value = Decimal(str(amount)) * get_minor_unit_factor(currency)
+    return int(value.to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def to_major_units(amount, currency):
+    """
+    Convert integer minor units to an amount in major units.
+
+    Args:
+        amount (int): The amount in minor units.
+        currency (str): The currency code.
+
+    Returns:
+        float: The amount in major units.
+    """
+    return amount / get_minor_unit_factor(currency)
+
+
+def apply_minor_unit_deltas(queryset, lookup, deltas, field, currency):
+    """
+    Add deltas to a minor unit column in the database and refresh its float mirror.
+
+    The deltas are applied with F() expressions, so concurrent writers can't
+    overwrite each other's changes.
+
+    Args:
+        queryset (QuerySet): The rows which may be updated.
+        lookup (str): The column the keys of the deltas refer to, e.g. "member_id".
+        deltas (dict[str, int]): The delta in minor units of each key.
+        field (str): The float column, mirroring the `<field>_minor` column.
+        currency (str): The currency of the amounts.
+    """
+    minor_field = f"{field}_minor"
+    # Rows with the same delta, like the members of an equal split, share one
+    # update.
+    keys_by_delta = defaultdict(list)
+    for key, delta in deltas.items():
+        if delta:
+            keys_by_delta[delta].append(key)
+    for delta, keys in keys_by_delta.items():
+        queryset.filter(**{f"{lookup}__in": keys}).update(
+            **{minor_field: F(minor_field) + delta}
+        )
+    queryset.filter(**{f"{lookup}__in": list(deltas)}).update(
+        **{field: Cast(minor_field, FloatField()) / get_minor_unit_factor(currency)}
+    )
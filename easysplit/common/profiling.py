@@ -0,0 +1,212 @@
+import os
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils import timezone
+
+from common.tracing import traced
+
+# The profile of the current request, if profiling is enabled.
+_current_profile = ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    """
+    Time spent by a request in each category, like "db" or "cache".
+
+    Categories nest, e.g. queries run by a serializer, and every category only
+    counts its own time without that of the categories nested in it. The rest of
+    the request's time is the view's own code.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        # [name, start, time of nested categories] of the open categories.
+        self.stack = []
+
+    def enter(self, name):
+        """
+        Start timing a category.
+
+        Args:
+            name (str): The category.
+
+        Returns:
+            bool: False if the category is already open, e.g. for a nested
+                serializer, so the outer timing covers it.
+        """
+        if any(item[0] == name for item in self.stack):
+            return False
+        self.stack.append([name, time.perf_counter(), 0.0])
+        return True
+
+    def exit(self):
+        """
+        Stop timing the innermost open category.
+        """
+        name, start, nested = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.durations[name] += elapsed - nested
+        self.counts[name] += 1
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def add(self, name, duration):
+        """
+        Count a timing measured elsewhere, e.g. a query's, to a category nested
+        in the innermost open one.
+
+        Args:
+            name (str): The category.
+            duration (float): The duration in seconds.
+        """
+        self.durations[name] += duration
+        self.counts[name] += 1
+        if self.stack:
+            self.stack[-1][2] += duration
+
+    def get_timings(self):
+        """
+        Get the time of each category in milliseconds, including "view" for the
+        rest and "total".
+
+        Returns:
+            dict[str, float]: The milliseconds of each category.
+        """
+        total = time.perf_counter() - self.start
+        timings = {name: duration * 1000 for name, duration in self.durations.items()}
+        timings["view"] = max(0.0, total * 1000 - sum(timings.values()))
+        timings["total"] = total * 1000
+        return timings
+
+    def get_server_timing(self):
+        """
+        Format the timings as a Server-Timing header value.
+
+        Returns:
+            str: The header value, e.g. 'db;dur=1.2;desc="3 calls", total;dur=5.0'.
+        """
+        metrics = []
+        for name, duration in self.get_timings().items():
+            metric = f"{name};dur={duration:.1f}"
+            if name in self.counts:
+                metric += f';desc="{self.counts[name]} calls"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+
+def start_profile():
+    """
+    Start profiling the current request.
+
+    Returns:
+        tuple[RequestProfile, Token]: The profile and the token to reset the
+            context with.
+    """
+    profile = RequestProfile()
+    return profile, _current_profile.set(profile)
+
+
+def stop_profile(token):
+    """
+    Stop profiling the current request.
+
+    Args:
+        token (Token): The token returned by start_profile.
+    """
+    _current_profile.reset(token)
+
+
+def get_current_profile():
+    """
+    Returns:
+        RequestProfile: The profile of the current request, or None.
+    """
+    return _current_profile.get()
+
+
+@contextmanager
+def timed(name):
+    """
+    Count the time of the block, or of the decorated function, to a category of
+    the current request's profile. Without a profile it does nothing.
+
+    Args:
+        name (str): The category, e.g. "serialize".
+    """
+    profile = _current_profile.get()
+    if profile is None or not profile.enter(name):
+        yield
+        return
+    try:
+        yield
+    finally:
+        profile.exit()
+
+
+def add_query_time(duration):
+    """
+    Count the time of a query to the "db" category of the current request's
+    profile. Without a profile it does nothing.
+
+    Args:
+        duration (float): The duration of the query in seconds.
+    """
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add("db", duration)
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin counting the time spent rendering instances to the
+    "serialize" category of the request's profile, and tracing it as one span
+    for all the instances of a list.
+    """
+
+    def to_representation(self, instance):
+        with timed("serialize"), traced("serialize", merge=True):
+            return super().to_representation(instance)
+
+
+def get_profile_path(request, duration):
+    """
+    Get the file path of a request's cProfile dump.
+
+    Args:
+        request (HttpRequest): The request.
+        duration (float): The duration of the request in milliseconds.
+
+    Returns:
+        str: The path in `REQUEST_PROFILING_DIR`.
+    """
+    path = re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_") or "root"
+    name = (
+        f"{timezone.now():%Y%m%dT%H%M%S%f}_{request.method}_{path[:80]}_"
+        f"{duration:.0f}ms.prof"
+    )
+    return os.path.join(settings.REQUEST_PROFILING_DIR, name)
+
+
+def dump_profile(profiler, request, duration):
+    """
+    Write the cProfile stats of a slow request, readable with pstats or snakeviz.
+
+    Args:
+        profiler (cProfile.Profile): The stopped profiler.
+        request (HttpRequest): The request.
+        duration (float): The duration of the request in milliseconds.
+
+    Returns:
+        str: The path of the dump.
+    """
+    os.makedirs(settings.REQUEST_PROFILING_DIR, exist_ok=True)
+    path = get_profile_path(request, duration)
+    profiler.dump_stats(path)
+    return path
@@ -0,0 +1,239 @@
+import os
+import re
+import traceback
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from loguru import logger
+
+# The query log of the current request, if query logging is enabled.
+_current_log = ContextVar("current_query_log", default=None)
+
+# Runs of placeholders, e.g. of IN lists or bulk inserts, whose length varies.
+PLACEHOLDER_RUN = re.compile(r"%s(?:\s*,\s*%s)+")
+VALUES_RUN = re.compile(r"\(%s(?:, %s)*\)(?:\s*,\s*\(%s(?:, %s)*\))+")
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+WHITESPACE = re.compile(r"\s+")
+DATABASE_PACKAGE = os.path.join("django", "db", "")
+SITE_PACKAGES = os.path.join("site-packages", "")
+# Statements which repeat by design, like those of nested transactions.
+IGNORED_STATEMENTS = (
+    "BEGIN",
+    "COMMIT",
+    "ROLLBACK",
+    "SAVEPOINT",
+    "RELEASE SAVEPOINT",
+)
+
+
+class NPlusOneError(AssertionError):
+    """
+    Raised in strict mode when a request repeats a query shape from a call site
+    which is not in `QUERY_LOG_ALLOWED_REPEATS`.
+    """
+
+
+def get_query_shape(sql):
+    """
+    Get the shape of a query, which is the same for queries differing only in
+    their parameters.
+
+    Args:
+        sql (str): The SQL of the query, with %s placeholders.
+
+    Returns:
+        str: The SQL with literals replaced by ? and placeholder lists collapsed.
+    """
+    shape = WHITESPACE.sub(" ", sql).strip()
+    shape = STRING_LITERAL.sub("?", shape)
+    shape = NUMBER_LITERAL.sub("?", shape)
+    shape = VALUES_RUN.sub("(...)", shape)
+    shape = PLACEHOLDER_RUN.sub("...", shape)
+    return shape.replace("%s", "?")
+
+
+def get_call_stack():
+    """
+    Get the frames which led to the current query, innermost last.
+
+    The frames of Django's database layer, of the execute wrappers and of the
+    standard library are left out, so the innermost frame is the code which
+    ran the query, e.g. a serializer method or a DRF field.
+
+    Returns:
+        list[str]: Up to `QUERY_LOG_STACK_DEPTH` frames as "path:line in function",
+            with paths relative to the project or to site-packages.
+    """
+    base_dir = str(settings.BASE_DIR) + os.sep
+    frames = traceback.extract_stack()
+    # Skip the execute wrappers and the ORM calls below the caller.
+    while frames and DATABASE_PACKAGE not in frames[-1].filename:
+        frames.pop()
+    while frames and DATABASE_PACKAGE in frames[-1].filename:
+        frames.pop()
+
+    stack = []
+    for frame in frames:
+        if SITE_PACKAGES in frame.filename:
+            path = frame.filename.split(SITE_PACKAGES, 1)[1]
+        elif frame.filename.startswith(base_dir):
+            path = os.path.relpath(frame.filename, base_dir)
+        else:
+            continue
+        stack.append(f"{path}:{frame.lineno} in {frame.name}")
+    return stack[-settings.QUERY_LOG_STACK_DEPTH :]
+
+
+def get_call_site(stack):
+    """
+    Get the call site of a stack, which stays the same when lines move.
+
+    Args:
+        stack (list[str]): The stack returned by get_call_stack.
+
+    Returns:
+        str: The innermost frame as "path:function", or None for an empty stack.
+    """
+    if not stack:
+        return None
+    location, function = stack[-1].split(" in ", 1)
+    return f"{location.rsplit(':', 1)[0]}:{function}"
+
+
+def get_view_name(request):
+    """
+    Returns:
+        str: The URL name of the request's view, or its path before resolving.
+    """
+    if request is None:
+        return None
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else request.path
+
+
+class RequestQueryLog:
+    """
+    The query shapes of a request, to find the ones repeated by loops.
+    """
+
+    def __init__(self, request):
+        """
+        Args:
+            request (HttpRequest): The request.
+        """
+        self.request = request
+        self.counts = defaultdict(int)
+        self.durations = defaultdict(float)
+        # The stack of the first query of each shape.
+        self.stacks = {}
+
+    def add(self, shape, duration):
+        """
+        Count a query of the request.
+
+        Args:
+            shape (str): The shape of the query.
+            duration (float): The duration of the query in milliseconds.
+        """
+        self.counts[shape] += 1
+        self.durations[shape] += duration
+        if shape not in self.stacks:
+            self.stacks[shape] = get_call_stack()
+
+    def get_repeated(self):
+        """
+        Get the shapes run at least `QUERY_LOG_REPEAT_THRESHOLD` times.
+
+        Returns:
+            list[dict]: The shape, count, total duration in milliseconds, stack
+                and call site of each repeated shape.
+        """
+        return [
+            {
+                "sql": shape,
+                "count": count,
+                "duration_ms": round(self.durations[shape], 2),
+                "stack": self.stacks[shape],
+                "call_site": get_call_site(self.stacks[shape]),
+            }
+            for shape, count in self.counts.items()
+            if count >= settings.QUERY_LOG_REPEAT_THRESHOLD
+            and not shape.upper().startswith(IGNORED_STATEMENTS)
+        ]
+
+
+def start_query_log(request):
+    """
+    Start logging the queries of a request.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        tuple[RequestQueryLog, Token]: The log and the token to reset the context
+            with.
+    """
+    query_log = RequestQueryLog(request)
+    return query_log, _current_log.set(query_log)
+
+
+def finish_query_log(query_log, token):
+    """
+    Stop logging the queries of a request and report its repeated query shapes.
+
+    Args:
+        query_log (RequestQueryLog): The log returned by start_query_log.
+        token (Token): The token returned by start_query_log.
+
+    Raises:
+        NPlusOneError: In strict mode, if a shape is repeated from a call site
+            which is not in `QUERY_LOG_ALLOWED_REPEATS`.
+    """
+    _current_log.reset(token)
+    view = get_view_name(query_log.request)
+    new_repeats = []
+    for repeat in query_log.get_repeated():
+        logger.bind(view=view, **repeat).warning(
+            f"N+1 query in {view}: {repeat['count']} x {repeat['sql']} "
+            f"from {repeat['call_site']}"
+        )
+        if repeat["call_site"] not in settings.QUERY_LOG_ALLOWED_REPEATS:
+            new_repeats.append(repeat)
+
+    if settings.QUERY_LOG_STRICT and new_repeats:
+        raise NPlusOneError(
+            f"New N+1 queries in {view}:\n"
+            + "\n".join(
+                f"{repeat['count']} x {repeat['sql']}\n  "
+                + "\n  ".join(repeat["stack"])
+                for repeat in new_repeats
+            )
+        )
+
+
+def log_query(sql, alias, duration):
+    """
+    Log a slow query and count the shape of a query of the current request.
+
+    Args:
+        sql (str): The SQL of the query.
+        alias (str): The alias of the query's database.
+        duration (float): The duration of the query in seconds.
+    """
+    if not settings.QUERY_LOG and not settings.QUERY_LOG_STRICT:
+        return
+    duration *= 1000
+    query_log = _current_log.get()
+    if duration >= settings.QUERY_LOG_SLOW_MS:
+        view = get_view_name(query_log.request if query_log else None)
+        logger.bind(
+            view=view,
+            sql=sql,
+            duration_ms=round(duration, 2),
+            alias=alias,
+            stack=get_call_stack(),
+        ).warning(f"Slow query in {view}: {duration:.1f}ms {sql}")
+    if query_log is not None:
+        query_log.add(get_query_shape(sql), duration)
@@ -0,0 +1,96 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin supporting the `?fields=` and `?expand=` query parameters.
+
+    Both parameters take comma separated field names. `fields` selects the
+    fields to render, while nested fields declared in `Meta.expandable_fields`
+    (a mapping of field name to prefetch lookup) are only rendered when named in
+    `fields` or `expand`. Without either parameter every field is rendered.
+    `Meta.field_columns` maps field names to the extra model columns needed to
+    render them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested_fields = self.get_requested_fields(
+            self.fields, self.context.get("request")
+        )
+        if requested_fields is not None:
+            for field_name in set(self.fields) - requested_fields:
+                self.fields.pop(field_name)
+
+    @classmethod
+    def get_requested_fields(cls, all_fields, request):
+        """
+        Get the names of the fields requested by the query parameters.
+
+        Args:
+            all_fields (Iterable[str]): The names of all fields of the serializer.
+            request (Request): The request, or None when serializing without one.
+
+        Returns:
+            set[str]: The requested field names, or None if all fields are requested.
+        """
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        fields = request.query_params.get("fields")
+        expand = request.query_params.get("expand")
+        if fields is None and expand is None:
+            return None
+
+        all_fields = set(all_fields)
+        expandable_fields = set(getattr(cls.Meta, "expandable_fields", {}))
+        expanded_fields = {name for name in (expand or "").split(",") if name}
+        if fields is None:
+            requested_fields = all_fields - expandable_fields
+        else:
+            requested_fields = {name for name in fields.split(",") if name}
+        return (requested_fields | (expanded_fields & expandable_fields)) & all_fields
+
+    @classmethod
+    def prune_queryset(cls, queryset, request):
+        """
+        Limit the queryset to the columns and relations the serializer will render.
+
+        Args:
+            queryset (QuerySet): The queryset to be serialized.
+            request (Request): The request containing the query parameters.
+
+        Returns:
+            QuerySet: The queryset with the needed prefetches and columns.
+        """
+        expandable_fields = getattr(cls.Meta, "expandable_fields", {})
+        all_fields = cls().fields
+        requested_fields = cls.get_requested_fields(all_fields, request)
+        if requested_fields is None:
+            return queryset.prefetch_related(*expandable_fields.values())
+
+        queryset = queryset.prefetch_related(
+            *(
+                lookup
+                for field_name, lookup in expandable_fields.items()
+                if field_name in requested_fields
+            )
+        )
+
+        field_columns = getattr(cls.Meta, "field_columns", {})
+        columns = [
+            column
+            for field_name in requested_fields
+            for column in field_columns.get(field_name, [])
+        ]
+        for field_name in requested_fields - set(expandable_fields):
+            try:
+                model_field = queryset.model._meta.get_field(
+                    all_fields[field_name].source
+                )
+            except FieldDoesNotExist:
+                # Not a plain column, so the whole row may be needed.
+                return queryset
+            if model_field.concrete:
+                columns.append(model_field.name)
+        return queryset.only("pk", *columns)
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase
+from django.test import override_settings
+from rest_framework.test import APITestCase, APITransactionTestCase
 
 from account.models import Group, Member
 
@@ -20,11 +21,18 @@ def incorrect_format_message(except_error):
     return f"Response data format is incorrect: {str(except_error)}"
 
 
-class BaseTestCase(APITestCase):
-    """
-    Base test case for API test cases.
+# Fail requests which repeat a query shape from a new call site. The default
+# groups have 3 members, so loops over them repeat queries 3 times.
+strict_query_log = override_settings(
+    QUERY_LOG_STRICT=True, QUERY_LOG_REPEAT_THRESHOLD=3
+)
+# Push group changes within the test process instead of to Redis.
+memory_broker = override_settings(CHANGE_STREAM_BROKER="memory")
 
-    This test case provides common setup and utility methods for other test cases.
+
+class BaseTestDataMixin:
+    """
+    Mixin creating the default users, group and members of API test cases.
     """
 
     def setUp(self):
@@ -87,3 +95,24 @@ class BaseTestCase(APITestCase):
         user.set_password(password)
         user.save()
         return user
+
+
+@memory_broker
+@strict_query_log
+class BaseTestCase(BaseTestDataMixin, APITestCase):
+    """
+    Base test case for API test cases.
+
+    This test case provides common setup and utility methods for other test cases.
+    """
+
+
+@memory_broker
+@strict_query_log
+class BaseTransactionTestCase(BaseTestDataMixin, APITransactionTestCase):
+    """
+    Base test case for API test cases whose data must be committed.
+
+    Use it when the tested code reads the data from other threads or expects
+    transactions to commit, e.g. to run on_commit callbacks.
+    """
@@ -0,0 +1,156 @@
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from common.cache import cache_call
+
+# Refill the bucket for the time elapsed since the last request and try to take
+# one token, all inside Redis so concurrent workers can't race each other.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * refill_rate)
+
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / refill_rate
+end
+
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now))
+redis.call("EXPIRE", KEYS[1], ttl)
+return {allowed, tostring(wait)}
+"""
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket throttle stored in the default cache.
+
+    Views opt in by setting `throttle_scope`. The rate is looked up in
+    `DEFAULT_THROTTLE_RATES` as "<throttle_scope>_<scope_suffix>", where
+    "<num>/<period>" is read as the bucket capacity and the time it takes to
+    refill an empty bucket. Safe methods are never throttled.
+    """
+
+    scope_suffix = None
+    cache_format = "throttle_%(scope)s_%(ident)s"
+
+    def __init__(self):
+        # The rate depends on the view, so it is resolved in allow_request().
+        self.wait_seconds = None
+
+    def get_rate(self):
+        """
+        Get the rate of the current scope from the DRF settings.
+
+        Returns:
+            str: The rate string, or None if the scope is not throttled.
+        """
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        """
+        Take one token from the bucket of the request's identity.
+
+        Args:
+            request (Request): The incoming request.
+            view (APIView): The view handling the request.
+
+        Returns:
+            bool: True if the request may proceed, otherwise False.
+        """
+        view_scope = getattr(view, "throttle_scope", None)
+        if request.method in SAFE_METHODS or not view_scope:
+            return True
+
+        self.scope = f"{view_scope}_{self.scope_suffix}"
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self.wait_seconds = self.take_token(self.key)
+        return allowed
+
+    def take_token(self, key):
+        """
+        Refill the bucket stored under the key and take one token from it.
+
+        Args:
+            key (str): The cache key of the bucket.
+
+        Returns:
+            tuple[bool, float]: Whether a token was taken and the seconds until
+                the next token is available.
+        """
+        capacity = self.num_requests
+        refill_rate = self.num_requests / self.duration
+        now = self.timer()
+        ttl = self.duration + 1
+
+        if isinstance(self.cache, RedisCache):
+            cache_key = self.cache.make_key(key)
+            client = self.cache._cache.get_client(cache_key, write=True)
+            with cache_call("eval"):
+                allowed, wait = client.eval(
+                    TOKEN_BUCKET_SCRIPT, 1, cache_key, capacity, refill_rate, now, ttl
+                )
+            return bool(allowed), float(wait)
+
+        # Other cache backends (e.g. locmem in local development) can't run the
+        # script, so fall back to a non-atomic read-modify-write.
+        tokens, updated_at = self.cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + max(0, now - updated_at) * refill_rate)
+        if tokens >= 1:
+            self.cache.set(key, (tokens - 1, now), ttl)
+            return True, 0
+        self.cache.set(key, (tokens, now), ttl)
+        return False, (1 - tokens) / refill_rate
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Token bucket per authenticated user, or per client IP for anonymous requests.
+    """
+
+    scope_suffix = "user"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class GroupTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Token bucket per group, taken from the `group_id` URL keyword argument.
+    """
+
+    scope_suffix = "group"
+
+    def get_cache_key(self, request, view):
+        group_id = view.kwargs.get("group_id")
+        if group_id is None:
+            return None
+        return self.cache_format % {"scope": self.scope, "ident": group_id}
@@ -0,0 +1,356 @@
+import json
+import os
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# The innermost open span of the current request, if it is traced.
+_current_span = ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+
+# Span kinds and status codes of the OTLP JSON format.
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_CODE_ERROR = 2
+
+# W3C trace context header: version-trace_id-parent_id-flags.
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+INSTRUMENTATION_SCOPE = "easysplit"
+
+
+class Span:
+    """
+    A timed operation of a trace, like a view, a serializer or a query.
+    """
+
+    def __init__(self, trace, name, parent=None, kind=SPAN_KIND_INTERNAL):
+        """
+        Args:
+            trace (Trace): The trace of the span.
+            name (str): The name of the operation.
+            parent (Span): The parent span, or None for the root span.
+            kind (int): The span kind, e.g. SPAN_KIND_CLIENT for queries.
+        """
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else trace.parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = {}
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self.error = None
+        # The number of calls merged into the span, see start_span.
+        self.calls = 1
+        self.last_child = None
+
+    def finish(self):
+        """
+        End the span, or its latest merged call.
+        """
+        self.end_time = time.time_ns()
+
+    def to_otlp(self):
+        """
+        Returns:
+            dict: The span in the OTLP JSON format.
+        """
+        attributes = dict(self.attributes)
+        if self.calls > 1:
+            attributes["easysplit.calls"] = self.calls
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time or time.time_ns()),
+            "attributes": format_attributes(attributes),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error is not None:
+            span["status"] = {"code": STATUS_CODE_ERROR, "message": self.error}
+        return span
+
+
+class Trace:
+    """
+    The spans of one sampled request.
+    """
+
+    def __init__(self, trace_id=None, parent_id=None):
+        """
+        Args:
+            trace_id (str): The trace ID of the caller, or None to start a trace.
+            parent_id (str): The span ID of the caller.
+        """
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.parent_id = parent_id
+        self.spans = []
+        self.dropped = 0
+
+    def start_span(self, name, parent=None, kind=SPAN_KIND_INTERNAL, merge=False):
+        """
+        Start a span.
+
+        Args:
+            name (str): The name of the operation.
+            parent (Span): The parent span.
+            kind (int): The span kind.
+            merge (bool): Whether to extend the parent's previous child of the
+                same name instead, e.g. for the rows of a list serializer.
+
+        Returns:
+            Span: The span, or None if the trace already has
+                `TRACING_MAX_SPANS` spans.
+        """
+        if merge and parent is not None:
+            last = parent.last_child
+            if last is not None and last.name == name and last.end_time is not None:
+                last.calls += 1
+                return last
+        if len(self.spans) >= settings.TRACING_MAX_SPANS:
+            self.dropped += 1
+            return None
+        span = Span(self, name, parent, kind)
+        self.spans.append(span)
+        if parent is not None:
+            parent.last_child = span
+        return span
+
+    def to_otlp(self):
+        """
+        Returns:
+            dict: The trace as an OTLP JSON export request.
+        """
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": format_attributes(
+                            {"service.name": settings.TRACING_SERVICE_NAME}
+                        )
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": INSTRUMENTATION_SCOPE},
+                            "spans": [span.to_otlp() for span in self.spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+
+def format_attributes(attributes):
+    """
+    Format span attributes as OTLP JSON key values.
+
+    Args:
+        attributes (dict): The attributes.
+
+    Returns:
+        list[dict]: The key values.
+    """
+    values = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            value = {"boolValue": value}
+        elif isinstance(value, int):
+            value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            value = {"doubleValue": value}
+        else:
+            value = {"stringValue": str(value)}
+        values.append({"key": key, "value": value})
+    return values
+
+
+def get_current_span():
+    """
+    Returns:
+        Span: The innermost open span of the current request, or None.
+    """
+    return _current_span.get()
+
+
+@contextmanager
+def traced(name, attributes=None, kind=SPAN_KIND_INTERNAL, merge=False):
+    """
+    Trace the block, or the decorated function, as a child of the current span.
+    Outside traced requests it does nothing.
+
+    A block with the same name as the current span, e.g. a nested serializer,
+    is part of that span.
+
+    Args:
+        name (str): The name of the operation.
+        attributes (dict): The attributes of the span.
+        kind (int): The span kind.
+        merge (bool): Whether consecutive calls make up one span, see
+            Trace.start_span.
+    """
+    parent = _current_span.get()
+    if parent is None or parent.name == name:
+        yield
+        return
+    span = parent.trace.start_span(name, parent, kind, merge)
+    if span is None:
+        yield
+        return
+    if attributes:
+        span.attributes.update(attributes)
+    token = _current_span.set(span)
+    try:
+        yield
+    except Exception as error:
+        span.error = f"{type(error).__name__}: {error}"
+        raise
+    finally:
+        _current_span.reset(token)
+        span.finish()
+
+
+def start_query_span(sql, connection):
+    """
+    Start a client span for a query of the current request, if it is traced.
+
+    Args:
+        sql (str): The SQL of the query.
+        connection (BaseDatabaseWrapper): The connection running the query.
+
+    Returns:
+        Span: The span to finish once the query returns, or None.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    operation = sql.split(None, 1)[0].upper() if sql else "QUERY"
+    span = parent.trace.start_span(f"db {operation}", parent, SPAN_KIND_CLIENT)
+    if span is not None:
+        span.attributes.update(
+            {
+                "db.system": connection.vendor,
+                "db.name": connection.alias,
+                "db.operation": operation,
+                "db.statement": sql,
+            }
+        )
+    return span
+
+
+def start_trace(request):
+    """
+    Start tracing a request if it is sampled.
+
+    A request with a W3C `traceparent` header joins the caller's trace. Its
+    sampled flag is ignored, so clients can't make every request traced.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        tuple[Span, Token]: The root span and the token to reset the context
+            with, or (None, None) if the request is not sampled.
+    """
+    if random.random() >= settings.TRACING_SAMPLE_RATE:
+        return None, None
+    match = TRACEPARENT.match(request.headers.get("traceparent", ""))
+    trace = Trace(*match.groups()[:2]) if match is not None else Trace()
+
+    root = trace.start_span(f"{request.method} {request.path}", kind=SPAN_KIND_SERVER)
+    root.attributes.update(
+        {
+            "http.method": request.method,
+            "http.target": request.get_full_path(),
+            "http.scheme": request.scheme,
+        }
+    )
+    return root, _current_span.set(root)
+
+
+def finish_trace(request, response, root, token):
+    """
+    End the trace of a request and export it.
+
+    Args:
+        request (HttpRequest): The request.
+        response (HttpResponse): The response.
+        root (Span): The root span returned by start_trace.
+        token (Token): The token returned by start_trace.
+    """
+    _current_span.reset(token)
+    match = request.resolver_match
+    if match is not None:
+        # Router routes are regular expressions, e.g. "group/<uuid:id>/record$".
+        route = "/" + match.route.strip("^$") if match.route else request.path
+        root.name = f"{request.method} {route}"
+        root.attributes["http.route"] = route
+    root.attributes["http.status_code"] = response.status_code
+    if response.status_code >= 500:
+        root.error = f"HTTP {response.status_code}"
+    if root.trace.dropped:
+        root.attributes["easysplit.dropped_spans"] = root.trace.dropped
+    root.finish()
+    export_trace(root.trace)
+
+
+def export_trace(trace):
+    """
+    Append a trace to `TRACING_FILE` as one line of OTLP JSON, which the
+    OpenTelemetry Collector can read with its otlpjsonfile receiver.
+
+    Args:
+        trace (Trace): The finished trace.
+    """
+    line = json.dumps(trace.to_otlp(), separators=(",", ":")) + "\n"
+    directory = os.path.dirname(settings.TRACING_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _export_lock, open(settings.TRACING_FILE, "a", encoding="utf-8") as file:
+        file.write(line)
+
+
+class TracedViewMixin:
+    """
+    DRF view mixin tracing the authentication, permission and throttle checks,
+    the queryset and the handler of each request.
+
+    Views overriding get_queryset decorate it with traced("queryset") themselves.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with traced(type(self).__name__, {"code.function": request.method.lower()}):
+            return super().dispatch(request, *args, **kwargs)
+
+    def perform_authentication(self, request):
+        with traced("auth"):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with traced("permission"):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with traced("permission"):
+            super().check_object_permissions(request, obj)
+
+    def check_throttles(self, request):
+        with traced("throttle"):
+            super().check_throttles(request)
+
+    def get_queryset(self):
+        with traced("queryset"):
+            return super().get_queryset()
+
+    def get_object(self):
+        with traced("queryset"):
+            return super().get_object()
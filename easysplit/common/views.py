@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+
+from common.metrics import generate_latest
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@require_GET
+def metrics(request):
+    """
+    Expose the metrics of all server processes in the Prometheus text format.
+
+    The endpoint has no authentication, so nginx only lets internal networks
+    reach it.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The metrics.
+
+    Raises:
+        Http404: If `METRICS_ENABLED` is off.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404()
+    return HttpResponse(generate_latest(), content_type=PROMETHEUS_CONTENT_TYPE)
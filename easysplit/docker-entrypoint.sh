@@ -1,2 +1,9 @@
 #!/bin/sh
-uwsgi --ini uwsgi.ini
\ No newline at end of file
+# Metrics of the previous server processes would add up with the new ones.
+rm -rf "${METRICS_DIR:-/tmp/easysplit_metrics}"
+
+if [ "$1" = "asgi" ]; then
+    gunicorn easysplit.asgi:application -c gunicorn.conf.py
+else
+    uwsgi --ini uwsgi.ini
+fi
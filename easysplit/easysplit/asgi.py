@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "easysplit.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up, since it imports models.
+from account.change_stream import ChangeStreamApplication  # noqa: E402
+
+application = ChangeStreamApplication(django_application)
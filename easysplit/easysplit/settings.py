@@ -51,12 +51,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "common.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "common.middleware.replica_routing_middleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -88,9 +90,64 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
+    "DEFAULT_THROTTLE_CLASSES": (
+        "common.throttling.UserTokenBucketThrottle",
+        "common.throttling.GroupTokenBucketThrottle",
+    ),
+    # Token bucket rates, keyed by "<view throttle_scope>_<user|group>".
+    "DEFAULT_THROTTLE_RATES": {
+        "token_user": os.environ.get("THROTTLE_TOKEN_USER", "20/min"),
+        "members_write_user": os.environ.get("THROTTLE_MEMBERS_WRITE_USER", "30/min"),
+        "members_write_group": os.environ.get("THROTTLE_MEMBERS_WRITE_GROUP", "30/min"),
+        "record_write_user": os.environ.get("THROTTLE_RECORD_WRITE_USER", "60/min"),
+        "record_write_group": os.environ.get("THROTTLE_RECORD_WRITE_GROUP", "120/min"),
+    },
     "TEST_REQUEST_DEFAULT_FORMAT": "json",
 }
 
+# Measure the time of queries, cache calls, serializers and rendering of every
+# request, sent in a Server-Timing header and logged. A sample of the requests
+# runs under cProfile, and the stats of the slow ones are dumped to files.
+REQUEST_PROFILING = strtobool(os.environ.get("REQUEST_PROFILING", "False"))
+REQUEST_PROFILING_SAMPLE_RATE = float(
+    os.environ.get("REQUEST_PROFILING_SAMPLE_RATE", 0.01)
+)
+REQUEST_PROFILING_SLOW_MS = float(os.environ.get("REQUEST_PROFILING_SLOW_MS", 500))
+REQUEST_PROFILING_DIR = os.environ.get("REQUEST_PROFILING_DIR", "logs/profiles")
+
+# Log queries taking QUERY_LOG_SLOW_MS or longer, and query shapes repeated
+# QUERY_LOG_REPEAT_THRESHOLD times by one request, with the code which ran them.
+# In strict mode, used by the tests, requests repeating a query shape from a
+# call site ("path:function") which is not in QUERY_LOG_ALLOWED_REPEATS fail.
+QUERY_LOG = strtobool(os.environ.get("QUERY_LOG", "False"))
+QUERY_LOG_SLOW_MS = float(os.environ.get("QUERY_LOG_SLOW_MS", 100))
+QUERY_LOG_REPEAT_THRESHOLD = int(os.environ.get("QUERY_LOG_REPEAT_THRESHOLD", 5))
+QUERY_LOG_STACK_DEPTH = 8
+QUERY_LOG_STRICT = False
+QUERY_LOG_ALLOWED_REPEATS = [
+    # One update per distinct balance delta of a record.
+    "common/money.py:apply_minor_unit_deltas",
+    # Each member_id of the From and To rows is looked up on its own.
+    "rest_framework/relations.py:to_internal_value",
+]
+
+# Trace a share of the requests and append their spans to TRACING_FILE as OTLP
+# JSON lines. 0 turns tracing off.
+TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", 0))
+TRACING_FILE = os.environ.get("TRACING_FILE", "logs/traces.jsonl")
+TRACING_SERVICE_NAME = os.environ.get("TRACING_SERVICE_NAME", "easysplit")
+TRACING_MAX_SPANS = 1000
+
+# Record request, query, cache and balance metrics for the /metrics endpoint.
+# Every process writes its values to its own memory-mapped file in METRICS_DIR,
+# which the endpoint adds up, so it must be shared by all server processes and
+# emptied when the server starts.
+METRICS_ENABLED = strtobool(os.environ.get("METRICS_ENABLED", "True"))
+METRICS_DIR = os.environ.get("METRICS_DIR", "/tmp/easysplit_metrics")
+
+# Build list responses from plain rows instead of serializers where possible.
+FAST_READ_PATH = strtobool(os.environ.get("FAST_READ_PATH", "True"))
+
 SWAGGER_SETTINGS = {
     "USE_SESSION_AUTH": True,
     "SECURITY_DEFINITIONS": {
@@ -104,26 +161,67 @@ SWAGGER_SETTINGS = {
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Pooled connections per worker process, capped so that all uWSGI processes
+# together stay below max_connections in my.cnf, leaving 10 for admin tools.
+MYSQL_MAX_CONNECTIONS = int(os.environ.get("MYSQL_MAX_CONNECTIONS", 100))
+SERVER_PROCESSES = int(os.environ.get("SERVER_PROCESSES", 2))
+MYSQL_POOL_SIZE = min(
+    int(os.environ.get("MYSQL_POOL_SIZE", 4)),
+    (MYSQL_MAX_CONNECTIONS - 10) // SERVER_PROCESSES,
+)
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.mysql",
+        "ENGINE": "common.db_backends.mysql_pool",
         "NAME": os.environ.get("MYSQL_DATABASE"),
         "USER": os.environ.get("MYSQL_USER"),
         "PASSWORD": os.environ.get("MYSQL_PASSWORD"),
         "HOST": os.environ.get("MYSQL_HOST"),
         "PORT": os.environ.get("MYSQL_PORT"),
+        "OPTIONS": {
+            # Recycle connections before the server's wait_timeout (600s) drops them.
+            "pool": {"max_size": MYSQL_POOL_SIZE, "timeout": 5, "recycle": 500},
+        },
     }
 }
 
+# Read replicas as comma separated "host[:port]" entries. Safe requests read from
+# a replica, everything else uses the primary.
+for index, replica_host in enumerate(
+    filter(None, os.environ.get("MYSQL_REPLICA_HOSTS", "").split(",")), start=1
+):
+    host, _, port = replica_host.partition(":")
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["common.db_routers.PrimaryReplicaRouter"]
+# Seconds a user's requests stay on the primary after they write.
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+
 # Redis
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "BACKEND": "common.cache.RedisCache",
         "LOCATION": os.environ.get("CACHES_HOST", "redis://redis:6379"),
         "TIMEOUT": os.environ.get("CACHES_TIMEOUT", 300),
     },
 }
 
+# Broker of the group change stream: "redis" to share events between all
+# server processes, or "memory" for a single process in local development.
+CHANGE_STREAM_BROKER = os.environ.get("CHANGE_STREAM_BROKER", "redis")
+CHANGE_STREAM_REDIS_URL = CACHES["default"]["LOCATION"]
+
+# Purge the data of deleted groups in a background thread right away. Without
+# it, the purge_deleted_groups command purges them, e.g. from cron.
+GROUP_PURGE_IN_BACKGROUND = strtobool(
+    os.environ.get("GROUP_PURGE_IN_BACKGROUND", "True")
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
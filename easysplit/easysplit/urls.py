@@ -7,12 +7,16 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework.permissions import AllowAny
 
+from common import views as common_views
+
 urlpatterns = [
     # admin
     path("admin/", admin.site.urls),
     # application
     path("", include("account.urls")),
     path("", include("record.urls")),
+    # monitoring
+    path("metrics", common_views.metrics, name="metrics"),
 ]
 
 
@@ -0,0 +1,5 @@
+# Serves the async endpoints under /async/ (see nginx/default.conf).
+bind = ":8001"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = 2
+pidfile = "/tmp/easysplit-asgi.pid"
@@ -0,0 +1,154 @@
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from loguru import logger
+
+from account.models import Group
+from common.money import apply_minor_unit_deltas
+from record.models import (
+    ArchivedFrom,
+    ArchivedRecord,
+    ArchivedTo,
+    FeedItem,
+    From,
+    OpeningBalance,
+    Record,
+    To,
+)
+from record.splits import get_balance_deltas
+
+# Records moved per transaction, so archival never locks the hot tables for long.
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVED_RECORD_FIELDS = [
+    "id",
+    "group_id",
+    "what",
+    "amount",
+    "amount_minor",
+    "type",
+    "currency",
+    "exchange_rate",
+    "note",
+    "is_equal_split",
+    "split_rule",
+    "split_participants",
+    "created_at",
+    "updated_at",
+]
+
+
+def add_opening_balances(group_id, deltas_by_currency):
+    """
+    Add the balance deltas of archived records to the members' opening balances.
+
+    Args:
+        group_id (str): The ID of the group.
+        deltas_by_currency (dict[str, dict[str, int]]): The delta in minor units
+            of each member ID, by currency.
+    """
+    for currency, deltas in deltas_by_currency.items():
+        OpeningBalance.objects.bulk_create(
+            [
+                OpeningBalance(
+                    group_id=group_id, member_id=member_id, currency=currency
+                )
+                for member_id in deltas
+            ],
+            ignore_conflicts=True,
+        )
+        apply_minor_unit_deltas(
+            OpeningBalance.objects.filter(group_id=group_id, currency=currency),
+            "member_id",
+            deltas,
+            "balance",
+            currency,
+        )
+
+
+@transaction.atomic
+def archive_batch(group_id, until, batch_size):
+    """
+    Move the oldest batch of a group's records created before a time into the
+    archive tables.
+
+    Args:
+        group_id (str): The ID of the group.
+        until (datetime): Records created before it are archived.
+        batch_size (int): The maximum number of records moved.
+
+    Returns:
+        int: The number of archived records.
+    """
+    records = list(
+        Record.objects.select_for_update()
+        .filter(group_id=group_id, created_at__lt=until)
+        .order_by("created_at", "id")
+        .prefetch_related("from_members", "to_members")[:batch_size]
+    )
+    if not records:
+        return 0
+
+    deltas_by_currency = defaultdict(lambda: defaultdict(int))
+    for record in records:
+        for member_id, delta in get_balance_deltas(record).items():
+            deltas_by_currency[record.currency][member_id] += delta
+    add_opening_balances(group_id, deltas_by_currency)
+
+    ArchivedRecord.objects.bulk_create(
+        ArchivedRecord(
+            **{field: getattr(record, field) for field in ARCHIVED_RECORD_FIELDS}
+        )
+        for record in records
+    )
+    for model, related_name in (
+        (ArchivedFrom, "from_members"),
+        (ArchivedTo, "to_members"),
+    ):
+        model.objects.bulk_create(
+            model(
+                record_id=record.id,
+                member_id=item.member_id,
+                amount=item.amount,
+                amount_minor=item.amount_minor,
+            )
+            for record in records
+            for item in getattr(record, related_name).all()
+        )
+
+    record_ids = [record.id for record in records]
+    for model in (FeedItem, From, To):
+        model.objects.filter(record_id__in=record_ids).delete()
+    # The children are already gone, so nothing is left to cascade to.
+    Record.objects.filter(id__in=record_ids)._raw_delete(DEFAULT_DB_ALIAS)
+    return len(records)
+
+
+def archive_group_history(group, until, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Archive a group's records created before a settlement point.
+
+    The records move into the archive tables and their amounts into one opening
+    balance per member and currency, so the hot tables only hold the records
+    since then. The members' balances don't change.
+
+    Args:
+        group (Group): The group to archive.
+        until (datetime): The settlement point. Records created before it are
+            archived.
+        batch_size (int): The maximum number of records moved per transaction.
+
+    Returns:
+        int: The number of archived records.
+    """
+    archived = 0
+    while True:
+        count = archive_batch(group.id, until, batch_size)
+        if not count:
+            break
+        archived += count
+
+    if group.archived_until is None or group.archived_until < until:
+        Group.objects.filter(id=group.id).update(archived_until=until)
+        group.archived_until = until
+    logger.info(f"Archived {archived} records of group {group.id}")
+    return archived
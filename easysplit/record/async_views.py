@@ -0,0 +1,74 @@
+from django.core.cache import cache
+
+from account.async_views import (
+    NOT_AUTHENTICATED,
+    NOT_FOUND,
+    authenticate,
+    can_access_group,
+)
+from account.versions import aget_group_version
+from common.async_utils import database_sync_to_async, json_response
+from record.fast_read import (
+    GROUP_BALANCES_CACHE_KEY,
+    get_group_balances_data,
+    get_records_data,
+)
+from record.models import Record
+
+
+async def record_list(request, group_id):
+    """
+    Asynchronously list the records of a group.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        group_id (str): The ID of the group.
+
+    Returns:
+        HttpResponse: The same JSON response as GET /group/<group_id>/record.
+    """
+    user = await authenticate(request)
+    if user is None:
+        return json_response(NOT_AUTHENTICATED, status=401)
+    if not await can_access_group(user, group_id):
+        return json_response(NOT_FOUND, status=404)
+
+    data, is_exact = await database_sync_to_async(get_records_data)(
+        Record.objects.filter(group_id=group_id)
+    )
+    return json_response(data, is_exact)
+
+
+async def balance_list(request, group_id):
+    """
+    Asynchronously list the balances of all members of a group.
+
+    The balances are cached per group data version, so they are only read from
+    the database again after the group changed.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        group_id (str): The ID of the group.
+
+    Returns:
+        HttpResponse: The JSON response containing the balances.
+            - member_id (str): The ID of the member.
+            - balance (float): The balance of the member.
+            - currency (str): The currency of the balance.
+    """
+    user = await authenticate(request)
+    if user is None:
+        return json_response(NOT_AUTHENTICATED, status=401)
+    if not await can_access_group(user, group_id):
+        return json_response(NOT_FOUND, status=404)
+
+    cache_key = GROUP_BALANCES_CACHE_KEY % (
+        group_id,
+        await aget_group_version(group_id),
+    )
+    balances = await cache.aget(cache_key)
+    if balances is None:
+        balances = await database_sync_to_async(get_group_balances_data)(group_id)
+        await cache.aset(cache_key, balances)
+    data, is_exact = balances
+    return json_response(data, is_exact)
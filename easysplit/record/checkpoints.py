@@ -0,0 +1,150 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from common.money import to_major_units
+from record.models import ArchivedRecord, BalanceCheckpoint, OpeningBalance, Record
+from record.splits import get_balance_deltas
+
+
+def add_record_deltas(balances, queryset):
+    """
+    Add the balance deltas of records to balances.
+
+    Args:
+        balances (dict[tuple[str, str], int]): The balance in minor units of each
+            member ID and currency, updated in place.
+        queryset (QuerySet): The records or archived records.
+    """
+    for record in queryset.prefetch_related("from_members", "to_members"):
+        for member_id, delta in get_balance_deltas(record).items():
+            balances[(member_id, record.currency)] += delta
+
+
+def get_balances_minor_at(group, at):
+    """
+    Get the balances of a group's members at a point in time, in minor units.
+
+    The balances start from the latest checkpoint before the time, or from the
+    opening balances if the time is after the archived history, so only the
+    records between that starting point and the time are added up.
+
+    Args:
+        group (Group): The group.
+        at (datetime): The point in time. Records created before it count.
+
+    Returns:
+        dict[tuple[str, str], int]: The balance of each member ID and currency.
+    """
+    balances = defaultdict(int)
+    as_of = (
+        BalanceCheckpoint.objects.filter(group=group, as_of__lte=at)
+        .order_by("-as_of")
+        .values_list("as_of", flat=True)
+        .first()
+    )
+    archived_until = group.archived_until
+    if (
+        archived_until is not None
+        and at >= archived_until
+        and (as_of is None or as_of < archived_until)
+    ):
+        rows = OpeningBalance.objects.filter(group=group).values_list(
+            "member_id", "currency", "balance_minor"
+        )
+        start = archived_until
+    elif as_of is not None:
+        rows = BalanceCheckpoint.objects.filter(group=group, as_of=as_of).values_list(
+            "member_id", "currency", "balance_minor"
+        )
+        start = as_of
+    else:
+        rows = []
+        start = None
+    for member_id, currency, balance in rows:
+        balances[(str(member_id), currency)] += balance
+
+    querysets = [Record.objects.filter(group=group, created_at__lt=at)]
+    if archived_until is not None and (start is None or start < archived_until):
+        querysets.append(
+            ArchivedRecord.objects.filter(
+                group=group, created_at__lt=min(at, archived_until)
+            )
+        )
+    for queryset in querysets:
+        if start is not None:
+            queryset = queryset.filter(created_at__gte=start)
+        add_record_deltas(balances, queryset)
+    return balances
+
+
+def get_balances_at(group, at):
+    """
+    Get the balances of a group's members at a point in time.
+
+    Args:
+        group (Group): The group.
+        at (datetime): The point in time. Records created before it count.
+
+    Returns:
+        list[dict]: The non-zero balances, each containing member_id, currency
+            and balance.
+    """
+    return [
+        {
+            "member_id": member_id,
+            "currency": currency,
+            "balance": to_major_units(balance, currency),
+        }
+        for (member_id, currency), balance in sorted(
+            get_balances_minor_at(group, at).items()
+        )
+        if balance
+    ]
+
+
+@transaction.atomic
+def create_checkpoint(group, as_of):
+    """
+    Store the balances of a group's members at a point in time as a checkpoint.
+
+    The balances are computed from the previous checkpoint, so creating them
+    periodically, e.g. monthly, only reads the records of each period once.
+
+    Args:
+        group (Group): The group.
+        as_of (datetime): The point in time, which must not be in the future.
+
+    Returns:
+        int: The number of stored balances.
+    """
+    BalanceCheckpoint.objects.filter(group=group, as_of=as_of).delete()
+    checkpoints = BalanceCheckpoint.objects.bulk_create(
+        BalanceCheckpoint(
+            group=group,
+            member_id=member_id,
+            currency=currency,
+            as_of=as_of,
+            balance=to_major_units(balance, currency),
+            balance_minor=balance,
+        )
+        for (member_id, currency), balance in get_balances_minor_at(
+            group, as_of
+        ).items()
+        if balance
+    )
+    return len(checkpoints)
+
+
+def invalidate_checkpoints(group_id, since):
+    """
+    Delete the checkpoints which a change of an older record made stale.
+
+    Queries fall back to the checkpoints before, until the next periodic run
+    creates them again.
+
+    Args:
+        group_id (str): The ID of the group.
+        since (datetime): The creation time of the changed record.
+    """
+    BalanceCheckpoint.objects.filter(group_id=group_id, as_of__gt=since).delete()
@@ -0,0 +1,351 @@
+import datetime
+import random
+import uuid
+from collections import defaultdict
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+
+from account.models import Group, Member, UserBalance
+from common.money import get_minor_unit_factor, to_major_units
+from record.exchange_rates import convert_minor_units
+from record.models import Balance, ExchangeRate, FeedItem, From, Record, To
+from record.splits import allocate
+
+# Rows buffered before they are written with one bulk_create per model.
+DATASET_BATCH_SIZE = 5000
+# All generated users share this password, hashed once.
+DATASET_PASSWORD = "password"
+# Share of the members, besides the owner, who are bound to a user.
+BOUND_MEMBER_RATIO = 0.5
+# Share of the records split equally by rule, the others have exact To rows.
+EQUAL_SPLIT_RATIO = 0.5
+# Fixed rates of the synthetic exchange rates, in TWD per unit.
+SYNTHETIC_RATES = {"TWD": 1.0, "USD": 30.0, "EUR": 33.0, "JPY": 0.22}
+# Written in this order, so every row is inserted after the rows it refers to.
+MODEL_ORDER = [User, Group, Member, Record, From, To, FeedItem, Balance]
+
+
+def parse_currency_mix(value):
+    """
+    Parse a currency mix like "TWD:7,USD:2,JPY:1".
+
+    Args:
+        value (str): Comma-separated currencies, each with an optional weight.
+
+    Returns:
+        dict[str, float]: The weight of each currency, in the given order.
+
+    Raises:
+        ValueError: If a currency is unknown or a weight isn't positive.
+    """
+    mix = {}
+    for item in value.split(","):
+        currency, _, weight = item.strip().partition(":")
+        if currency not in SYNTHETIC_RATES:
+            raise ValueError(f"Unknown currency {currency}.")
+        mix[currency] = float(weight or 1)
+        if mix[currency] <= 0:
+            raise ValueError(f"The weight of {currency} must be positive.")
+    return mix
+
+
+class DatasetGenerator:
+    """
+    Generate reproducible synthetic users, groups, members and records.
+
+    The rows are built in memory and written with bulk_create in batches, so the
+    generator never calls the API or saves rows one by one. The balances,
+    primary balances, overall balances and feed are derived from the generated
+    records, so the data passes the check_balances command.
+    """
+
+    def __init__(
+        self,
+        users,
+        groups,
+        members_per_group,
+        records_per_group,
+        split_fanout,
+        currency_mix,
+        seed=0,
+        batch_size=DATASET_BATCH_SIZE,
+        username_prefix="synthetic",
+    ):
+        """
+        Args:
+            users (int): The number of users.
+            groups (int): The number of groups, each owned by a random user.
+            members_per_group (int): The number of members of each group,
+                including its owner.
+            records_per_group (int): The number of records of each group.
+            split_fanout (int): The maximum number of members a record is split
+                between.
+            currency_mix (dict[str, float]): The weight of each currency of the
+                records. The first currency is the groups' primary currency.
+            seed (int): The seed, so the same arguments generate the same data
+                in an empty database.
+            batch_size (int): The number of rows buffered before writing them.
+            username_prefix (str): The prefix of the usernames, followed by a
+                number.
+        """
+        self.users = users
+        self.groups = groups
+        self.members_per_group = members_per_group
+        self.records_per_group = records_per_group
+        self.split_fanout = split_fanout
+        self.currencies = list(currency_mix)
+        self.currency_weights = list(currency_mix.values())
+        self.batch_size = batch_size
+        self.username_prefix = username_prefix
+        # The prefix is part of the seed, so datasets with different prefixes
+        # get different IDs and can share a database.
+        self.rng = random.Random(f"{username_prefix}:{seed}")
+
+        self.pending = defaultdict(list)
+        self.pending_count = 0
+        self.counts = defaultdict(int)
+        # Balance in minor units of each user ID and currency, across groups.
+        self.user_balances = defaultdict(int)
+
+    def uuid(self):
+        """
+        Returns:
+            UUID: A random version 4 UUID drawn from the seeded generator.
+        """
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def add(self, obj):
+        """
+        Buffer a row and write the buffers once they hold a batch.
+
+        Args:
+            obj (Model): The unsaved row.
+        """
+        self.pending[type(obj)].append(obj)
+        self.pending_count += 1
+        if self.pending_count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered rows, parents first.
+        """
+        # One commit per batch instead of one per statement.
+        with transaction.atomic():
+            for model in MODEL_ORDER:
+                objs = self.pending.pop(model, [])
+                if model is FeedItem:
+                    # The records are written by now, and bulk_create set their
+                    # created_at, which the feed rows copy.
+                    for feed_item in objs:
+                        feed_item.created_at = feed_item.record.created_at
+                if objs:
+                    model.objects.bulk_create(objs, batch_size=self.batch_size)
+                self.counts[model._meta.label] += len(objs)
+        self.pending_count = 0
+
+    def generate(self):
+        """
+        Generate the dataset.
+
+        Returns:
+            dict[str, int]: The number of created rows of each model.
+        """
+        primary_currency = self.currencies[0]
+        self.create_exchange_rates(primary_currency)
+
+        password = make_password(DATASET_PASSWORD)
+        # The IDs are set up front, since MariaDB doesn't return the IDs of
+        # bulk inserted rows.
+        first_id = (User.objects.aggregate(Max("id"))["id__max"] or 0) + 1
+        users = []
+        for index in range(self.users):
+            user = User(
+                id=first_id + index,
+                username=f"{self.username_prefix}{index}",
+                email=f"{self.username_prefix}{index}@example.com",
+                password=password,
+            )
+            self.add(user)
+            users.append(user)
+
+        for index in range(self.groups):
+            self.generate_group(index, users, primary_currency)
+        self.flush()
+
+        for currency in self.currencies:
+            balances = [
+                UserBalance(
+                    user_id=user_id,
+                    currency=currency,
+                    balance=to_major_units(balance, currency),
+                    balance_minor=balance,
+                )
+                for (user_id, balance_currency), balance in self.user_balances.items()
+                if balance_currency == currency
+            ]
+            UserBalance.objects.bulk_create(balances, batch_size=self.batch_size)
+            self.counts[UserBalance._meta.label] += len(balances)
+        return dict(self.counts)
+
+    def create_exchange_rates(self, primary_currency):
+        """
+        Store a rate from each currency of the mix to the primary currency, unless
+        one is already stored.
+
+        Args:
+            primary_currency (str): The primary currency of the groups.
+        """
+        ExchangeRate.objects.bulk_create(
+            [
+                ExchangeRate(
+                    base_currency=currency,
+                    quote_currency=primary_currency,
+                    date=datetime.date(2000, 1, 1),
+                    rate=SYNTHETIC_RATES[currency] / SYNTHETIC_RATES[primary_currency],
+                )
+                for currency in self.currencies[1:]
+            ],
+            ignore_conflicts=True,
+        )
+
+    def generate_group(self, index, users, primary_currency):
+        """
+        Generate a group with its members, records and balances.
+
+        Args:
+            index (int): The number of the group.
+            users (list[User]): The generated users.
+            primary_currency (str): The primary currency of the group.
+        """
+        rng = self.rng
+        owner = rng.choice(users)
+        group = Group(
+            id=self.uuid(),
+            owner=owner,
+            name=f"Group {index}",
+            primary_currency=primary_currency,
+        )
+        self.add(group)
+
+        # Every user is a member of a group at most once.
+        candidates = [
+            user
+            for user in rng.sample(users, min(len(users), self.members_per_group))
+            if user is not owner
+        ]
+        members = []
+        for number in range(self.members_per_group):
+            if number == 0:
+                user = owner
+            elif number <= len(candidates) and rng.random() < BOUND_MEMBER_RATIO:
+                user = candidates[number - 1]
+            else:
+                user = None
+            member = Member(
+                id=self.uuid(),
+                group=group,
+                user=user,
+                name=owner.username if number == 0 else f"Member {number}",
+                permission="edit",
+            )
+            self.add(member)
+            members.append(member)
+
+        balances = defaultdict(int)
+        primary_balances = defaultdict(int)
+        for number in range(self.records_per_group):
+            currency = rng.choices(self.currencies, self.currency_weights)[0]
+            factor = get_minor_unit_factor(currency)
+            amount = rng.randint(factor, 5000 * factor)
+            exchange_rate = (
+                SYNTHETIC_RATES[currency] / SYNTHETIC_RATES[primary_currency]
+            )
+            payer = rng.choice(members)
+            participants = rng.sample(
+                members, rng.randint(1, min(self.split_fanout, len(members)))
+            )
+            is_equal_split = rng.random() < EQUAL_SPLIT_RATIO
+            record = Record(
+                id=self.uuid(),
+                group=group,
+                what=f"Record {number}",
+                amount=to_major_units(amount, currency),
+                amount_minor=amount,
+                type="expense",
+                currency=currency,
+                exchange_rate=1 if currency == primary_currency else exchange_rate,
+                is_equal_split=is_equal_split,
+            )
+            if is_equal_split:
+                record.split_rule = Record.SPLIT_EQUAL
+                record.split_participants = [
+                    {"member_id": str(member.id), "weight": 1}
+                    for member in participants
+                ]
+                shares = allocate(-amount, [1] * len(participants))
+            else:
+                shares = allocate(-amount, [rng.randint(1, 5) for _ in participants])
+            self.add(record)
+            self.add(
+                From(
+                    record=record,
+                    member=payer,
+                    amount=record.amount,
+                    amount_minor=amount,
+                )
+            )
+            if not is_equal_split:
+                for member, share in zip(participants, shares):
+                    self.add(
+                        To(
+                            record=record,
+                            member=member,
+                            amount=to_major_units(share, currency),
+                            amount_minor=share,
+                        )
+                    )
+
+            deltas = defaultdict(int)
+            deltas[payer] += amount
+            for member, share in zip(participants, shares):
+                deltas[member] += share
+            for member, delta in deltas.items():
+                balances[(member, currency)] += delta
+                primary_balances[member] += convert_minor_units(
+                    delta, currency, primary_currency, record.exchange_rate
+                )
+                if delta:
+                    self.add(FeedItem(record=record, member=member, user=member.user))
+
+        for member in members:
+            member.primary_balance_minor = primary_balances[member]
+            member.primary_balance = to_major_units(
+                member.primary_balance_minor, primary_currency
+            )
+        # Members written in a batch before their last record are updated.
+        written = [member for member in members if not member._state.adding]
+        if written:
+            Member.objects.bulk_update(
+                written,
+                ["primary_balance", "primary_balance_minor"],
+                batch_size=self.batch_size,
+            )
+
+        currencies = {currency for _, currency in balances}
+        for member in members:
+            for currency in sorted(currencies):
+                balance = balances[(member, currency)]
+                self.add(
+                    Balance(
+                        member=member,
+                        currency=currency,
+                        balance=to_major_units(balance, currency),
+                        balance_minor=balance,
+                    )
+                )
+                if member.user is not None:
+                    self.user_balances[(member.user.id, currency)] += balance
@@ -0,0 +1,198 @@
+import threading
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from cachetools import TTLCache
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.serializers import ValidationError
+
+from account.models import Member
+from common.metrics import BALANCE_RECOMPUTE_DURATION
+from common.money import get_minor_unit_factor, to_major_units
+from record.models import ArchivedRecord, ExchangeRate, Record
+from record.splits import get_balance_deltas
+
+EXCHANGE_RATE_CACHE_KEY = "exchange_rate_%s_%s_%s_%s"
+EXCHANGE_RATES_VERSION_KEY = "exchange_rates_version"
+# Cached in Redis for missing rates, since None can't be told from a cache miss.
+MISSING_RATE = 0
+
+# Rates are looked up for every record write, so the latest ones also stay in
+# each process. Other processes see new rates once their entries expire.
+_local_rates = TTLCache(maxsize=4096, ttl=60)
+_local_rates_lock = threading.Lock()
+
+
+def bump_exchange_rates_version():
+    """
+    Invalidate the exchange rates cached in Redis after a rate changed.
+    """
+    try:
+        cache.incr(EXCHANGE_RATES_VERSION_KEY)
+    except ValueError:
+        if not cache.add(EXCHANGE_RATES_VERSION_KEY, 1, timeout=None):
+            cache.incr(EXCHANGE_RATES_VERSION_KEY)
+    with _local_rates_lock:
+        _local_rates.clear()
+
+
+def query_exchange_rate(base_currency, quote_currency, date):
+    """
+    Query the latest stored rate between two currencies on a date.
+
+    Args:
+        base_currency (str): The currency converted from.
+        quote_currency (str): The currency converted to.
+        date (date): The date of the conversion.
+
+    Returns:
+        float: Units of the quote currency per unit of the base currency, or
+            None if neither direction has a rate on or before the date.
+    """
+    for base, quote in (
+        (base_currency, quote_currency),
+        (quote_currency, base_currency),
+    ):
+        rate = (
+            ExchangeRate.objects.filter(
+                base_currency=base, quote_currency=quote, date__lte=date
+            )
+            .order_by("-date")
+            .values_list("rate", flat=True)
+            .first()
+        )
+        if rate:
+            return rate if base == base_currency else 1 / rate
+    return None
+
+
+def get_exchange_rate(base_currency, quote_currency, date):
+    """
+    Get the rate between two currencies on a date, from the in-process cache,
+    Redis or the database.
+
+    Args:
+        base_currency (str): The currency converted from.
+        quote_currency (str): The currency converted to.
+        date (date): The date of the conversion.
+
+    Returns:
+        float: Units of the quote currency per unit of the base currency, or
+            None if no rate is known.
+    """
+    if base_currency == quote_currency:
+        return 1.0
+
+    key = (base_currency, quote_currency, date)
+    with _local_rates_lock:
+        rate = _local_rates.get(key)
+    if rate is None:
+        cache_key = EXCHANGE_RATE_CACHE_KEY % (
+            cache.get(EXCHANGE_RATES_VERSION_KEY, 0),
+            base_currency,
+            quote_currency,
+            date.isoformat(),
+        )
+        rate = cache.get(cache_key)
+        if rate is None:
+            rate = query_exchange_rate(base_currency, quote_currency, date)
+            rate = MISSING_RATE if rate is None else rate
+            cache.set(cache_key, rate)
+        with _local_rates_lock:
+            _local_rates[key] = rate
+    return rate or None
+
+
+def convert_minor_units(amount, base_currency, quote_currency, rate):
+    """
+    Convert minor units of one currency to minor units of another, rounding half up.
+
+    Args:
+        amount (int): The amount in minor units of the base currency.
+        base_currency (str): The currency converted from.
+        quote_currency (str): The currency converted to.
+        rate (float): Units of the quote currency per unit of the base currency.
+
+    Returns:
+        int: The amount in minor units of the quote currency.
+    """
+    if base_currency == quote_currency:
+        return amount
+    value = (
+        Decimal(amount)
+        * Decimal(str(rate))
+        * get_minor_unit_factor(quote_currency)
+        / get_minor_unit_factor(base_currency)
+    )
+    return int(value.to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def get_record_exchange_rate(currency, primary_currency, date):
+    """
+    Get the stored rate converting a record's currency to its group's primary
+    currency.
+
+    Args:
+        currency (str): The currency of the record.
+        primary_currency (str): The primary currency of the group.
+        date (date): The date of the record.
+
+    Returns:
+        float: The exchange rate.
+
+    Raises:
+        ValidationError: If no rate between the currencies is stored.
+    """
+    rate = get_exchange_rate(currency, primary_currency, date)
+    if rate is None:
+        raise ValidationError(
+            {
+                "exchange_rate": f"No exchange rate from {currency} to {primary_currency}."
+            }
+        )
+    return rate
+
+
+@BALANCE_RECOMPUTE_DURATION.time(operation="primary_currency")
+def recalculate_primary_balances(group):
+    """
+    Convert all records of a group, archived or not, to its primary currency
+    again and rebuild the primary balances of its members, e.g. after the
+    primary currency changed.
+
+    Args:
+        group (Group): The group with its new primary currency.
+
+    Raises:
+        ValidationError: If a rate needed for the conversion isn't stored.
+    """
+    primary_currency = group.primary_currency
+    totals = defaultdict(int)
+    for model in (Record, ArchivedRecord):
+        records = list(
+            model.objects.filter(group=group).prefetch_related(
+                "from_members", "to_members"
+            )
+        )
+        for record in records:
+            record.exchange_rate = get_record_exchange_rate(
+                record.currency,
+                primary_currency,
+                timezone.localdate(record.created_at),
+            )
+            for member_id, delta in get_balance_deltas(record).items():
+                totals[member_id] += convert_minor_units(
+                    delta, record.currency, primary_currency, record.exchange_rate
+                )
+        model.objects.bulk_update(records, ["exchange_rate"], batch_size=1000)
+
+    members = list(group.members.all())
+    for member in members:
+        member.primary_balance_minor = totals[str(member.id)]
+        member.primary_balance = to_major_units(
+            member.primary_balance_minor, primary_currency
+        )
+    Member.objects.bulk_update(
+        members, ["primary_balance", "primary_balance_minor"], batch_size=1000
+    )
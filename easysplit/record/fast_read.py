@@ -0,0 +1,135 @@
+from collections import defaultdict
+
+from common.profiling import timed
+from common.renderers import is_orjson_exact
+from record.models import Balance, From, Record, To
+from record.splits import get_split_amounts
+
+GROUP_BALANCES_CACHE_KEY = "group_balances_%s_%s"
+
+
+@timed("serialize")
+def get_records_data(queryset, split_models=(From, To)):
+    """
+    Build the RecordSerializer output of the records from plain row tuples.
+
+    The splits of all records are fetched with one query per side and grouped
+    by record in a single pass, so no model instances or serializer fields are
+    created.
+
+    Args:
+        queryset (QuerySet[Record]): The records to serialize.
+        split_models (tuple[Model, Model]): The models of the records' From and
+            To rows, e.g. the archive models for archived records.
+
+    Returns:
+        tuple[list, bool]: The serialized records, and whether orjson renders
+            every float in them exactly like the standard json module.
+    """
+    is_exact = True
+    record_ids = queryset.values("id")
+
+    splits = []
+    for model in split_models:
+        members_by_record = defaultdict(list)
+        rows = (
+            model.objects.filter(record__in=record_ids)
+            .order_by("id")
+            .values_list("record_id", "member_id", "amount")
+        )
+        for record_id, member_id, amount in rows:
+            members_by_record[record_id].append(
+                {"member_id": member_id, "amount": amount}
+            )
+            is_exact = is_exact and is_orjson_exact(amount)
+        splits.append(members_by_record)
+    from_members, to_members = splits
+
+    data = []
+    rows = queryset.values_list(
+        "id",
+        "group_id",
+        "what",
+        "amount",
+        "type",
+        "currency",
+        "exchange_rate",
+        "note",
+        "is_equal_split",
+        "split_rule",
+        "split_participants",
+    )
+    for (
+        record_id,
+        group_id,
+        what,
+        amount,
+        record_type,
+        currency,
+        exchange_rate,
+        note,
+        is_equal_split,
+        split_rule,
+        split_participants,
+    ) in rows:
+        if split_rule == Record.SPLIT_EXACT:
+            record_to_members = to_members.get(record_id, [])
+        else:
+            record_to_members = get_split_amounts(
+                amount, currency, split_rule, split_participants
+            )
+            is_exact = is_exact and all(
+                is_orjson_exact(item["amount"]) for item in record_to_members
+            )
+        participants = [
+            {"member_id": item["member_id"], "weight": float(item["weight"])}
+            for item in split_participants
+        ]
+        is_exact = is_exact and all(
+            is_orjson_exact(item["weight"]) for item in participants
+        )
+        data.append(
+            {
+                "id": str(record_id),
+                "group_id": group_id,
+                "what": what,
+                "amount": amount,
+                "type": record_type,
+                "currency": currency,
+                "exchange_rate": exchange_rate,
+                "note": note,
+                "is_equal_split": is_equal_split,
+                "split_rule": split_rule,
+                "split_participants": participants,
+                "from_members": from_members.get(record_id, []),
+                "to_members": record_to_members,
+            }
+        )
+        is_exact = (
+            is_exact and is_orjson_exact(amount) and is_orjson_exact(exchange_rate)
+        )
+
+    return data, is_exact
+
+
+def get_group_balances_data(group_id):
+    """
+    Build the balances of all members of a group from plain row tuples.
+
+    Args:
+        group_id (str): The ID of the group.
+
+    Returns:
+        tuple[list, bool]: The balances, and whether orjson renders every float
+            in them exactly like the standard json module.
+    """
+    rows = (
+        Balance.objects.filter(member__group_id=group_id)
+        .order_by("member__created_at", "id")
+        .values_list("member_id", "balance", "currency")
+    )
+    data = [
+        {"member_id": str(member_id), "balance": balance, "currency": currency}
+        for member_id, balance, currency in rows
+    ]
+    return data, all(is_orjson_exact(item["balance"]) for item in data)
@@ -0,0 +1,47 @@
+from collections import defaultdict
+
+from account.models import Member
+from record.models import FeedItem
+
+
+def fan_out_record(record, member_ids):
+    """
+    Write a record to the feeds of the members it involves.
+
+    The record's previous feed rows are replaced, since an update may change
+    who is involved.
+
+    Args:
+        record (Record): The saved record.
+        member_ids (Iterable[str]): The IDs of the members the record involves,
+            e.g. the keys of its balance deltas.
+    """
+    FeedItem.objects.filter(record=record).delete()
+    members = Member.objects.filter(id__in=list(member_ids)).values_list(
+        "id", "user_id"
+    )
+    FeedItem.objects.bulk_create(
+        FeedItem(
+            record=record,
+            member_id=member_id,
+            user_id=user_id,
+            created_at=record.created_at,
+        )
+        for member_id, user_id in members
+    )
+
+
+def rebind_feed_items(members):
+    """
+    Move the feed rows of members to the users they are now bound to.
+
+    Args:
+        members (list[Member]): The members with their new users.
+    """
+    member_ids_by_user = defaultdict(list)
+    for member in members:
+        member_ids_by_user[member.user_id].append(member.id)
+    for user_id, member_ids in member_ids_by_user.items():
+        FeedItem.objects.filter(member_id__in=member_ids).exclude(
+            user_id=user_id
+        ).update(user_id=user_id)
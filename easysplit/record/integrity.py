@@ -0,0 +1,269 @@
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Sum
+
+from account.change_stream import notify_group_change
+from account.models import Group, Member
+from account.rollup import apply_user_balance_deltas
+from common.metrics import BALANCE_RECOMPUTE_DURATION
+from common.money import apply_minor_unit_deltas, to_major_units
+from record.exchange_rates import convert_minor_units
+from record.models import ArchivedRecord, Balance, From, OpeningBalance, Record, To
+from record.splits import get_balance_deltas, split_amount
+
+
+def get_expected_balances(group_id):
+    """
+    Compute the balances of a group's members from its records.
+
+    The From and To rows are summed by member and currency in the database.
+    Only the rule-based splits, which have no To rows, are split in Python from
+    plain rows.
+
+    Args:
+        group_id (str): The ID of the group.
+
+    Returns:
+        dict[tuple[str, str], int]: The balance in minor units of each member ID
+            and currency.
+    """
+    balances = defaultdict(int)
+    rows = OpeningBalance.objects.filter(group_id=group_id).values_list(
+        "member_id", "currency", "balance_minor"
+    )
+    for member_id, currency, balance in rows:
+        balances[(str(member_id), currency)] += balance
+
+    for model in (From, To):
+        rows = (
+            model.objects.filter(record__group_id=group_id)
+            .values_list("member_id", "record__currency")
+            .annotate(total=Sum("amount_minor"))
+            .order_by()
+        )
+        for member_id, currency, total in rows:
+            balances[(str(member_id), currency)] += total
+
+    rows = (
+        Record.objects.filter(group_id=group_id)
+        .exclude(split_rule=Record.SPLIT_EXACT)
+        .values_list("amount_minor", "currency", "split_rule", "split_participants")
+    )
+    for amount, currency, split_rule, participants in rows:
+        shares = split_amount(
+            -amount,
+            split_rule,
+            [participant.get("weight", 1) for participant in participants],
+        )
+        for participant, share in zip(participants, shares):
+            balances[(participant["member_id"], currency)] += share
+    return balances
+
+
+def get_expected_primary_balances(group_id, primary_currency, balances):
+    """
+    Compute the primary balances of a group's members from its records.
+
+    Each record's deltas are converted at its exchange rate and rounded on their
+    own, like when the record was saved. The balances in the primary currency
+    need no conversion, so only the records in other currencies, archived or
+    not, are read one by one.
+
+    Args:
+        group_id (str): The ID of the group.
+        primary_currency (str): The primary currency of the group.
+        balances (dict[tuple[str, str], int]): The expected balances returned by
+            get_expected_balances.
+
+    Returns:
+        dict[str, int]: The primary balance in minor units of each member ID.
+    """
+    primary_balances = defaultdict(int)
+    for (member_id, currency), balance in balances.items():
+        if currency == primary_currency:
+            primary_balances[member_id] += balance
+
+    for model in (Record, ArchivedRecord):
+        records = (
+            model.objects.filter(group_id=group_id)
+            .exclude(currency=primary_currency)
+            .prefetch_related("from_members", "to_members")
+        )
+        for record in records:
+            for member_id, delta in get_balance_deltas(record).items():
+                primary_balances[member_id] += convert_minor_units(
+                    delta, record.currency, primary_currency, record.exchange_rate
+                )
+    return primary_balances
+
+
+def find_mismatches(group_id, currency, stored, expected, primary):
+    """
+    Compare stored balances with the expected ones.
+
+    Args:
+        group_id (str): The ID of the group.
+        currency (str): The currency of the balances, or None if the keys
+            contain it.
+        stored (dict): The stored balance in minor units of each key.
+        expected (dict): The expected balance in minor units of each key.
+        primary (bool): Whether the balances are primary balances.
+
+    Returns:
+        list[dict]: The mismatches, in the format returned by check_group.
+    """
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        if stored.get(key, 0) == expected.get(key, 0):
+            continue
+        member_id, key_currency = key if currency is None else (key, currency)
+        mismatches.append(
+            {
+                "group_id": str(group_id),
+                "member_id": member_id,
+                "currency": key_currency,
+                "primary": primary,
+                "stored": stored.get(key, 0),
+                "expected": expected.get(key, 0),
+            }
+        )
+    return mismatches
+
+
+@BALANCE_RECOMPUTE_DURATION.time(operation="integrity_check")
+def check_group(group_id, repair=False):
+    """
+    Compare the stored balances and primary balances of a group with the
+    balances of its records.
+
+    The balances are read in one transaction, which sees a consistent snapshot
+    without locking rows. Repairs add the differences with F() expressions, so
+    records saved meanwhile keep their own changes.
+
+    Args:
+        group_id (str): The ID of the group.
+        repair (bool): Whether to correct the mismatching balances.
+
+    Returns:
+        list[dict]: The mismatches, each containing group_id, member_id,
+            currency, whether it is a primary balance, and the stored and
+            expected balance in minor units.
+    """
+    with transaction.atomic():
+        expected = get_expected_balances(group_id)
+        stored = {
+            (str(member_id), currency): balance
+            for member_id, currency, balance in Balance.objects.filter(
+                member__group_id=group_id
+            ).values_list("member_id", "currency", "balance_minor")
+        }
+        primary_currency = (
+            Group.all_objects.filter(id=group_id)
+            .values_list("primary_currency", flat=True)
+            .get()
+        )
+        expected_primary = get_expected_primary_balances(
+            group_id, primary_currency, expected
+        )
+        stored_primary = {
+            str(member_id): balance
+            for member_id, balance in Member.objects.filter(
+                group_id=group_id
+            ).values_list("id", "primary_balance_minor")
+        }
+
+    mismatches = find_mismatches(group_id, None, stored, expected, False)
+    mismatches += find_mismatches(
+        group_id, primary_currency, stored_primary, expected_primary, True
+    )
+    if repair and mismatches:
+        repair_balances(group_id, mismatches)
+    return mismatches
+
+
+@transaction.atomic
+def repair_balances(group_id, mismatches):
+    """
+    Add the differences of mismatching balances to the stored balances, and
+    push the change to the group's subscribers once it is committed.
+
+    Args:
+        group_id (str): The ID of the group.
+        mismatches (list[dict]): The mismatches found by check_group.
+    """
+    deltas_by_currency = defaultdict(dict)
+    primary_deltas_by_currency = defaultdict(dict)
+    for mismatch in mismatches:
+        by_currency = (
+            primary_deltas_by_currency if mismatch["primary"] else deltas_by_currency
+        )
+        by_currency[mismatch["currency"]][mismatch["member_id"]] = (
+            mismatch["expected"] - mismatch["stored"]
+        )
+
+    for currency, deltas in deltas_by_currency.items():
+        missing = set(deltas) - {
+            str(member_id)
+            for member_id in Balance.objects.filter(
+                member_id__in=list(deltas), currency=currency
+            ).values_list("member_id", flat=True)
+        }
+        Balance.objects.bulk_create(
+            Balance(member_id=member_id, currency=currency) for member_id in missing
+        )
+        apply_minor_unit_deltas(
+            Balance.objects.filter(member__group_id=group_id, currency=currency),
+            "member_id",
+            deltas,
+            "balance",
+            currency,
+        )
+        apply_user_balance_deltas(currency, deltas)
+
+    for currency, deltas in primary_deltas_by_currency.items():
+        apply_minor_unit_deltas(
+            Member.objects.filter(group_id=group_id),
+            "id",
+            deltas,
+            "primary_balance",
+            currency,
+        )
+    transaction.on_commit(partial(notify_group_change, group_id, "members.updated"))
+
+
+def check_groups(group_ids, repair=False):
+    """
+    Check the balances of a chunk of groups, e.g. in a worker process.
+
+    Args:
+        group_ids (list[str]): The IDs of the groups.
+        repair (bool): Whether to correct the mismatching balances.
+
+    Returns:
+        tuple[int, list[dict]]: The number of checked groups and the mismatches.
+    """
+    mismatches = []
+    for group_id in group_ids:
+        mismatches.extend(check_group(group_id, repair))
+    return len(group_ids), mismatches
+
+
+def format_mismatch(mismatch):
+    """
+    Describe a mismatch for reports.
+
+    Args:
+        mismatch (dict): The mismatch found by check_group.
+
+    Returns:
+        str: The description with the balances in major units.
+    """
+    currency = mismatch["currency"]
+    balance = f"primary {currency}" if mismatch["primary"] else currency
+    return (
+        f"group {mismatch['group_id']} member {mismatch['member_id']} {balance}: "
+        f"stored {to_major_units(mismatch['stored'], currency)}, "
+        f"expected {to_major_units(mismatch['expected'], currency)}"
+    )
@@ -0,0 +1,43 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from account.models import Group
+from record.archive import ARCHIVE_BATCH_SIZE, archive_group_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the records created before a date into the archive tables and the "
+        "members' opening balances."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before",
+            type=datetime.date.fromisoformat,
+            required=True,
+            help="Archive the records created before this date (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--group-id",
+            help="Only archive this group instead of all groups.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=ARCHIVE_BATCH_SIZE,
+            help="Maximum number of records moved per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        until = timezone.make_aware(
+            datetime.datetime.combine(options["before"], datetime.time.min)
+        )
+        groups = Group.objects.all()
+        if options["group_id"]:
+            groups = groups.filter(id=options["group_id"])
+        for group in groups.iterator():
+            archived = archive_group_history(group, until, options["batch_size"])
+            self.stdout.write(f"Archived {archived} records of group {group.id}")
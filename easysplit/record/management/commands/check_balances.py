@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.core.management.base import BaseCommand
+
+from account.models import Group
+from record.integrity import check_groups, format_mismatch
+
+
+def iter_group_chunks(chunk_size, group_id=None):
+    """
+    Stream the IDs of all groups in chunks, without loading them at once.
+
+    Args:
+        chunk_size (int): The number of group IDs per chunk.
+        group_id (str): Only yield this group, if given.
+
+    Yields:
+        list[str]: The next chunk of group IDs.
+    """
+    queryset = Group.objects.order_by("id")
+    if group_id:
+        queryset = queryset.filter(id=group_id)
+    last_id = None
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        group_ids = [str(id) for id in chunk.values_list("id", flat=True)[:chunk_size]]
+        if not group_ids:
+            return
+        yield group_ids
+        last_id = group_ids[-1]
+
+
+def map_bounded(executor, fn, iterable, max_pending):
+    """
+    Map a function over an iterable in a pool, submitting only a few items ahead.
+
+    Unlike Executor.map, the iterable isn't consumed up front, so the group IDs
+    are streamed from the database as the workers progress.
+
+    Args:
+        executor (Executor): The pool.
+        fn (Callable): The function to run on each item.
+        iterable (Iterable): The items.
+        max_pending (int): The maximum number of submitted but unread items.
+
+    Yields:
+        The results in the order of the items.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify that the stored balances match the records of every group, and "
+        "optionally repair the mismatches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Correct the mismatching balances.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes, or 1 to check in this process.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of groups each worker checks at a time.",
+        )
+        parser.add_argument(
+            "--group-id",
+            help="Only check this group instead of all groups.",
+        )
+
+    def handle(self, *args, **options):
+        chunks = iter_group_chunks(options["chunk_size"], options["group_id"])
+        check = partial(check_groups, repair=options["repair"])
+        executor = None
+        if options["workers"] > 1:
+            # Spawned workers set Django up and open their own connections,
+            # instead of sharing the forked connection of this process.
+            executor = ProcessPoolExecutor(
+                max_workers=options["workers"],
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+            results = map_bounded(executor, check, chunks, options["workers"] * 2)
+        else:
+            results = map(check, chunks)
+
+        checked = 0
+        mismatch_count = 0
+        try:
+            for count, mismatches in results:
+                checked += count
+                mismatch_count += len(mismatches)
+                for mismatch in mismatches:
+                    self.stdout.write(format_mismatch(mismatch))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        action = "Repaired" if options["repair"] else "Found"
+        self.stdout.write(
+            f"Checked {checked} groups. {action} {mismatch_count} mismatching balances."
+        )
@@ -0,0 +1,41 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from account.models import Group
+from record.checkpoints import create_checkpoint
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the balances of every member at a point in time, so point-in-time "
+        "queries only add up the records since then. Run it monthly, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--as-of",
+            type=datetime.date.fromisoformat,
+            help="Store the balances at the start of this date (YYYY-MM-DD). "
+            "Defaults to the first day of the current month.",
+        )
+        parser.add_argument(
+            "--group-id",
+            help="Only create the checkpoint of this group instead of all groups.",
+        )
+
+    def handle(self, *args, **options):
+        as_of_date = options["as_of"] or timezone.localdate().replace(day=1)
+        as_of = timezone.make_aware(
+            datetime.datetime.combine(as_of_date, datetime.time.min)
+        )
+        if as_of > timezone.now():
+            raise CommandError("Checkpoints can't be in the future.")
+
+        groups = Group.objects.all()
+        if options["group_id"]:
+            groups = groups.filter(id=options["group_id"])
+        for group in groups.iterator():
+            count = create_checkpoint(group, as_of)
+            self.stdout.write(f"Stored {count} balances of group {group.id}")
@@ -0,0 +1,100 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from record.dataset import DATASET_BATCH_SIZE, DatasetGenerator, parse_currency_mix
+
+
+def positive_int(value):
+    value = int(value)
+    if value < 1:
+        raise ValueError(value)
+    return value
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate reproducible synthetic users, groups, members and records for "
+        "scale testing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=positive_int, default=100, help="Number of users."
+        )
+        parser.add_argument(
+            "--groups", type=positive_int, default=10, help="Number of groups."
+        )
+        parser.add_argument(
+            "--members-per-group",
+            type=positive_int,
+            default=5,
+            help="Number of members of each group, including its owner.",
+        )
+        parser.add_argument(
+            "--records-per-group",
+            type=int,
+            default=100,
+            help="Number of records of each group.",
+        )
+        parser.add_argument(
+            "--split-fanout",
+            type=positive_int,
+            default=3,
+            help="Maximum number of members a record is split between.",
+        )
+        parser.add_argument(
+            "--currencies",
+            default="TWD",
+            help=(
+                "Currencies of the records with optional weights, e.g. "
+                "TWD:7,USD:2,JPY:1. The first is the groups' primary currency."
+            ),
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed of the random generator."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=positive_int,
+            default=DATASET_BATCH_SIZE,
+            help="Number of rows written per bulk insert.",
+        )
+        parser.add_argument(
+            "--username-prefix",
+            default="synthetic",
+            help="Prefix of the usernames, which must not exist yet.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            currency_mix = parse_currency_mix(options["currencies"])
+        except ValueError as error:
+            raise CommandError(error)
+        if User.objects.filter(
+            username__startswith=options["username_prefix"]
+        ).exists():
+            raise CommandError(
+                f"Users named {options['username_prefix']}* exist already, choose "
+                "another --username-prefix."
+            )
+
+        started = time.perf_counter()
+        counts = DatasetGenerator(
+            users=options["users"],
+            groups=options["groups"],
+            members_per_group=options["members_per_group"],
+            records_per_group=options["records_per_group"],
+            split_fanout=options["split_fanout"],
+            currency_mix=currency_mix,
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            username_prefix=options["username_prefix"],
+        ).generate()
+        for label, count in counts.items():
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(
+            f"Generated {sum(counts.values())} rows in "
+            f"{time.perf_counter() - started:.1f}s."
+        )
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.4 on 2026-10-18 23:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('record', '0005_alter_balance_balance_alter_record_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='record',
+            name='split_participants',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='record',
+            name='split_rule',
+            field=models.CharField(choices=[('exact', 'exact'), ('equal', 'equal'), ('shares', 'shares'), ('percent', 'percent')], default='exact', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='record',
+            name='is_equal_split',
+            field=models.BooleanField(blank=True, default=True),
+        ),
+    ]
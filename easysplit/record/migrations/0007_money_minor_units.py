@@ -0,0 +1,33 @@
+# Generated by Django 4.0.4 on 2026-10-18 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('record', '0006_record_split_rule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='balance',
+            name='balance_minor',
+            field=models.BigIntegerField(blank=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='from',
+            name='amount_minor',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='record',
+            name='amount_minor',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='to',
+            name='amount_minor',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+from common.money import to_minor_units
+
+# Rows converted per transaction, so the backfill never locks a table for long.
+BATCH_SIZE = 1000
+
+
+def backfill(model, amount_field, currency_field):
+    """
+    Fill the minor unit column of a model from its float column in batches.
+
+    Args:
+        model (Model): The historical model.
+        amount_field (str): The name of the float column.
+        currency_field (str): The lookup of the row's currency.
+    """
+    minor_field = f"{amount_field}_minor"
+    last_pk = None
+    while True:
+        queryset = model.objects.order_by("pk")
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        rows = list(
+            queryset.values_list("pk", amount_field, currency_field)[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        model.objects.bulk_update(
+            [
+                model(pk=pk, **{minor_field: to_minor_units(amount, currency)})
+                for pk, amount, currency in rows
+            ],
+            [minor_field],
+        )
+        last_pk = rows[-1][0]
+
+
+def backfill_minor_units(apps, schema_editor):
+    backfill(apps.get_model("record", "Record"), "amount", "currency")
+    backfill(apps.get_model("record", "From"), "amount", "record__currency")
+    backfill(apps.get_model("record", "To"), "amount", "record__currency")
+    backfill(apps.get_model("record", "Balance"), "balance", "currency")
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own instead of one transaction over all rows.
+    atomic = False
+
+    dependencies = [
+        ("record", "0007_money_minor_units"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_minor_units, migrations.RunPython.noop),
+    ]
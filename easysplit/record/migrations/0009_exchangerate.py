@@ -0,0 +1,37 @@
+# Generated by Django 4.0.4 on 2026-10-18 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('record', '0008_backfill_money_minor_units'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_currency', models.CharField(choices=[('TWD', 'TWD'), ('USD', 'USD'), ('EUR', 'EUR'), ('JPY', 'JPY')], max_length=10)),
+                ('quote_currency', models.CharField(choices=[('TWD', 'TWD'), ('USD', 'USD'), ('EUR', 'EUR'), ('JPY', 'JPY')], max_length=10)),
+                ('date', models.DateField()),
+                ('rate', models.FloatField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='balance',
+            name='currency',
+            field=models.CharField(choices=[('TWD', 'TWD'), ('USD', 'USD'), ('EUR', 'EUR'), ('JPY', 'JPY')], default='TWD', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='record',
+            name='currency',
+            field=models.CharField(choices=[('TWD', 'TWD'), ('USD', 'USD'), ('EUR', 'EUR'), ('JPY', 'JPY')], default='TWD', max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='exchangerate',
+            constraint=models.UniqueConstraint(fields=('base_currency', 'quote_currency', 'date'), name='unique_exchange_rate'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0.4 on 2026-10-18 23:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_backfill_user_balances'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('record', '0009_exchangerate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='account.member')),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='record.record')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='feed_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('record', 'member'), name='unique_feed_item'),
+        ),
+    ]
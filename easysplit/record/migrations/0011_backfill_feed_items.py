@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Records fanned out per transaction, so the backfill never locks a table for long.
+BATCH_SIZE = 1000
+
+
+def backfill_feed_items(apps, schema_editor):
+    """
+    Write the existing records to the feeds of the members they involve.
+    """
+    Record = apps.get_model("record", "Record")
+    Member = apps.get_model("account", "Member")
+    FeedItem = apps.get_model("record", "FeedItem")
+
+    last_pk = None
+    while True:
+        queryset = Record.objects.order_by("pk")
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        records = list(
+            queryset.prefetch_related("from_members", "to_members")[:BATCH_SIZE]
+        )
+        if not records:
+            return
+
+        member_ids_by_record = {}
+        for record in records:
+            member_ids = {str(item.member_id) for item in record.from_members.all()}
+            member_ids |= {str(item.member_id) for item in record.to_members.all()}
+            member_ids |= {
+                participant["member_id"] for participant in record.split_participants
+            }
+            member_ids_by_record[record] = member_ids
+        user_ids = {
+            str(member_id): user_id
+            for member_id, user_id in Member.objects.filter(
+                id__in=set().union(*member_ids_by_record.values())
+            ).values_list("id", "user_id")
+        }
+        FeedItem.objects.bulk_create(
+            [
+                FeedItem(
+                    record=record,
+                    member_id=member_id,
+                    user_id=user_ids[member_id],
+                    created_at=record.created_at,
+                )
+                for record, member_ids in member_ids_by_record.items()
+                for member_id in member_ids
+                if member_id in user_ids
+            ],
+            ignore_conflicts=True,
+        )
+        last_pk = records[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own instead of one transaction over all rows.
+    atomic = False
+
+    dependencies = [
+        ("record", "0010_feeditem"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_feed_items, migrations.RunPython.noop),
+    ]
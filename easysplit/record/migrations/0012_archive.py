@@ -0,0 +1,74 @@
+# Generated by Django 4.0.4 on 2026-10-18 23:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0007_group_archived_until'),
+        ('record', '0011_backfill_feed_items'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRecord',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('what', models.CharField(max_length=100)),
+                ('amount', models.FloatField()),
+                ('amount_minor', models.BigIntegerField(default=0)),
+                ('type', models.CharField(choices=[('expense', 'expense'), ('income', 'income'), ('transfer', 'transfer')], max_length=10)),
+                ('currency', models.CharField(choices=[('TWD', 'TWD'), ('USD', 'USD'), ('EUR', 'EUR'), ('JPY', 'JPY')], max_length=10)),
+                ('exchange_rate', models.FloatField(default=1)),
+                ('note', models.TextField(blank=True, default='')),
+                ('is_equal_split', models.BooleanField(blank=True, default=True)),
+                ('split_rule', models.CharField(choices=[('exact', 'exact'), ('equal', 'equal'), ('shares', 'shares'), ('percent', 'percent')], max_length=10)),
+                ('split_participants', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_records', to='account.group')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OpeningBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.FloatField(blank=True, default=0)),
+                ('balance_minor', models.BigIntegerField(blank=True, default=0)),
+                ('currency', models.CharField(choices=[('TWD', 'TWD'), ('USD', 'USD'), ('EUR', 'EUR'), ('JPY', 'JPY')], default='TWD', max_length=10)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_balances', to='account.group')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_balances', to='account.member')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.FloatField()),
+                ('amount_minor', models.BigIntegerField(default=0)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='account.member')),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='to_members', to='record.archivedrecord')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedFrom',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.FloatField()),
+                ('amount_minor', models.BigIntegerField(default=0)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='account.member')),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='from_members', to='record.archivedrecord')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='openingbalance',
+            constraint=models.UniqueConstraint(fields=('member', 'currency'), name='unique_opening_balance'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedrecord',
+            index=models.Index(fields=['group', '-created_at', '-id'], name='archive_group_created_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0.4 on 2026-10-18 23:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0007_group_archived_until'),
+        ('record', '0012_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField()),
+                ('balance', models.FloatField(blank=True, default=0)),
+                ('balance_minor', models.BigIntegerField(blank=True, default=0)),
+                ('currency', models.CharField(choices=[('TWD', 'TWD'), ('USD', 'USD'), ('EUR', 'EUR'), ('JPY', 'JPY')], default='TWD', max_length=10)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to='account.group')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to='account.member')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='balancecheckpoint',
+            index=models.Index(fields=['group', '-as_of'], name='checkpoint_group_as_of_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='balancecheckpoint',
+            constraint=models.UniqueConstraint(fields=('member', 'currency', 'as_of'), name='unique_balance_checkpoint'),
+        ),
+    ]
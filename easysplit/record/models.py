@@ -1,7 +1,9 @@
+from django.contrib.auth.models import User
 from django.db import models
 
 from account.models import Group, Member
 from common.models import CURRENCY_CHOICES, BasicModelMixin
+from common.money import to_major_units, to_minor_units
 
 
 class Balance(models.Model):
@@ -13,8 +15,15 @@ class Balance(models.Model):
         Member, on_delete=models.CASCADE, related_name="balances"
     )
     balance = models.FloatField(default=0, blank=True)
+    # The exact balance in minor units of the currency, which balance mirrors.
+    balance_minor = models.BigIntegerField(default=0, blank=True)
     currency = models.CharField(default="TWD", max_length=10, choices=CURRENCY_CHOICES)
 
+    def save(self, *args, **kwargs):
+        self.balance_minor = to_minor_units(self.balance, self.currency)
+        self.balance = to_major_units(self.balance_minor, self.currency)
+        super().save(*args, **kwargs)
+
 
 class Record(BasicModelMixin):
     """
@@ -26,17 +35,41 @@ class Record(BasicModelMixin):
         ("income", "income"),
         ("transfer", "transfer"),
     ]
+    SPLIT_EXACT = "exact"
+    SPLIT_EQUAL = "equal"
+    SPLIT_SHARES = "shares"
+    SPLIT_PERCENT = "percent"
+    SPLIT_RULE_CHOICES = [
+        (SPLIT_EXACT, "exact"),
+        (SPLIT_EQUAL, "equal"),
+        (SPLIT_SHARES, "shares"),
+        (SPLIT_PERCENT, "percent"),
+    ]
 
     group = models.ForeignKey(Group, on_delete=models.CASCADE)
     what = models.CharField(max_length=100)
     amount = models.FloatField()
+    # The exact amount in minor units of the currency, which amount mirrors.
+    amount_minor = models.BigIntegerField(default=0)
     type = models.CharField(max_length=10, choices=TYPE_CHOICES)
     currency = models.CharField(default="TWD", max_length=10, choices=CURRENCY_CHOICES)
     exchange_rate = models.FloatField(default=1)
     note = models.TextField(default="", blank=True)
     is_equal_split = models.BooleanField(default=True, blank=True)
+    # How to_members are stored: exact splits have one To row per member, while
+    # the other rules derive them on read from split_participants, a list of
+    # {"member_id", "weight"} where weight is the share count or percentage.
+    split_rule = models.CharField(
+        default=SPLIT_EXACT, max_length=10, choices=SPLIT_RULE_CHOICES
+    )
+    split_participants = models.JSONField(default=list, blank=True)
     # images_urls
 
+    def save(self, *args, **kwargs):
+        self.amount_minor = to_minor_units(self.amount, self.currency)
+        self.amount = to_major_units(self.amount_minor, self.currency)
+        super().save(*args, **kwargs)
+
 
 class From(models.Model):
     """
@@ -48,6 +81,13 @@ class From(models.Model):
     )
     member = models.ForeignKey(Member, on_delete=models.PROTECT)
     amount = models.FloatField()
+    # The exact amount in minor units of the record's currency.
+    amount_minor = models.BigIntegerField(default=0)
+
+    def save(self, *args, **kwargs):
+        self.amount_minor = to_minor_units(self.amount, self.record.currency)
+        self.amount = to_major_units(self.amount_minor, self.record.currency)
+        super().save(*args, **kwargs)
 
 
 class To(models.Model):
@@ -60,3 +100,186 @@ class To(models.Model):
     )
     member = models.ForeignKey(Member, on_delete=models.PROTECT)
     amount = models.FloatField()
+    # The exact amount in minor units of the record's currency.
+    amount_minor = models.BigIntegerField(default=0)
+
+    def save(self, *args, **kwargs):
+        self.amount_minor = to_minor_units(self.amount, self.record.currency)
+        self.amount = to_major_units(self.amount_minor, self.record.currency)
+        super().save(*args, **kwargs)
+
+
+class ExchangeRate(models.Model):
+    """
+    Model representing the rate between two currencies from a date on.
+    """
+
+    base_currency = models.CharField(max_length=10, choices=CURRENCY_CHOICES)
+    quote_currency = models.CharField(max_length=10, choices=CURRENCY_CHOICES)
+    date = models.DateField()
+    # Units of the quote currency per unit of the base currency.
+    rate = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["base_currency", "quote_currency", "date"],
+                name="unique_exchange_rate",
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        # Imported here since exchange_rates imports the models.
+        from record.exchange_rates import bump_exchange_rates_version
+
+        super().save(*args, **kwargs)
+        bump_exchange_rates_version()
+
+
+class FeedItem(models.Model):
+    """
+    Model representing a record in the activity feed of a member.
+
+    Rows are written when records are saved, one per member involved, so a
+    user's feed is read from one index instead of merging all their groups.
+    """
+
+    record = models.ForeignKey(
+        Record, on_delete=models.CASCADE, related_name="feed_items"
+    )
+    member = models.ForeignKey(
+        Member, on_delete=models.CASCADE, related_name="feed_items"
+    )
+    # The user the member is bound to, copied so feeds are read without joins.
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, blank=True, null=True, related_name="+"
+    )
+    # The creation time of the record, which orders the feed.
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["record", "member"], name="unique_feed_item"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="feed_user_created_idx"
+            )
+        ]
+
+
+class ArchivedRecord(models.Model):
+    """
+    Model representing a record moved out of the hot tables by archival.
+
+    It keeps every field of the record, including its creation time. The
+    archived amounts are part of the members' opening balances.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    group = models.ForeignKey(
+        Group, on_delete=models.CASCADE, related_name="archived_records"
+    )
+    what = models.CharField(max_length=100)
+    amount = models.FloatField()
+    amount_minor = models.BigIntegerField(default=0)
+    type = models.CharField(max_length=10, choices=Record.TYPE_CHOICES)
+    currency = models.CharField(max_length=10, choices=CURRENCY_CHOICES)
+    exchange_rate = models.FloatField(default=1)
+    note = models.TextField(default="", blank=True)
+    is_equal_split = models.BooleanField(default=True, blank=True)
+    split_rule = models.CharField(max_length=10, choices=Record.SPLIT_RULE_CHOICES)
+    split_participants = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["group", "-created_at", "-id"], name="archive_group_created_idx"
+            )
+        ]
+
+
+class ArchivedFrom(models.Model):
+    """
+    Model representing the source of funds for an archived record.
+    """
+
+    record = models.ForeignKey(
+        ArchivedRecord, on_delete=models.CASCADE, related_name="from_members"
+    )
+    member = models.ForeignKey(Member, on_delete=models.PROTECT, related_name="+")
+    amount = models.FloatField()
+    amount_minor = models.BigIntegerField(default=0)
+
+
+class ArchivedTo(models.Model):
+    """
+    Model representing the destination of funds for an archived record.
+    """
+
+    record = models.ForeignKey(
+        ArchivedRecord, on_delete=models.CASCADE, related_name="to_members"
+    )
+    member = models.ForeignKey(Member, on_delete=models.PROTECT, related_name="+")
+    amount = models.FloatField()
+    amount_minor = models.BigIntegerField(default=0)
+
+
+class OpeningBalance(models.Model):
+    """
+    Model representing the part of a member's balance from archived records.
+    """
+
+    group = models.ForeignKey(
+        Group, on_delete=models.CASCADE, related_name="opening_balances"
+    )
+    member = models.ForeignKey(
+        Member, on_delete=models.CASCADE, related_name="opening_balances"
+    )
+    balance = models.FloatField(default=0, blank=True)
+    balance_minor = models.BigIntegerField(default=0, blank=True)
+    currency = models.CharField(default="TWD", max_length=10, choices=CURRENCY_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["member", "currency"], name="unique_opening_balance"
+            )
+        ]
+
+
+class BalanceCheckpoint(models.Model):
+    """
+    Model representing the balance of a member at a point in time, e.g. at the
+    start of a month.
+
+    Point-in-time queries start from the latest checkpoint before the time and
+    only add up the records since then.
+    """
+
+    group = models.ForeignKey(
+        Group, on_delete=models.CASCADE, related_name="balance_checkpoints"
+    )
+    member = models.ForeignKey(
+        Member, on_delete=models.CASCADE, related_name="balance_checkpoints"
+    )
+    # The balance sums the records created before this time.
+    as_of = models.DateTimeField()
+    balance = models.FloatField(default=0, blank=True)
+    balance_minor = models.BigIntegerField(default=0, blank=True)
+    currency = models.CharField(default="TWD", max_length=10, choices=CURRENCY_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["member", "currency", "as_of"], name="unique_balance_checkpoint"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["group", "-as_of"], name="checkpoint_group_as_of_idx")
+        ]
@@ -1,9 +1,36 @@
-from django.db.models import FloatField, Sum, Value
-from django.db.models.functions import Coalesce
-from rest_framework.serializers import ModelSerializer, PrimaryKeyRelatedField
-
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.serializers import (
+    ChoiceField,
+    FloatField,
+    ModelSerializer,
+    PrimaryKeyRelatedField,
+    Serializer,
+    UUIDField,
+    ValidationError,
+)
+
+from account.change_stream import notify_group_change
 from account.models import Group, Member
+from account.rollup import apply_user_balance_deltas
+from common.metrics import BALANCE_RECOMPUTE_DURATION
+from common.models import CURRENCY_CHOICES
+from common.money import apply_minor_unit_deltas
+from common.profiling import TimedSerializerMixin
+from common.serializers import SparseFieldsetMixin
+from common.tracing import traced
+from record.checkpoints import invalidate_checkpoints
+from record.exchange_rates import convert_minor_units, get_record_exchange_rate
+from record.feed import fan_out_record
 from record.models import Balance, From, Record, To
+from record.splits import (
+    get_balance_deltas,
+    get_split_amounts,
+    normalize_exact_amounts,
+    validate_split_participants,
+)
 
 
 class BalanceSerializer(ModelSerializer):
@@ -21,7 +48,9 @@ class FromSerializer(ModelSerializer):
     Serializer for the From model.
     """
 
-    member_id = PrimaryKeyRelatedField(queryset=Member.objects.all(), source="member")
+    # Managers, unlike querysets, have a repr which runs no query, e.g. when
+    # serializers are shown in tracebacks.
+    member_id = PrimaryKeyRelatedField(queryset=Member.objects, source="member")
 
     class Meta:
         model = From
@@ -33,21 +62,63 @@ class ToSerializer(ModelSerializer):
     Serializer for the To model.
     """
 
-    member_id = PrimaryKeyRelatedField(queryset=Member.objects.all(), source="member")
+    member_id = PrimaryKeyRelatedField(queryset=Member.objects, source="member")
 
     class Meta:
         model = To
         fields = ["member_id", "amount"]
 
 
-class RecordSerializer(ModelSerializer):
+class SplitParticipantSerializer(Serializer):
+    """
+    Serializer for the participants of a rule-based split.
+    """
+
+    member_id = UUIDField()
+    weight = FloatField(default=1)
+
+
+class SplitPreviewSerializer(Serializer):
+    """
+    Serializer for previewing a split, where the weights of exact splits are
+    the members' amounts.
+    """
+
+    amount = FloatField()
+    currency = ChoiceField(choices=CURRENCY_CHOICES, default="TWD")
+    split_rule = ChoiceField(choices=Record.SPLIT_RULE_CHOICES)
+    split_participants = SplitParticipantSerializer(many=True)
+
+    def validate(self, attrs):
+        participants = [
+            {"member_id": str(item["member_id"]), "weight": item["weight"]}
+            for item in attrs["split_participants"]
+        ]
+        # Exact amounts only need the checks shared by all rules.
+        error = validate_split_participants(
+            Record.SPLIT_EQUAL
+            if attrs["split_rule"] == Record.SPLIT_EXACT
+            else attrs["split_rule"],
+            participants,
+        )
+        if error:
+            raise ValidationError({"split_participants": error})
+        attrs["split_participants"] = participants
+        return attrs
+
+
+class RecordSerializer(TimedSerializerMixin, SparseFieldsetMixin, ModelSerializer):
     """
     Serializer for the Record model, including nested serializers for the From and To models.
+
+    Records with a rule-based split (equal, shares or percent) only store their
+    participants, and their to_members are derived from the rule.
     """
 
     from_members = FromSerializer(many=True)
-    to_members = ToSerializer(many=True)
-    group_id = PrimaryKeyRelatedField(queryset=Group.objects.all(), source="group")
+    to_members = ToSerializer(many=True, required=False)
+    split_participants = SplitParticipantSerializer(many=True, required=False)
+    group_id = PrimaryKeyRelatedField(queryset=Group.objects, source="group")
 
     class Meta:
         model = Record
@@ -61,53 +132,216 @@ class RecordSerializer(ModelSerializer):
             "exchange_rate",
             "note",
             "is_equal_split",
+            "split_rule",
+            "split_participants",
             "from_members",
             "to_members",
         ]
+        expandable_fields = {"from_members": "from_members", "to_members": "to_members"}
+        field_columns = {
+            "to_members": ["amount", "currency", "split_rule", "split_participants"]
+        }
 
-    @staticmethod
-    def update_members_balance(record: Record):
+    def validate_group_id(self, group):
         """
-        Update the member's balance based on the provided record and item.
+        Validate the group of the record.
+
+        Records can't move to another group, since updates only change the
+        balances, checkpoints and subscribers of the record's own group.
+
+        Args:
+            group (Group): The group of the record.
+
+        Returns:
+            Group: The group.
+
+        Raises:
+            ValidationError: If the group of an existing record changes.
+        """
+        if self.instance is not None and group.id != self.instance.group_id:
+            raise ValidationError("Records can't move to another group.")
+        return group
+
+    @traced("RecordSerializer.validate")
+    def validate(self, attrs):
+        """
+        Validate the split of the record.
+
+        Records in another currency than the group's primary currency get the
+        stored exchange rate of their date unless one is given. Exact amounts are
+        rounded to minor units of the currency, correcting
+        rounding drift so they add up to the record's amount. Exact equal splits
+        are then stored as equal rule-based splits whenever the rule derives
+        exactly the same amounts, so they need no To rows.
 
         Args:
-            record (Record): The record object containing the currency information.
-            item (dict): The item dictionary containing the member and amount details.
+            attrs (dict): The validated fields.
+
+        Returns:
+            dict: The validated fields with a consistent split.
+
+        Raises:
+            ValidationError: If the split is missing or inconsistent.
         """
-        for member in record.group.members.all():
-            try:
-                balance = Balance.objects.get(member=member, currency=record.currency)
-            except Balance.DoesNotExist:
-                balance = Balance.objects.create(
-                    member=member, currency=record.currency
+        amount = attrs.get("amount", getattr(self.instance, "amount", None))
+        currency = attrs.get("currency", getattr(self.instance, "currency", "TWD"))
+        group = attrs.get("group", getattr(self.instance, "group", None))
+        if group is not None:
+            if currency == group.primary_currency:
+                attrs["exchange_rate"] = 1
+            elif "exchange_rate" not in attrs:
+                attrs["exchange_rate"] = get_record_exchange_rate(
+                    currency,
+                    group.primary_currency,
+                    timezone.localdate(getattr(self.instance, "created_at", None)),
+                )
+        split_rule = attrs.get("split_rule", Record.SPLIT_EXACT)
+        if amount is not None:
+            normalize_exact_amounts(amount, currency, attrs.get("from_members", []))
+            if split_rule == Record.SPLIT_EXACT:
+                normalize_exact_amounts(-amount, currency, attrs.get("to_members", []))
+
+        participants = [
+            {"member_id": str(item["member_id"]), "weight": item["weight"]}
+            for item in attrs.get("split_participants", [])
+        ]
+
+        if split_rule == Record.SPLIT_EXACT:
+            if "to_members" not in attrs:
+                raise ValidationError({"to_members": "This field is required."})
+            if participants:
+                raise ValidationError(
+                    {"split_participants": "Exact splits have no participants."}
                 )
-            total_expense = member.from_set.filter(
-                record__currency=record.currency
-            ).aggregate(
-                total_amount=Coalesce(
-                    Sum("amount", output_field=FloatField()),
-                    Value(0, output_field=FloatField()),
+            participants = self.get_equal_split_participants(attrs, amount, currency)
+            if participants is None:
+                attrs["split_participants"] = []
+                return attrs
+            split_rule = Record.SPLIT_EQUAL
+        else:
+            error = validate_split_participants(split_rule, participants)
+            if error:
+                raise ValidationError({"split_participants": error})
+            member_ids = {item["member_id"] for item in participants}
+            if Member.objects.filter(group=group, id__in=member_ids).count() != len(
+                member_ids
+            ):
+                raise ValidationError(
+                    {"split_participants": "Participants must be members of the group."}
                 )
-            )[
-                "total_amount"
-            ]
-            total_income = member.to_set.filter(
-                record__currency=record.currency
-            ).aggregate(
-                total_amount=Coalesce(
-                    Sum("amount", output_field=FloatField()),
-                    Value(0, output_field=FloatField()),
+
+        attrs["split_rule"] = split_rule
+        attrs["split_participants"] = participants
+        attrs["to_members"] = []
+        return attrs
+
+    @staticmethod
+    def get_equal_split_participants(attrs, amount, currency):
+        """
+        Get the participants of an exact split which is an equal split.
+
+        Args:
+            attrs (dict): The validated fields.
+            amount (float): The amount of the record.
+            currency (str): The currency of the record.
+
+        Returns:
+            list[dict]: The participants, or None if the split isn't an equal split.
+        """
+        to_data = attrs["to_members"]
+        if not attrs.get("is_equal_split", True) or not to_data or amount is None:
+            return None
+
+        participants = [
+            {"member_id": str(item["member"].id), "weight": 1} for item in to_data
+        ]
+        if len({item["member_id"] for item in participants}) != len(participants):
+            return None
+        derived = get_split_amounts(amount, currency, Record.SPLIT_EQUAL, participants)
+        if any(
+            item["amount"] != derived_item["amount"]
+            for item, derived_item in zip(to_data, derived)
+        ):
+            return None
+        return participants
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if "to_members" in data and instance.split_rule != Record.SPLIT_EXACT:
+            data["to_members"] = get_split_amounts(
+                instance.amount,
+                instance.currency,
+                instance.split_rule,
+                instance.split_participants,
+            )
+        return data
+
+    @staticmethod
+    @BALANCE_RECOMPUTE_DURATION.time(operation="record")
+    @traced("balance_recompute")
+    def update_members_balance(record: Record, deltas: dict, sign: int = 1):
+        """
+        Add the record's amounts to the balances of its members, or remove them.
+
+        The deltas are applied in the database in minor units, so concurrent
+        records can't overwrite each other's changes and no rounding error builds up.
+        The members' primary balances change by the deltas converted at the
+        record's exchange rate, and the overall balances of their users by the
+        deltas themselves.
+
+        Args:
+            record (Record): The saved record.
+            deltas (dict[str, int]): The balance deltas of the record, returned by
+                get_balance_deltas.
+            sign (int): 1 to add the record's amounts, -1 to remove them.
+        """
+        deltas = {member_id: sign * delta for member_id, delta in deltas.items()}
+        # Every member of the group has a balance in the currencies it uses.
+        member_ids = {
+            str(member_id)
+            for member_id in record.group.members.exclude(
+                balances__currency=record.currency
+            ).values_list("id", flat=True)
+        }
+        Balance.objects.bulk_create(
+            Balance(member_id=member_id, currency=record.currency)
+            for member_id in member_ids
+        )
+        apply_minor_unit_deltas(
+            Balance.objects.filter(currency=record.currency),
+            "member_id",
+            deltas,
+            "balance",
+            record.currency,
+        )
+        apply_user_balance_deltas(record.currency, deltas)
+
+        primary_currency = record.group.primary_currency
+        apply_minor_unit_deltas(
+            record.group.members.all(),
+            "id",
+            {
+                member_id: convert_minor_units(
+                    delta,
+                    record.currency,
+                    primary_currency,
+                    record.exchange_rate,
                 )
-            )[
-                "total_amount"
-            ]
-            balance.balance = total_expense + total_income
-            balance.save()
+                for member_id, delta in deltas.items()
+            },
+            "primary_balance",
+            primary_currency,
+        )
 
+    @traced("RecordSerializer.create")
+    @transaction.atomic
     def create(self, validated_data):
         """
         Create a new Record instance and related From and To instances.
 
+        The rows and balance deltas are written in one transaction, so a failure
+        part-way through can't leave the balances out of sync.
+
         Args:
             validated_data (dict): Validated data for the Record and nested From/To instances.
 
@@ -115,7 +349,7 @@ class RecordSerializer(ModelSerializer):
             Record: The created Record instance.
         """
         from_data = validated_data.pop("from_members")
-        to_data = validated_data.pop("to_members")
+        to_data = validated_data.pop("to_members", [])
         record = Record.objects.create(**validated_data)
 
         for from_item in from_data:
@@ -124,10 +358,17 @@ class RecordSerializer(ModelSerializer):
         for to_item in to_data:
             To.objects.create(record=record, **to_item)
 
-        self.update_members_balance(record)
+        deltas = get_balance_deltas(record)
+        self.update_members_balance(record, deltas)
+        fan_out_record(record, deltas)
+        transaction.on_commit(
+            partial(notify_group_change, record.group_id, "record.created", record.id)
+        )
 
         return record
 
+    @traced("RecordSerializer.update")
+    @transaction.atomic
     def update(self, instance, validated_data):
         """
         Update an existing Record instance and related From and To instances.
@@ -140,9 +381,10 @@ class RecordSerializer(ModelSerializer):
             Record: The updated Record instance.
         """
         from_data = validated_data.pop("from_members")
-        to_data = validated_data.pop("to_members")
+        to_data = validated_data.pop("to_members", [])
+        self.update_members_balance(instance, get_balance_deltas(instance), -1)
+        invalidate_checkpoints(instance.group_id, instance.created_at)
 
-        instance.group = validated_data.get("group", instance.group)
         instance.what = validated_data.get("what", instance.what)
         instance.amount = validated_data.get("amount", instance.amount)
         instance.type = validated_data.get("type", instance.type)
@@ -154,6 +396,10 @@ class RecordSerializer(ModelSerializer):
         instance.is_equal_split = validated_data.get(
             "is_equal_split", instance.is_equal_split
         )
+        instance.split_rule = validated_data.get("split_rule", instance.split_rule)
+        instance.split_participants = validated_data.get(
+            "split_participants", instance.split_participants
+        )
         instance.save()
 
         From.objects.filter(record=instance).delete()
@@ -164,10 +410,21 @@ class RecordSerializer(ModelSerializer):
         for to_item in to_data:
             To.objects.create(record=instance, **to_item)
 
-        self.update_members_balance(instance)
+        # The From and To rows prefetched by the view are the replaced ones.
+        instance._prefetched_objects_cache = {}
+        deltas = get_balance_deltas(instance)
+        self.update_members_balance(instance, deltas)
+        fan_out_record(instance, deltas)
+        transaction.on_commit(
+            partial(
+                notify_group_change, instance.group_id, "record.updated", instance.id
+            )
+        )
 
         return instance
 
+    @traced("RecordSerializer.delete")
+    @transaction.atomic
     def delete(self, instance):
         """
         Delete the Record instance and its related From and To instances.
@@ -178,9 +435,14 @@ class RecordSerializer(ModelSerializer):
         Returns:
             None
         """
+        record_id = instance.id
+        self.update_members_balance(instance, get_balance_deltas(instance), -1)
+        invalidate_checkpoints(instance.group_id, instance.created_at)
+
         From.objects.filter(record=instance).delete()
         To.objects.filter(record=instance).delete()
-
-        self.update_members_balance(instance)
-
         instance.delete()
+
+        transaction.on_commit(
+            partial(notify_group_change, instance.group_id, "record.deleted", record_id)
+        )
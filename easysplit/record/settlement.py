@@ -0,0 +1,55 @@
+from collections import defaultdict
+from typing import Iterable, List, Tuple
+
+# Balances closer to zero than this are treated as settled.
+SETTLED_TOLERANCE = 1e-9
+
+
+def get_settlements(balances: Iterable[Tuple[str, str, int]]) -> List[dict]:
+    """
+    Suggest the transfers that settle all balances of a group.
+
+    Within each currency the largest debtor pays the largest creditor until one
+    of them is settled, which needs at most (members - 1) transfers.
+
+    Args:
+        balances (Iterable[tuple[str, str, int]]): (member_id, currency, balance)
+            tuples, where a positive balance means the member is owed money.
+            Integer minor units settle exactly, floats within SETTLED_TOLERANCE.
+
+    Returns:
+        List[dict]: The suggested transfers, each containing from_member_id,
+            to_member_id, amount and currency.
+    """
+    balances_by_currency = defaultdict(list)
+    for member_id, currency, balance in balances:
+        if abs(balance) > SETTLED_TOLERANCE:
+            balances_by_currency[currency].append([str(member_id), balance])
+
+    settlements = []
+    for currency in sorted(balances_by_currency):
+        items = balances_by_currency[currency]
+        creditors = sorted((item for item in items if item[1] > 0), key=lambda x: -x[1])
+        debtors = sorted((item for item in items if item[1] < 0), key=lambda x: x[1])
+
+        creditor_index = debtor_index = 0
+        while creditor_index < len(creditors) and debtor_index < len(debtors):
+            creditor = creditors[creditor_index]
+            debtor = debtors[debtor_index]
+            amount = min(creditor[1], -debtor[1])
+            settlements.append(
+                {
+                    "from_member_id": debtor[0],
+                    "to_member_id": creditor[0],
+                    "amount": amount,
+                    "currency": currency,
+                }
+            )
+            creditor[1] -= amount
+            debtor[1] += amount
+            if creditor[1] <= SETTLED_TOLERANCE:
+                creditor_index += 1
+            if -debtor[1] <= SETTLED_TOLERANCE:
+                debtor_index += 1
+
+    return settlements
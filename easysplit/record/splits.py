@@ -0,0 +1,224 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from common.money import to_major_units, to_minor_units
+from record.models import Record
+
+# Weights of a percent split must add up to 100 within this tolerance.
+PERCENT_TOLERANCE = 1e-9
+
+
+def allocate(total, weights):
+    """
+    Split an integer total proportionally to integer weights.
+
+    Every share is first rounded down, then the remaining units go one each to
+    the shares with the largest remainders, earlier shares first on ties. The
+    shares always add up to the total and the result only depends on the
+    inputs, so every server and client derives the same split.
+
+    Args:
+        total (int): The total in minor units, may be negative.
+        weights (list[int]): The positive weights.
+
+    Returns:
+        list[int]: The shares in minor units, in the order of the weights.
+    """
+    sign = -1 if total < 0 else 1
+    total = abs(total)
+    weight_sum = sum(weights)
+
+    shares = []
+    remainders = []
+    for weight in weights:
+        share, remainder = divmod(total * weight, weight_sum)
+        shares.append(share)
+        remainders.append(remainder)
+
+    leftover = total - sum(shares)
+    # sorted() is stable, so ties keep the order of the weights.
+    for index in sorted(range(len(weights)), key=lambda i: -remainders[i])[:leftover]:
+        shares[index] += 1
+    return [sign * share for share in shares]
+
+
+def get_integer_weights(weights):
+    """
+    Scale decimal weights to integers with the same proportions.
+
+    Args:
+        weights (list[float]): The weights, e.g. percentages like 33.3.
+
+    Returns:
+        list[int]: The weights multiplied by the smallest power of ten making all
+            of them integers.
+    """
+    decimals = [Decimal(str(weight)) for weight in weights]
+    places = max([0] + [-decimal.as_tuple().exponent for decimal in decimals])
+    return [int(decimal.scaleb(places)) for decimal in decimals]
+
+
+def split_amount(total, split_rule, weights):
+    """
+    Split an integer total according to a split rule.
+
+    Args:
+        total (int): The total in minor units.
+        split_rule (str): "equal", "shares", "percent" or "exact".
+        weights (list[float]): The share counts, percentages or, for exact
+            splits, the members' amounts in minor units. Ignored for equal splits.
+
+    Returns:
+        list[int]: The shares in minor units, adding up to the total unless the
+            amounts of an exact split are too far off to be rounding drift.
+    """
+    if split_rule == Record.SPLIT_EQUAL:
+        return allocate(total, [1] * len(weights))
+    if split_rule != Record.SPLIT_EXACT:
+        return allocate(total, get_integer_weights(weights))
+
+    # Exact amounts which only drift from the total by rounding (at most one
+    # minor unit per member) are corrected like a split weighted by them.
+    amounts = [int(weight) for weight in weights]
+    drift = abs(total - sum(amounts))
+    same_sign = all(amount * total > 0 for amount in amounts)
+    if 0 < drift <= len(amounts) and same_sign:
+        return allocate(total, [abs(amount) for amount in amounts])
+    return amounts
+
+
+def get_split_amounts(amount, currency, split_rule, participants):
+    """
+    Derive the per-member To amounts of a rule-based split.
+
+    Args:
+        amount (float): The amount of the record.
+        currency (str): The currency of the record.
+        split_rule (str): "equal", "shares" or "percent".
+        participants (list[dict]): The participants, each containing member_id
+            and weight (the share count or percentage, ignored for equal splits).
+
+    Returns:
+        list[dict]: The to_members of the record, each containing member_id and
+            amount, in the order of the participants.
+    """
+    shares = split_amount(
+        -to_minor_units(amount, currency),
+        split_rule,
+        [participant.get("weight", 1) for participant in participants],
+    )
+    return [
+        {
+            "member_id": participant["member_id"],
+            "amount": to_major_units(share, currency),
+        }
+        for participant, share in zip(participants, shares)
+    ]
+
+
+def normalize_exact_amounts(amount, currency, items):
+    """
+    Round the amounts of an exact split to minor units of the currency.
+
+    Amounts which add up to the total except for rounding drift, like three
+    thirds of 100, are corrected so they add up exactly.
+
+    Args:
+        amount (float): The total the amounts should add up to.
+        currency (str): The currency of the amounts.
+        items (list[dict]): The from or to members, each containing amount,
+            updated in place.
+    """
+    shares = split_amount(
+        to_minor_units(amount, currency),
+        Record.SPLIT_EXACT,
+        [to_minor_units(item["amount"], currency) for item in items],
+    )
+    for item, share in zip(items, shares):
+        item["amount"] = to_major_units(share, currency)
+
+
+def validate_split_participants(split_rule, participants):
+    """
+    Check that the participants of a rule-based split are consistent.
+
+    Args:
+        split_rule (str): "equal", "shares" or "percent".
+        participants (list[dict]): The participants, each containing member_id
+            and weight.
+
+    Returns:
+        str: The error message, or None if the participants are valid.
+    """
+    if not participants:
+        return "Rule-based splits need at least one participant."
+    member_ids = [str(participant["member_id"]) for participant in participants]
+    if len(set(member_ids)) != len(member_ids):
+        return "Each member can only participate once."
+    if split_rule == Record.SPLIT_EQUAL:
+        return None
+
+    weights = [participant.get("weight") for participant in participants]
+    if any(weight is None or weight <= 0 for weight in weights):
+        return "Weights must be positive."
+    if split_rule == Record.SPLIT_PERCENT and abs(sum(weights) - 100) > (
+        PERCENT_TOLERANCE
+    ):
+        return "Percentages must add up to 100."
+    return None
+
+
+def get_balance_deltas(record):
+    """
+    Get how much a record adds to the balance of each member, in minor units.
+
+    Args:
+        record (Record): The saved record, with its From and To rows prefetched
+            when many records are processed.
+
+    Returns:
+        dict[str, int]: The balance delta of each member ID.
+    """
+    deltas = defaultdict(int)
+    is_exact_split = record.split_rule == Record.SPLIT_EXACT
+    splits = [record.from_members.all()]
+    if is_exact_split:
+        splits.append(record.to_members.all())
+    for items in splits:
+        for item in items:
+            deltas[str(item.member_id)] += item.amount_minor
+
+    if not is_exact_split:
+        participants = record.split_participants
+        shares = split_amount(
+            -record.amount_minor,
+            record.split_rule,
+            [participant.get("weight", 1) for participant in participants],
+        )
+        for participant, share in zip(participants, shares):
+            deltas[participant["member_id"]] += share
+    return deltas
+
+
+def get_split_member_ids(group_id):
+    """
+    Get the members participating in rule-based splits of a group.
+
+    Those members have no To rows protecting them from deletion.
+
+    Args:
+        group_id (str): The ID of the group.
+
+    Returns:
+        set[str]: The IDs of the participating members.
+    """
+    rows = (
+        Record.objects.filter(group_id=group_id)
+        .exclude(split_rule=Record.SPLIT_EXACT)
+        .values_list("split_participants", flat=True)
+    )
+    return {
+        participant["member_id"]
+        for participants in rows
+        for participant in participants
+    }
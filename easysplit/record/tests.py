@@ -1,11 +1,60 @@
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+from importlib import import_module
+from io import StringIO
 from typing import List
+from unittest import mock
 
+import redis
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connections, transaction
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from loguru import logger
 from pydantic import BaseModel, ValidationError
+from pymysql.constants import SERVER_STATUS
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 
-from common.tests import BaseTestCase, incorrect_format_message
-from record.models import Balance, From, Record, To
+from account.change_stream import ChangeStreamApplication
+from account.models import Group, Member
+from common.db_backends.mysql_pool.base import DatabaseWrapper
+from common.db_backends.mysql_pool.pool import ConnectionPool
+from common.db_routers import PrimaryReplicaRouter
+from common.metrics import REQUESTS_TOTAL, MmapedValues
+from common.query_log import NPlusOneError, get_query_shape
+from common.middleware import InstrumentationMiddleware, replica_routing_middleware
+from common.tests import (
+    BaseTestCase,
+    BaseTransactionTestCase,
+    incorrect_format_message,
+)
+from record.archive import archive_group_history
+from record.checkpoints import create_checkpoint
+from record.exchange_rates import get_exchange_rate
+from record.feed import rebind_feed_items
+from record.integrity import check_group
+from record.models import (
+    ArchivedRecord,
+    Balance,
+    BalanceCheckpoint,
+    ExchangeRate,
+    From,
+    OpeningBalance,
+    Record,
+    To,
+)
 
 
 class ItemDataModel(BaseModel):
@@ -17,6 +66,15 @@ class ItemDataModel(BaseModel):
     amount: float
 
 
+class ParticipantDataModel(BaseModel):
+    """
+    Represents the data model for split participant data.
+    """
+
+    member_id: str
+    weight: float
+
+
 class RecordDataModel(BaseModel):
     """
     Represents the data model for record data.
@@ -31,6 +89,8 @@ class RecordDataModel(BaseModel):
     exchange_rate: int
     note: str
     is_equal_split: bool
+    split_rule: str
+    split_participants: List[ParticipantDataModel]
     from_members: List[ItemDataModel]
     to_members: List[ItemDataModel]
 
@@ -100,6 +160,13 @@ class RecordTests(BaseTestCase):
             balance=-300,
             currency="TWD",
         )
+        for member, balance in (
+            (self.owner_member, 300),
+            (self.binded_member, -300),
+        ):
+            member.primary_balance = balance
+            member.primary_balance_minor = balance * 100
+            member.save()
 
     def test_retrieve_record(self):
         """
@@ -136,6 +203,49 @@ class RecordTests(BaseTestCase):
         except ValidationError as e:
             self.fail(incorrect_format_message(e))
 
+    def test_list_record_fast_read_path(self):
+        """
+        Test the fast read path renders the same bytes as the serializer.
+        """
+        self.first_record.note = "Café \u2028 dinner"
+        self.first_record.save()
+        Record.objects.create(
+            group=self.default_group,
+            what="Shares record",
+            amount=100,
+            type="expense",
+            split_rule=Record.SPLIT_SHARES,
+            split_participants=[
+                {"member_id": str(self.owner_member.id), "weight": 1},
+                {"member_id": str(self.binded_member.id), "weight": 2},
+            ],
+        )
+        url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with override_settings(FAST_READ_PATH=False):
+            serializer_response = self.client.get(url)
+        self.assertEqual(response.content, serializer_response.content)
+
+    def test_list_record_sparse_fields(self):
+        """
+        Test listing records with only the requested fields.
+        """
+        url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+
+        response = self.client.get(url, {"fields": "id,what,amount"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            [{"id": str(self.first_record.id), "what": "First record", "amount": 600}],
+        )
+
+        response = self.client.get(url, {"fields": "id", "expand": "to_members"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.json()[0]), {"id", "to_members"})
+        self.assertEqual(len(response.json()[0]["to_members"]), 2)
+
     def test_create_record(self):
         """
         Test creating record.
@@ -186,6 +296,217 @@ class RecordTests(BaseTestCase):
             if item["name"] == self.non_binded_member.name:
                 self.assertEqual(item["balances"][0]["balance"], -200)
 
+    def test_create_record_split_rules(self):
+        """
+        Test rule-based splits store no To rows and derive to_members on read.
+        """
+        url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+        record_data = {
+            "group_id": self.default_group.id,
+            "what": "Shares record",
+            "amount": 600,
+            "type": "expense",
+            "currency": "TWD",
+            "from_members": [
+                {"amount": 600, "member_id": self.owner_member.id},
+            ],
+            "split_rule": "shares",
+            "split_participants": [
+                {"member_id": self.owner_member.id, "weight": 1},
+                {"member_id": self.non_binded_member.id, "weight": 2},
+            ],
+        }
+        response = self.client.post(url, data=record_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.json()["to_members"],
+            [
+                {"member_id": str(self.owner_member.id), "amount": -200},
+                {"member_id": str(self.non_binded_member.id), "amount": -400},
+            ],
+        )
+        self.assertFalse(To.objects.filter(record_id=response.json()["id"]).exists())
+        self.assertEqual(
+            Balance.objects.get(member=self.non_binded_member).balance, -400
+        )
+
+        # Exact splits which are equal splits are stored as equal splits.
+        record_data.pop("split_rule")
+        record_data.pop("split_participants")
+        record_data["to_members"] = [
+            {"amount": -300, "member_id": self.owner_member.id},
+            {"amount": -300, "member_id": self.binded_member.id},
+        ]
+        response = self.client.post(url, data=record_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        record = Record.objects.get(id=response.json()["id"])
+        self.assertEqual(record.split_rule, Record.SPLIT_EQUAL)
+        self.assertFalse(To.objects.filter(record=record).exists())
+        self.assertEqual(Balance.objects.get(member=self.binded_member).balance, -600)
+
+        # Deleting the record removes its derived amounts from the balances.
+        response = self.client.delete(
+            reverse(
+                "record-detail",
+                kwargs={"group_id": self.default_group.id, "pk": record.id},
+            )
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Balance.objects.get(member=self.binded_member).balance, -300)
+
+        # Members participating in rule-based splits can't be deleted.
+        response = self.client.post(
+            reverse("members", kwargs={"group_id": self.default_group.id}),
+            data={
+                "create": [],
+                "update": [],
+                "delete": [{"id": str(self.non_binded_member.id)}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_create_record_invalid_split(self):
+        """
+        Test creating records with an inconsistent rule-based split.
+        """
+        response = self.client.post(
+            reverse("record-list", kwargs={"group_id": self.default_group.id}),
+            data={
+                "group_id": self.default_group.id,
+                "what": "Percent record",
+                "amount": 600,
+                "type": "expense",
+                "from_members": [
+                    {"amount": 600, "member_id": self.owner_member.id},
+                ],
+                "split_rule": "percent",
+                "split_participants": [
+                    {"member_id": self.owner_member.id, "weight": 50},
+                    {"member_id": self.binded_member.id, "weight": 40},
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("split_participants", response.json())
+
+    def test_split_preview(self):
+        """
+        Test previewing splits, whose shares always add up to the amount.
+        """
+        url = reverse("split_preview", kwargs={"group_id": self.default_group.id})
+        member_ids = [
+            str(self.owner_member.id),
+            str(self.binded_member.id),
+            str(self.non_binded_member.id),
+        ]
+        for split_rule, weights, expected_amounts in (
+            ("equal", [1, 1, 1], [-33.34, -33.33, -33.33]),
+            ("shares", [1, 1, 2], [-25, -25, -50]),
+            ("percent", [33.3, 33.3, 33.4], [-33.3, -33.3, -33.4]),
+            ("exact", [33.33, 33.33, 33.33], [-33.34, -33.33, -33.33]),
+        ):
+            response = self.client.post(
+                url,
+                data={
+                    "amount": 100,
+                    "split_rule": split_rule,
+                    "split_participants": [
+                        {"member_id": member_id, "weight": weight}
+                        for member_id, weight in zip(member_ids, weights)
+                    ],
+                },
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                [item["amount"] for item in response.json()["to_members"]],
+                expected_amounts,
+            )
+
+    def test_equal_split_remainder(self):
+        """
+        Test remainders go to the earliest participants, so balances net to zero.
+        """
+        response = self.client.post(
+            reverse("record-list", kwargs={"group_id": self.default_group.id}),
+            data={
+                "group_id": self.default_group.id,
+                "what": "Thirds",
+                "amount": 100,
+                "type": "expense",
+                "from_members": [
+                    {"amount": 100, "member_id": self.owner_member.id},
+                ],
+                "split_rule": "equal",
+                "split_participants": [
+                    {"member_id": self.owner_member.id},
+                    {"member_id": self.binded_member.id},
+                    {"member_id": self.non_binded_member.id},
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item["amount"] for item in response.json()["to_members"]],
+            [-33.34, -33.33, -33.33],
+        )
+        self.assertAlmostEqual(
+            sum(balance.balance for balance in Balance.objects.all()), 0
+        )
+
+    def test_minor_unit_balances(self):
+        """
+        Test balances are kept exactly in minor units and net to zero.
+        """
+        url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+        for _ in range(3):
+            response = self.client.post(
+                url,
+                data={
+                    "group_id": self.default_group.id,
+                    "what": "Thirds",
+                    "amount": 0.1,
+                    "type": "expense",
+                    "from_members": [
+                        {"amount": 0.1, "member_id": self.binded_member.id},
+                    ],
+                    "to_members": [
+                        {"amount": -0.0333, "member_id": self.owner_member.id},
+                        {"amount": -0.0333, "member_id": self.binded_member.id},
+                        {"amount": -0.0333, "member_id": self.non_binded_member.id},
+                    ],
+                },
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(
+            Balance.objects.aggregate(total=Sum("balance_minor"))["total"], 0
+        )
+        balance = Balance.objects.get(member=self.non_binded_member)
+        self.assertEqual(balance.balance_minor, -9)
+        self.assertEqual(balance.balance, -0.09)
+
+    def test_backfill_minor_units(self):
+        """
+        Test the migration backfilling the minor unit columns.
+        """
+        migration = import_module("record.migrations.0008_backfill_money_minor_units")
+        Record.objects.update(amount_minor=0)
+        Balance.objects.update(balance_minor=0)
+
+        migration.backfill(Record, "amount", "currency")
+        migration.backfill(Balance, "balance", "currency")
+        self.first_record.refresh_from_db()
+        self.assertEqual(self.first_record.amount_minor, 60000)
+        self.assertEqual(
+            sorted(Balance.objects.values_list("balance_minor", flat=True)),
+            [-30000, 30000],
+        )
+
     def test_update_record(self):
         """
         Test updating record.
@@ -229,6 +550,22 @@ class RecordTests(BaseTestCase):
             if item["name"] == self.non_binded_member.name:
                 self.assertEqual(item["balances"][0]["balance"], -200)
 
+        # Records can't move to another group.
+        other_group = Group.objects.create(
+            owner=self.user, name="Group2", public_permission="limited"
+        )
+        response = self.client.patch(
+            reverse(
+                "record-detail",
+                kwargs={"group_id": self.default_group.id, "pk": self.first_record.id},
+            ),
+            data={"group_id": other_group.id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("group_id", response.json())
+        self.first_record.refresh_from_db()
+        self.assertEqual(self.first_record.group_id, self.default_group.id)
+
     def test_delete_record(self):
         """
         Test deleting record.
@@ -248,3 +585,1233 @@ class RecordTests(BaseTestCase):
         data = response.json()
         for item in data:
             self.assertEqual(item["balances"][0]["balance"], 0)
+
+    def test_update_exact_split(self):
+        """
+        Test updating a record with an unequal exact split moves the balances
+        from the old rows to the new ones.
+        """
+
+        def get_balances():
+            members = (self.owner_member, self.binded_member)
+            return [
+                (
+                    Balance.objects.get(member=member, currency="TWD").balance,
+                    Member.objects.get(id=member.id).primary_balance,
+                )
+                for member in members
+            ]
+
+        def record_data(amount, payer, owner_share, binded_share):
+            return {
+                "group_id": self.default_group.id,
+                "what": "Exact split",
+                "amount": amount,
+                "type": "expense",
+                "currency": "TWD",
+                "is_equal_split": False,
+                "from_members": [{"amount": amount, "member_id": payer.id}],
+                "to_members": [
+                    {"amount": -owner_share, "member_id": self.owner_member.id},
+                    {"amount": -binded_share, "member_id": self.binded_member.id},
+                ],
+            }
+
+        response = self.client.post(
+            reverse("record-list", kwargs={"group_id": self.default_group.id}),
+            data=record_data(100, self.owner_member, 70, 30),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # The owner is owed 30 and the binded member owes 30.
+        before = get_balances()
+        response = self.client.put(
+            reverse(
+                "record-detail",
+                kwargs={"group_id": self.default_group.id, "pk": response.json()["id"]},
+            ),
+            data=record_data(200, self.binded_member, 150, 50),
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # The owner now owes 150 and the binded member is owed 150.
+        for (old, new), change in zip(zip(before, get_balances()), (-180, 180)):
+            self.assertEqual([n - o for o, n in zip(old, new)], [change] * 2)
+
+    def test_failed_update_rolls_back(self):
+        """
+        Test a record update failing part-way leaves the record and balances as
+        they were.
+        """
+        balances = list(Balance.objects.order_by("id").values_list("balance_minor"))
+        url = reverse(
+            "record-detail",
+            kwargs={"group_id": self.default_group.id, "pk": self.first_record.id},
+        )
+        data = {
+            "amount": 900,
+            "from_members": [{"amount": 900, "member_id": self.owner_member.id}],
+            "to_members": [{"amount": -900, "member_id": self.binded_member.id}],
+        }
+        with mock.patch.object(
+            From.objects, "create", side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            self.client.patch(url, data=data, format="json")
+
+        self.first_record.refresh_from_db()
+        self.assertNotEqual(self.first_record.amount, 900)
+        self.assertEqual(
+            list(Balance.objects.order_by("id").values_list("balance_minor")), balances
+        )
+
+    def test_group_dashboard(self):
+        """
+        Test retrieving the group dashboard with a fixed number of queries.
+        """
+        url = reverse("group_dashboard", kwargs={"group_id": self.default_group.id})
+
+        # 2 session authentication queries, then the group, members, balances,
+        # records, from members and to members.
+        with self.assertNumQueries(8):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        self.assertEqual(data["group"]["id"], str(self.default_group.id))
+        self.assertEqual(len(data["members"]), 3)
+        self.assertFalse(data["has_more_records"])
+        try:
+            for item in data["records"]:
+                record_data = RecordDataModel(**item)
+        except ValidationError as e:
+            self.fail(incorrect_format_message(e))
+        self.assertEqual(
+            data["settlements"],
+            [
+                {
+                    "from_member_id": str(self.binded_member.id),
+                    "to_member_id": str(self.owner_member.id),
+                    "amount": 300,
+                    "currency": "TWD",
+                }
+            ],
+        )
+
+        # Users who aren't in the group can't see it.
+        self.create_user(username="outsider", password="outsider")
+        self.client.login(username="outsider", password="outsider")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_archive_history(self):
+        """
+        Test archiving moves old records to the archive and opening balances.
+        """
+        list_url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+        expected = self.client.get(list_url).json()
+        response = self.client.post(
+            list_url,
+            data={
+                "group_id": self.default_group.id,
+                "what": "Second record",
+                "amount": 100,
+                "type": "expense",
+                "from_members": [{"amount": 100, "member_id": self.owner_member.id}],
+                "to_members": [
+                    {"amount": -100, "member_id": self.non_binded_member.id}
+                ],
+            },
+            format="json",
+        )
+        second_record = Record.objects.get(id=response.json()["id"])
+
+        archive_group_history(self.default_group, second_record.created_at)
+        self.assertEqual(list(Record.objects.all()), [second_record])
+        self.assertFalse(To.objects.filter(record_id=self.first_record.id).exists())
+        self.assertEqual(
+            dict(OpeningBalance.objects.values_list("member_id", "balance")),
+            {self.owner_member.id: 300, self.binded_member.id: -300},
+        )
+        self.assertEqual(Balance.objects.get(member=self.owner_member).balance, 400)
+
+        url = reverse("archive", kwargs={"group_id": self.default_group.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"], expected)
+
+        # Users who aren't in the group can't see its archive.
+        self.create_user(username="outsider", password="outsider")
+        self.client.login(username="outsider", password="outsider")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_check_balances(self):
+        """
+        Test the integrity check reports and repairs drifted balances.
+        """
+        Balance.objects.filter(member=self.owner_member).update(balance_minor=25000)
+        Member.objects.filter(id=self.binded_member.id).update(
+            primary_balance_minor=-20000
+        )
+
+        stdout = StringIO()
+        call_command("check_balances", workers=1, stdout=stdout)
+        self.assertIn(
+            f"member {self.owner_member.id} TWD: stored 250.0, expected 300.0",
+            stdout.getvalue(),
+        )
+        self.assertIn(
+            f"member {self.binded_member.id} primary TWD: stored -200.0, "
+            "expected -300.0",
+            stdout.getvalue(),
+        )
+        self.assertIn("Found 2 mismatching balances.", stdout.getvalue())
+
+        with mock.patch(
+            "record.integrity.notify_group_change"
+        ) as notify, self.captureOnCommitCallbacks(execute=True):
+            call_command("check_balances", workers=1, repair=True, stdout=StringIO())
+        notify.assert_called_once_with(str(self.default_group.id), "members.updated")
+        balance = Balance.objects.get(member=self.owner_member)
+        self.assertEqual((balance.balance, balance.balance_minor), (300, 30000))
+        self.binded_member.refresh_from_db()
+        self.assertEqual(
+            (
+                self.binded_member.primary_balance,
+                self.binded_member.primary_balance_minor,
+            ),
+            (-300, -30000),
+        )
+        stdout = StringIO()
+        call_command("check_balances", workers=1, stdout=stdout)
+        self.assertIn("Found 0 mismatching balances.", stdout.getvalue())
+
+    def test_generate_dataset(self):
+        """
+        Test the synthetic dataset has consistent balances.
+        """
+        options = {
+            "users": 10,
+            "groups": 3,
+            "members_per_group": 4,
+            "records_per_group": 20,
+            "split_fanout": 3,
+            "currencies": "TWD:2,USD:1,JPY:1",
+            "batch_size": 50,
+        }
+        call_command("generate_dataset", stdout=StringIO(), **options)
+        groups = Group.objects.filter(owner__username__startswith="synthetic")
+        self.assertEqual(groups.count(), 3)
+        self.assertEqual(Record.objects.filter(group__in=groups).count(), 60)
+        self.assertEqual(Member.objects.filter(group__in=groups).count(), 12)
+
+        stdout = StringIO()
+        call_command("check_balances", workers=1, stdout=stdout)
+        self.assertIn("Found 0 mismatching balances.", stdout.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("generate_dataset", stdout=StringIO(), **options)
+
+    def test_historical_balances(self):
+        """
+        Test point-in-time balances start from the latest checkpoint.
+        """
+        list_url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+        response = self.client.post(
+            list_url,
+            data={
+                "group_id": self.default_group.id,
+                "what": "Second record",
+                "amount": 100,
+                "type": "expense",
+                "from_members": [{"amount": 100, "member_id": self.owner_member.id}],
+                "to_members": [
+                    {"amount": -100, "member_id": self.non_binded_member.id}
+                ],
+            },
+            format="json",
+        )
+        second_record = Record.objects.get(id=response.json()["id"])
+        self.assertEqual(
+            create_checkpoint(self.default_group, second_record.created_at), 2
+        )
+
+        url = reverse("historical_balances", kwargs={"group_id": self.default_group.id})
+        response = self.client.get(url, {"at": timezone.localdate().isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(
+            response.json(),
+            [
+                {
+                    "member_id": str(self.owner_member.id),
+                    "currency": "TWD",
+                    "balance": 400,
+                },
+                {
+                    "member_id": str(self.binded_member.id),
+                    "currency": "TWD",
+                    "balance": -300,
+                },
+                {
+                    "member_id": str(self.non_binded_member.id),
+                    "currency": "TWD",
+                    "balance": -100,
+                },
+            ],
+        )
+        response = self.client.get(url, {"at": second_record.created_at.isoformat()})
+        self.assertEqual(len(response.json()), 2)
+        response = self.client.get(url, {"at": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Changing a record before a checkpoint invalidates the checkpoint.
+        response = self.client.delete(
+            reverse(
+                "record-detail",
+                kwargs={"group_id": self.default_group.id, "pk": self.first_record.id},
+            )
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(BalanceCheckpoint.objects.exists())
+
+        # Users who aren't in the group can't see its balances.
+        self.create_user(username="outsider", password="outsider")
+        self.client.login(username="outsider", password="outsider")
+        response = self.client.get(url, {"at": "2023-06-01"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ExchangeRateTests(BaseTestCase):
+    """
+    Test case class for exchange rates and primary currency balances.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        ExchangeRate.objects.create(
+            base_currency="USD",
+            quote_currency="TWD",
+            date=datetime.date(2023, 1, 1),
+            rate=30,
+        )
+
+    def create_record(self, currency, amount, **extra):
+        """
+        Create a record paid by the owner member for the binded member.
+
+        Args:
+            currency (str): The currency of the record.
+            amount (float): The amount of the record.
+            **extra: Other fields of the record.
+
+        Returns:
+            Response: The HTTP response of the creation.
+        """
+        return self.client.post(
+            reverse("record-list", kwargs={"group_id": self.default_group.id}),
+            data={
+                "group_id": self.default_group.id,
+                "what": "Record",
+                "amount": amount,
+                "type": "expense",
+                "currency": currency,
+                "from_members": [{"amount": amount, "member_id": self.owner_member.id}],
+                "to_members": [{"amount": -amount, "member_id": self.binded_member.id}],
+                **extra,
+            },
+            format="json",
+        )
+
+    def test_get_exchange_rate(self):
+        """
+        Test looking up dated rates in both directions, cached after the first read.
+        """
+        today = datetime.date.today()
+        self.assertEqual(get_exchange_rate("USD", "TWD", today), 30)
+        self.assertEqual(get_exchange_rate("TWD", "USD", today), 1 / 30)
+        self.assertIsNone(get_exchange_rate("USD", "TWD", datetime.date(2022, 1, 1)))
+        self.assertIsNone(get_exchange_rate("EUR", "TWD", today))
+        with self.assertNumQueries(0):
+            get_exchange_rate("USD", "TWD", today)
+
+    def test_primary_balance(self):
+        """
+        Test primary balances follow records in other currencies.
+        """
+        self.assertEqual(self.create_record("TWD", 90).status_code, 201)
+        response = self.create_record("USD", 10)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["exchange_rate"], 30)
+
+        self.owner_member.refresh_from_db()
+        self.binded_member.refresh_from_db()
+        self.assertEqual(self.owner_member.primary_balance, 390)
+        self.assertEqual(self.binded_member.primary_balance, -390)
+
+        response = self.client.get(
+            reverse("members", kwargs={"group_id": self.default_group.id})
+        )
+        self.assertEqual(
+            [item["primary_balance"] for item in response.json()], [390, -390, 0]
+        )
+
+        # Records in currencies without a stored rate need an explicit one.
+        response = self.create_record("EUR", 10)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.create_record("EUR", 10, exchange_rate=35)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.owner_member.refresh_from_db()
+        self.assertEqual(self.owner_member.primary_balance, 740)
+
+    def test_change_primary_currency(self):
+        """
+        Test changing the primary currency converts the primary balances.
+        """
+        self.create_record("TWD", 300)
+        self.create_record("USD", 10)
+
+        response = self.client.patch(
+            reverse("group-detail", kwargs={"pk": self.default_group.id}),
+            data={"primary_currency": "USD"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.owner_member.refresh_from_db()
+        self.assertEqual(self.owner_member.primary_balance, 20)
+        self.assertEqual(
+            Record.objects.get(currency="TWD", what="Record").exchange_rate, 1 / 30
+        )
+
+    def test_change_primary_currency_archived(self):
+        """
+        Test changing the primary currency converts the archived records too.
+        """
+        self.create_record("TWD", 300)
+        archive_group_history(self.default_group, timezone.now())
+
+        response = self.client.patch(
+            reverse("group-detail", kwargs={"pk": self.default_group.id}),
+            data={"primary_currency": "USD"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.owner_member.refresh_from_db()
+        self.binded_member.refresh_from_db()
+        self.assertEqual(self.owner_member.primary_balance_minor, 1000)
+        self.assertEqual(self.binded_member.primary_balance_minor, -1000)
+        self.assertEqual(ArchivedRecord.objects.get().exchange_rate, 1 / 30)
+        self.assertEqual(check_group(self.default_group.id), [])
+
+
+class FeedTests(BaseTestCase):
+    """
+    Test case class for the cross-group activity feed.
+    """
+
+    def create_record(self, group, what, from_member, to_member):
+        """
+        Create a record of 100 between two members.
+
+        Args:
+            group (Group): The group of the record.
+            what (str): The name of the record.
+            from_member (Member): The paying member.
+            to_member (Member): The member paid for.
+        """
+        response = self.client.post(
+            reverse("record-list", kwargs={"group_id": group.id}),
+            data={
+                "group_id": group.id,
+                "what": what,
+                "amount": 100,
+                "type": "expense",
+                "from_members": [{"amount": 100, "member_id": from_member.id}],
+                "to_members": [{"amount": -100, "member_id": to_member.id}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_feed(self):
+        """
+        Test the feed lists records of the user's members across groups, newest
+        first, page by page.
+        """
+        other_group = Group.objects.create(
+            owner=self.user1, name="Group2", public_permission="limited"
+        )
+        other_member = Member.objects.create(
+            user=self.user, group=other_group, name="Aaron", permission="edit"
+        )
+        self.create_record(
+            self.default_group, "First", self.owner_member, self.binded_member
+        )
+        self.create_record(
+            self.default_group,
+            "Not involved",
+            self.binded_member,
+            self.non_binded_member,
+        )
+        self.create_record(
+            self.default_group, "Second", self.binded_member, self.owner_member
+        )
+        self.create_record(other_group, "Third", other_member, other_member)
+
+        response = self.client.get(reverse("feed"), {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(
+            [item["what"] for item in data["results"]], ["Third", "Second"]
+        )
+        try:
+            for item in data["results"]:
+                RecordDataModel(**item)
+        except ValidationError as e:
+            self.fail(incorrect_format_message(e))
+
+        response = self.client.get(data["next"])
+        data = response.json()
+        self.assertEqual([item["what"] for item in data["results"]], ["First"])
+        self.assertIsNone(data["next"])
+
+        # Binding a member moves its records to the new user's feed.
+        self.non_binded_member.user = self.user
+        self.non_binded_member.save()
+        rebind_feed_items([self.non_binded_member])
+        response = self.client.get(reverse("feed"))
+        self.assertEqual(len(response.json()["results"]), 4)
+
+
+@override_settings(
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {
+            "record_write_user": "2/min",
+            "record_write_group": "3/min",
+        },
+    }
+)
+class RecordThrottleTests(BaseTestCase):
+    """
+    Test case class for record write throttling.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.record_data = {
+            "group_id": self.default_group.id,
+            "what": "Throttled record",
+            "amount": 100,
+            "type": "expense",
+            "currency": "TWD",
+            "exchange_rate": 1,
+            "note": "",
+            "is_equal_split": True,
+            "from_members": [{"amount": 100, "member_id": self.owner_member.id}],
+            "to_members": [{"amount": -100, "member_id": self.owner_member.id}],
+        }
+        self.url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+
+    def test_user_throttle(self):
+        """
+        Test a user is throttled after using up the bucket, without extra queries.
+        """
+        for _ in range(2):
+            response = self.client.post(self.url, data=self.record_data)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Only the session authentication queries run for a throttled request.
+        with self.assertNumQueries(2):
+            response = self.client.post(self.url, data=self.record_data)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response.headers)
+
+        # Reads are never throttled.
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_group_throttle(self):
+        """
+        Test a group is throttled across users after using up the bucket.
+        """
+        for _ in range(2):
+            response = self.client.post(self.url, data=self.record_data)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.login(username="user1", password="user1")
+        response = self.client.post(self.url, data=self.record_data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(self.url, data=self.record_data)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTests(BaseTransactionTestCase):
+    """
+    Test case class for routing reads to read replicas.
+
+    Reads inside a transaction always go to the primary, so these tests don't
+    run inside one.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        router = PrimaryReplicaRouter()
+        self.middleware = replica_routing_middleware(
+            lambda request: HttpResponse(router.db_for_read(Record))
+        )
+
+    def get_read_database(self, method, user=None, token=None):
+        """
+        Get the database the request's reads are routed to.
+
+        Args:
+            method (str): The HTTP method of the request.
+            user (User): The user logged in through the session.
+            token (AccessToken): The JWT access token of the request.
+
+        Returns:
+            str: The alias of the database used for reads.
+        """
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        request = RequestFactory().generic(method, "/", **headers)
+        request.session = {SESSION_KEY: str(user.id)} if user else {}
+        return self.middleware(request).content.decode()
+
+    def test_read_your_writes(self):
+        """
+        Test reads go to the replica unless the user wrote recently.
+        """
+        self.assertEqual(self.get_read_database("GET", self.user), "replica")
+        self.assertEqual(self.get_read_database("POST", self.user), "default")
+
+        # The writer sticks to the primary, while other users keep using the replica.
+        self.assertEqual(self.get_read_database("GET", self.user), "default")
+        self.assertEqual(self.get_read_database("GET", self.user1), "replica")
+
+        cache.clear()
+        self.assertEqual(self.get_read_database("GET", self.user), "replica")
+
+    def test_read_your_writes_with_jwt(self):
+        """
+        Test users authenticated with a JWT stick to the primary after writing.
+        """
+        token = AccessToken.for_user(self.user1)
+        self.assertEqual(self.get_read_database("GET", token=token), "replica")
+        self.assertEqual(self.get_read_database("PATCH", token=token), "default")
+        self.assertEqual(self.get_read_database("GET", token=token), "default")
+
+    def test_malformed_authorization_header(self):
+        """
+        Test requests with a malformed Authorization header read from the replica
+        and are left to DRF's authentication to reject.
+        """
+        self.assertEqual(self.get_read_database("GET", token="a b"), "replica")
+        self.assertEqual(self.get_read_database("GET", token="invalid"), "replica")
+
+    def test_atomic_block_reads_primary(self):
+        """
+        Test reads inside a transaction go to the primary.
+        """
+        with transaction.atomic():
+            self.assertEqual(self.get_read_database("GET", self.user), "default")
+
+
+class FakeConnection:
+    """
+    Stand-in for a MySQL connection, counting the calls made by the pool.
+    """
+
+    def __init__(self):
+        self.healthy = True
+        self.closed = False
+        self.rollbacks = 0
+        self.server_status = 0
+
+    def ping(self, reconnect=False):
+        if not self.healthy:
+            raise OperationalError("Lost connection.")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.server_status = 0
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """
+    Test case class for the pool of the pooled MySQL backend, with fake connections.
+    """
+
+    def create_pool(self, **options):
+        """
+        Create a pool opening fake connections.
+
+        Args:
+            **options: Other ConnectionPool keyword arguments.
+
+        Returns:
+            ConnectionPool: The pool.
+        """
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        return ConnectionPool(
+            connect=connect,
+            health_check=lambda connection: connection.ping(reconnect=False),
+            **{"max_size": 2, "timeout": 0.01, **options},
+        )
+
+    def test_reuse(self):
+        """
+        Test released connections are reused, the most recently released first.
+        """
+        pool = self.create_pool()
+        first, is_new = pool.acquire()
+        self.assertTrue(is_new)
+        second, _ = pool.acquire()
+        pool.release(first)
+        pool.release(second)
+
+        self.assertEqual(pool.acquire(), (second, False))
+        self.assertEqual(pool.acquire(), (first, False))
+        self.assertEqual(len(self.opened), 2)
+
+    def test_recycle(self):
+        """
+        Test stale and broken connections are closed and replaced.
+        """
+        pool = self.create_pool(recycle=60)
+        with mock.patch(
+            "common.db_backends.mysql_pool.pool.time.monotonic", return_value=0
+        ) as monotonic:
+            connection, _ = pool.acquire()
+            pool.release(connection)
+            monotonic.return_value = 61
+            new_connection, is_new = pool.acquire()
+        self.assertTrue(is_new)
+        self.assertIsNot(new_connection, connection)
+        self.assertTrue(connection.closed)
+
+        new_connection.healthy = False
+        pool.release(new_connection)
+        connection, is_new = pool.acquire()
+        self.assertTrue(is_new)
+        self.assertTrue(new_connection.closed)
+
+        # Unusable connections are closed instead of kept.
+        pool.release(connection, reusable=False)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.acquire(), (self.opened[-1], True))
+
+    def test_size_limit(self):
+        """
+        Test callers wait for a free connection up to the timeout.
+        """
+        pool = self.create_pool(max_size=1)
+        connection, _ = pool.acquire()
+        with self.assertRaises(OperationalError):
+            pool.acquire()
+
+        pool.release(connection)
+        self.assertEqual(pool.acquire(), (connection, False))
+        pool.release(connection)
+
+        # A failed connect frees its slot.
+        pool.close_idle()
+        self.assertTrue(connection.closed)
+        with mock.patch.object(pool, "connect", side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                pool.acquire()
+        self.assertEqual(pool.acquire(), (self.opened[-1], True))
+
+    def test_rollback_on_release(self):
+        """
+        Test connections released inside a transaction are rolled back before
+        they are reused, and closed if the rollback fails.
+        """
+        pool = self.create_pool()
+        wrapper = DatabaseWrapper(
+            {
+                **connections["default"].settings_dict,
+                "ENGINE": "common.db_backends.mysql_pool",
+            },
+            "pooled",
+        )
+        wrapper.pool = pool
+
+        connection, _ = pool.acquire()
+        connection.server_status = SERVER_STATUS.SERVER_STATUS_IN_TRANS
+        wrapper.connection = connection
+        wrapper._close()
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertEqual(pool.acquire(), (connection, False))
+
+        connection.server_status = SERVER_STATUS.SERVER_STATUS_IN_TRANS
+        connection.rollback = mock.Mock(side_effect=OperationalError)
+        wrapper._close()
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.acquire(), (self.opened[-1], True))
+
+
+class AsyncEndpointTests(BaseTransactionTestCase):
+    """
+    Test case class for the asynchronous read endpoints.
+
+    The async views query the database from a thread pool, which only sees
+    committed data, so these tests don't run inside a transaction.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.record_data = {
+            "group_id": self.default_group.id,
+            "what": "Record",
+            "amount": 600,
+            "type": "expense",
+            "currency": "TWD",
+            "exchange_rate": 1,
+            "note": "",
+            "is_equal_split": True,
+            "from_members": [
+                {"amount": 600, "member_id": self.owner_member.id},
+            ],
+            "to_members": [
+                {"amount": -300, "member_id": self.owner_member.id},
+                {"amount": -300, "member_id": self.binded_member.id},
+            ],
+        }
+        response = self.client.post(
+            reverse("record-list", kwargs={"group_id": self.default_group.id}),
+            data=self.record_data,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_same_response_as_sync_endpoints(self):
+        """
+        Test the async endpoints return the same bytes as the sync endpoints.
+        """
+        group_kwargs = {"group_id": self.default_group.id}
+        for sync_url, async_url in (
+            (reverse("group-list"), reverse("async_group_list")),
+            (
+                reverse("members", kwargs=group_kwargs),
+                reverse("async_members", kwargs=group_kwargs),
+            ),
+            (
+                reverse("record-list", kwargs=group_kwargs),
+                reverse("async_record_list", kwargs=group_kwargs),
+            ),
+        ):
+            sync_response = self.client.get(sync_url)
+            async_response = self.client.get(async_url)
+            self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+            self.assertEqual(async_response.content, sync_response.content)
+
+    def test_list_balances(self):
+        """
+        Test listing balances, which are cached until the group changes.
+        """
+        url = reverse("async_balances", kwargs={"group_id": self.default_group.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        members = self.client.get(
+            reverse("members", kwargs={"group_id": self.default_group.id})
+        ).json()
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    "member_id": member["id"],
+                    "balance": balance["balance"],
+                    "currency": balance["currency"],
+                }
+                for member in members
+                for balance in member["balances"]
+            ],
+        )
+
+        # Creating a record bumps the group version, so the cache isn't used.
+        self.client.post(
+            reverse("record-list", kwargs={"group_id": self.default_group.id}),
+            data=self.record_data,
+        )
+        balances = {
+            item["member_id"]: item["balance"] for item in self.client.get(url).json()
+        }
+        self.assertEqual(balances[str(self.owner_member.id)], 600)
+        self.assertEqual(balances[str(self.binded_member.id)], -600)
+
+    def test_unauthorized_access(self):
+        """
+        Test the async endpoints reject anonymous users and outsiders.
+        """
+        url = reverse("async_record_list", kwargs={"group_id": self.default_group.id})
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.create_user(username="outsider", password="outsider")
+        self.client.login(username="outsider", password="outsider")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(CHANGE_STREAM_BROKER="memory")
+class ChangeStreamTests(BaseTransactionTestCase):
+    """
+    Test case class for the group change stream.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.application = ChangeStreamApplication(None)
+        self.path = f"/async/group/{self.default_group.id}/changes"
+
+    def get_communicator(self, query_string=b"", session=True):
+        """
+        Open a connection to the change stream.
+
+        Args:
+            query_string (bytes): The query string of the request.
+            session (bool): Whether to send the session cookie of the client.
+
+        Returns:
+            ApplicationCommunicator: The communicator of the connection.
+        """
+        headers = []
+        if session:
+            cookie = f"sessionid={self.client.cookies['sessionid'].value}"
+            headers.append((b"cookie", cookie.encode()))
+        communicator = ApplicationCommunicator(
+            self.application,
+            {
+                "type": "http",
+                "method": "GET",
+                "path": self.path,
+                "query_string": query_string,
+                "headers": headers,
+            },
+        )
+        return communicator
+
+    async def test_stream_record_changes(self):
+        """
+        Test subscribers get pushed the changes of their group.
+        """
+        communicator = self.get_communicator()
+        await communicator.send_input({"type": "http.request"})
+        response_start = await communicator.receive_output(timeout=5)
+        self.assertEqual(response_start["status"], status.HTTP_200_OK)
+        self.assertIn(
+            (b"content-type", b"text/event-stream"), response_start["headers"]
+        )
+        body = (await communicator.receive_output(timeout=5))["body"]
+        self.assertEqual(body, b'id: 0\nevent: version\ndata: {"version": 0}\n\n')
+
+        response = await sync_to_async(self.client.delete)(
+            reverse(
+                "record-detail",
+                kwargs={
+                    "group_id": self.default_group.id,
+                    "pk": await self.create_record(),
+                },
+            )
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        events = [
+            (await communicator.receive_output(timeout=5))["body"] for _ in range(2)
+        ]
+        self.assertTrue(events[0].startswith(b"id: 1\nevent: record.created\n"))
+        self.assertTrue(events[1].startswith(b"id: 2\nevent: record.deleted\n"))
+
+        await communicator.send_input({"type": "http.disconnect"})
+        await communicator.wait(timeout=5)
+
+    async def test_stream_with_token(self):
+        """
+        Test the stream accepts a JWT in the query string, as EventSource can't
+        send headers.
+        """
+        token = AccessToken.for_user(self.user1)
+        communicator = self.get_communicator(f"token={token}".encode(), False)
+        await communicator.send_input({"type": "http.request"})
+        response_start = await communicator.receive_output(timeout=5)
+        self.assertEqual(response_start["status"], status.HTTP_200_OK)
+        await communicator.send_input({"type": "http.disconnect"})
+        await communicator.wait(timeout=5)
+
+    async def test_unauthorized_access(self):
+        """
+        Test the stream rejects anonymous users.
+        """
+        communicator = self.get_communicator(session=False)
+        await communicator.send_input({"type": "http.request"})
+        response_start = await communicator.receive_output(timeout=5)
+        self.assertEqual(response_start["status"], status.HTTP_401_UNAUTHORIZED)
+        await communicator.wait(timeout=5)
+
+    async def test_version_bump_failure(self):
+        """
+        Test committed changes succeed when the group version can't be bumped.
+        """
+        with mock.patch(
+            "account.change_stream.bump_group_version",
+            side_effect=redis.ConnectionError,
+        ):
+            await self.create_record()
+        self.assertEqual(await sync_to_async(Record.objects.count)(), 1)
+
+    async def create_record(self):
+        """
+        Create a record through the API.
+
+        Returns:
+            str: The ID of the created record.
+        """
+        response = await sync_to_async(self.client.post)(
+            reverse("record-list", kwargs={"group_id": self.default_group.id}),
+            data={
+                "group_id": self.default_group.id,
+                "what": "Record",
+                "amount": 600,
+                "type": "expense",
+                "currency": "TWD",
+                "exchange_rate": 1,
+                "note": "",
+                "is_equal_split": True,
+                "from_members": [
+                    {"amount": 600, "member_id": self.owner_member.id},
+                ],
+                "to_members": [
+                    {"amount": -600, "member_id": self.binded_member.id},
+                ],
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()["id"]
+
+
+class RequestProfilingTests(BaseTestCase):
+    """
+    Test case class for the request profiling middleware.
+    """
+
+    def test_server_timing(self):
+        """
+        Test profiled requests report their timings and dump slow profiles.
+        """
+        Record.objects.create(
+            group=self.default_group, what="Record", amount=100, type="expense"
+        )
+        url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+        response = self.client.get(url)
+        self.assertNotIn("Server-Timing", response)
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            REQUEST_PROFILING=True,
+            REQUEST_PROFILING_SAMPLE_RATE=1,
+            REQUEST_PROFILING_SLOW_MS=0,
+            REQUEST_PROFILING_DIR=directory,
+            FAST_READ_PATH=False,
+        ):
+            self.client = self.client_class()
+            self.client.login(**self.user_data)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            metrics = {
+                metric.split(";")[0]: metric
+                for metric in response["Server-Timing"].split(", ")
+            }
+            for name in ("db", "serialize", "render", "view", "total"):
+                self.assertIn(name, metrics)
+            self.assertRegex(metrics["db"], r'^db;dur=[\d.]+;desc="\d+ calls"$')
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+
+class MetricsTests(BaseTestCase):
+    """
+    Test case class for the metrics endpoint.
+    """
+
+    def test_metrics(self):
+        """
+        Test requests are counted and the values of all processes add up.
+        """
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            METRICS_DIR=directory
+        ):
+            url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+            # Another worker process counted a request too.
+            labels = {"view": "record-list", "method": "GET", "status": "200"}
+            MmapedValues(os.path.join(directory, "1.db")).add(
+                json.dumps(
+                    [REQUESTS_TOTAL.name, REQUESTS_TOTAL.name, labels], sort_keys=True
+                ),
+                1,
+            )
+
+            response = self.client.get(reverse("metrics"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response["Content-Type"].startswith("text/plain"))
+            lines = response.content.decode().splitlines()
+            self.assertIn(
+                "easysplit_http_requests_total"
+                '{method="GET",status="200",view="record-list"} 3',
+                lines,
+            )
+            self.assertIn(
+                "easysplit_http_request_duration_seconds_bucket"
+                '{method="GET",view="record-list",le="+Inf"} 2',
+                lines,
+            )
+            self.assertIn(
+                "easysplit_http_request_duration_seconds_count"
+                '{method="GET",view="record-list"} 2',
+                lines,
+            )
+            self.assertIn("# TYPE easysplit_db_query_duration_seconds histogram", lines)
+            self.assertTrue(
+                any(
+                    line.startswith("easysplit_http_request_queries_bucket")
+                    for line in lines
+                )
+            )
+
+            with override_settings(METRICS_ENABLED=False):
+                response = self.client.get(reverse("metrics"))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class QueryLogTests(BaseTestCase):
+    """
+    Test case class for the slow query and N+1 query log.
+    """
+
+    def test_query_shape(self):
+        """
+        Test queries differing only in their parameters have the same shape.
+        """
+        self.assertEqual(
+            get_query_shape(
+                "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'a' LIMIT 21"
+            ),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?",
+        )
+        self.assertEqual(
+            get_query_shape("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)"),
+            get_query_shape("INSERT INTO t (a, b) VALUES (%s, %s)"),
+        )
+
+    def test_n_plus_one(self):
+        """
+        Test strict mode fails requests repeating queries from a new call site,
+        and slow queries are logged with their call site.
+        """
+        member_ids = [
+            self.owner_member.id,
+            self.binded_member.id,
+            self.non_binded_member.id,
+        ]
+
+        def view(request):
+            for member_id in member_ids:
+                Member.objects.get(id=member_id)
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(view)
+        with self.assertRaisesMessage(NPlusOneError, "record/tests.py"):
+            middleware(RequestFactory().get("/"))
+
+        messages = []
+        handler_id = logger.add(messages.append, format="{message} {extra[stack]}")
+        try:
+            with override_settings(
+                QUERY_LOG_ALLOWED_REPEATS=["record/tests.py:view"],
+                QUERY_LOG_SLOW_MS=0,
+            ):
+                response = middleware(RequestFactory().get("/"))
+        finally:
+            logger.remove(handler_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(any(message.startswith("Slow query") for message in messages))
+        self.assertTrue(any(message.startswith("N+1 query") for message in messages))
+        self.assertTrue(all("in view" in message for message in messages))
+
+
+class TracingTests(BaseTestCase):
+    """
+    Test case class for request tracing.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_trace_record_create(self):
+        """
+        Test the spans of creating and listing records are nested and exported
+        as OTLP JSON lines.
+        """
+        url = reverse("record-list", kwargs={"group_id": self.default_group.id})
+        data = {
+            "group_id": self.default_group.id,
+            "what": "Record",
+            "amount": 100,
+            "type": "expense",
+            "from_members": [{"amount": 100, "member_id": self.owner_member.id}],
+            "to_members": [{"amount": -100, "member_id": self.binded_member.id}],
+        }
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            TRACING_SAMPLE_RATE=1,
+            TRACING_FILE=os.path.join(directory, "traces.jsonl"),
+            FAST_READ_PATH=False,
+        ):
+            self.client = self.client_class()
+            self.client.login(**self.user_data)
+            for _ in range(2):
+                response = self.client.post(url, data, format="json")
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+            with open(settings.TRACING_FILE) as file:
+                traces = [json.loads(line) for line in file]
+
+        self.assertEqual(len(traces), 3)
+        spans = traces[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        by_id = {span["spanId"]: span for span in spans}
+        parents = {
+            span["name"]: by_id[span["parentSpanId"]]["name"]
+            for span in spans
+            if "parentSpanId" in span
+        }
+        self.assertEqual(spans[0]["name"], "POST /group/<uuid:group_id>/record")
+        self.assertEqual(parents["RecordViewSet"], spans[0]["name"])
+        self.assertEqual(parents["auth"], "RecordViewSet")
+        self.assertEqual(parents["permission"], "RecordViewSet")
+        self.assertEqual(parents["RecordSerializer.validate"], "RecordViewSet")
+        self.assertEqual(parents["balance_recompute"], "RecordSerializer.create")
+        self.assertEqual(parents["render"], spans[0]["name"])
+        self.assertIn("db UPDATE", parents)
+        self.assertEqual({span["traceId"] for span in spans}, {spans[0]["traceId"]})
+
+        spans = traces[2]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        serialize = next(span for span in spans if span["name"] == "serialize")
+        self.assertIn(
+            {"key": "easysplit.calls", "value": {"intValue": "2"}},
+            serialize["attributes"],
+        )
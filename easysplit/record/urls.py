@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
-from record import views
+from record import async_views, views
 
 router = SimpleRouter(trailing_slash=False)
 router.register("record", views.RecordViewSet, basename="record")
@@ -9,4 +9,30 @@ router.register("record", views.RecordViewSet, basename="record")
 
 urlpatterns = [
     path("group/<uuid:group_id>/", include(router.urls)),
+    path(
+        "group/<uuid:group_id>/split-preview",
+        views.SplitPreviewView.as_view(),
+        name="split_preview",
+    ),
+    path("feed", views.FeedView.as_view(), name="feed"),
+    path(
+        "group/<uuid:group_id>/historical-balances",
+        views.HistoricalBalanceView.as_view(),
+        name="historical_balances",
+    ),
+    path(
+        "group/<uuid:group_id>/archive",
+        views.ArchiveView.as_view(),
+        name="archive",
+    ),
+    path(
+        "async/group/<uuid:group_id>/record",
+        async_views.record_list,
+        name="async_record_list",
+    ),
+    path(
+        "async/group/<uuid:group_id>/balances",
+        async_views.balance_list,
+        name="async_balances",
+    ),
 ]
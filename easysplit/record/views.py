@@ -1,30 +1,414 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.generics import ListAPIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
-from record.models import Record
-from record.serializers import RecordSerializer
+from account.models import Group, Member
+from common.renderers import ORJSONRenderer
+from common.tracing import TracedViewMixin, traced
+from record.checkpoints import get_balances_at
+from record.fast_read import get_records_data
+from record.models import ArchivedFrom, ArchivedRecord, ArchivedTo, FeedItem, Record
+from record.serializers import RecordSerializer, SplitPreviewSerializer
+from record.splits import get_split_amounts, normalize_exact_amounts
 
 
-class RecordViewSet(ModelViewSet):
+def parse_point_in_time(value):
+    """
+    Parse a point in time from a query parameter.
+
+    Args:
+        value (str): A date, meaning the end of that day in the current time
+            zone, or an ISO 8601 datetime.
+
+    Returns:
+        datetime: The aware point in time, or None if the value is invalid.
+    """
+    try:
+        date = parse_date(value)
+        if date is not None:
+            at = datetime.datetime.combine(
+                date + datetime.timedelta(days=1), datetime.time.min
+            )
+        else:
+            at = parse_datetime(value)
+    except ValueError:
+        return None
+    if at is None:
+        return None
+    return at if timezone.is_aware(at) else timezone.make_aware(at)
+
+
+class RecordViewSet(TracedViewMixin, ModelViewSet):
     """
     API endpoint for managing records.
     """
 
-    queryset = Record.objects.all()
+    # Records of deleted groups are gone from the API, like their groups.
+    queryset = Record.objects.filter(group__deleted_at__isnull=True)
     serializer_class = RecordSerializer
     permission_classes = (IsAuthenticated,)
+    throttle_scope = "record_write"
 
+    @traced("queryset")
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = self.queryset.all()
         group_id = self.kwargs.get("group_id")
         if group_id:
-            queryset = Record.objects.filter(group_id=group_id)
-        return queryset
+            queryset = queryset.filter(group_id=group_id)
+        return self.get_serializer_class().prune_queryset(queryset, self.request)
+
+    def list(self, request, *args, **kwargs):
+        """
+        List the records of a group.
+
+        Unless sparse fields are requested, the records are built from plain rows
+        and rendered with orjson, giving the same output as the serializer.
+        """
+        if not settings.FAST_READ_PATH or {"fields", "expand"} & set(
+            request.query_params
+        ):
+            return super().list(request, *args, **kwargs)
+
+        data, is_exact = get_records_data(
+            self.queryset.filter(group_id=self.kwargs["group_id"])
+        )
+        if is_exact:
+            request.accepted_renderer = ORJSONRenderer()
+        return Response(data)
 
     def perform_destroy(self, instance):
         serializer = self.get_serializer()
         serializer.delete(instance)
+
+
+class SplitPreviewView(TracedViewMixin, APIView):
+    """
+    API endpoint for previewing how an amount is split between members.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    @swagger_auto_schema(
+        request_body=SplitPreviewSerializer,
+        responses={
+            "200": openapi.Response(
+                description="",
+                examples={
+                    "application/json": {
+                        "amount": 100.0,
+                        "currency": "TWD",
+                        "split_rule": "equal",
+                        "to_members": [
+                            {
+                                "member_id": "579ca85c-dab2-44b3-a01b-eb49ef77a463",
+                                "amount": -33.34,
+                            },
+                            {
+                                "member_id": "0b5bbd4e-0c4e-4a8f-a1a4-5a0a8e3a9d7c",
+                                "amount": -33.33,
+                            },
+                            {
+                                "member_id": "aff6e4b8-ec21-4cc8-b7ed-c5e9ea12c76b",
+                                "amount": -33.33,
+                            },
+                        ],
+                    }
+                },
+            )
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        """
+        Split an amount the same way records are split, without saving anything.
+
+        The amount is split in minor units of the currency, with the remaining
+        units going to the largest remainders, so the shares always add up to the
+        amount. For exact splits the weights are the members' amounts, which are
+        rounded and corrected for rounding drift.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+            group_id (str): The ID of the group.
+
+        Returns:
+            Response: The HTTP response containing the split.
+                - amount (float): The split amount.
+                - currency (str): The currency of the amount.
+                - split_rule (str): The split rule.
+                - to_members (list): The To amount of each participant.
+
+        Raises:
+            BadRequest (HTTP_400_BAD_REQUEST): If the split is invalid or the
+                participants aren't members of the group.
+        """
+        serializer = SplitPreviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        participants = data["split_participants"]
+
+        member_ids = {item["member_id"] for item in participants}
+        if Member.objects.filter(
+            group_id=kwargs["group_id"], id__in=member_ids
+        ).count() != len(member_ids):
+            return Response(
+                {"detail": "Participants must be members of the group."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        currency = data["currency"]
+        if data["split_rule"] == Record.SPLIT_EXACT:
+            to_members = [
+                {"member_id": item["member_id"], "amount": -item["weight"]}
+                for item in participants
+            ]
+            normalize_exact_amounts(-data["amount"], currency, to_members)
+        else:
+            to_members = get_split_amounts(
+                data["amount"], currency, data["split_rule"], participants
+            )
+
+        return Response(
+            {
+                "amount": data["amount"],
+                "currency": currency,
+                "split_rule": data["split_rule"],
+                "to_members": to_members,
+            }
+        )
+
+
+class RecordCursorPagination(CursorPagination):
+    """
+    Cursor pagination of records, newest first.
+
+    Cursors keep pages stable while new records arrive and, unlike offsets, read
+    only one page of the index however deep the page is.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    ordering = ("-created_at", "-id")
+
+
+class FeedView(TracedViewMixin, ListAPIView):
+    """
+    API endpoint for listing the records involving the logged-in user across
+    all groups.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    pagination_class = RecordCursorPagination
+
+    @traced("queryset")
+    def get_queryset(self):
+        return FeedItem.objects.filter(user=self.request.user)
+
+    @swagger_auto_schema(
+        responses={
+            "200": openapi.Response(
+                description="",
+                examples={
+                    "application/json": {
+                        "next": "http://localhost:8000/feed?cursor=cD0yMDIz",
+                        "previous": None,
+                        "results": [
+                            {
+                                "id": "9c5cd1d4-5dbd-4b6e-9e0b-0c1bbd0de0f7",
+                                "group_id": "aff6e4b8-ec21-4cc8-b7ed-c5e9ea12c76b",
+                                "what": "Dinner",
+                                "amount": 600.0,
+                                "currency": "TWD",
+                            }
+                        ],
+                    }
+                },
+            )
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        List the records involving any member bound to the logged-in user, newest
+        first.
+
+        Args:
+            request (HttpRequest): The HTTP request object, with the cursor of the
+                page in the `cursor` query parameter.
+
+        Returns:
+            Response: The page of records, in the format of the record list, with
+                the URLs of the next and previous pages.
+        """
+        page = self.paginate_queryset(self.get_queryset())
+        record_ids = list(dict.fromkeys(item.record_id for item in page))
+        # Records of deleted groups are left out until they are purged.
+        records = Record.objects.filter(
+            id__in=record_ids, group__deleted_at__isnull=True
+        )
+
+        if settings.FAST_READ_PATH:
+            data, _ = get_records_data(records)
+        else:
+            data = RecordSerializer(records, many=True).data
+        records_by_id = {str(record["id"]): record for record in data}
+        return self.get_paginated_response(
+            [
+                records_by_id[str(record_id)]
+                for record_id in record_ids
+                if str(record_id) in records_by_id
+            ]
+        )
+
+
+class ArchiveView(TracedViewMixin, ListAPIView):
+    """
+    API endpoint for listing the archived records of a group.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    pagination_class = RecordCursorPagination
+
+    @traced("queryset")
+    def get_queryset(self):
+        return ArchivedRecord.objects.filter(group_id=self.kwargs["group_id"])
+
+    @swagger_auto_schema(
+        responses={
+            "200": openapi.Response(
+                description="",
+                examples={
+                    "application/json": {
+                        "next": "http://localhost:8000/group/aff6e4b8-ec21-4cc8-b7ed-c5e9ea12c76b/archive?cursor=cD0yMDIz",
+                        "previous": None,
+                        "results": [
+                            {
+                                "id": "9c5cd1d4-5dbd-4b6e-9e0b-0c1bbd0de0f7",
+                                "group_id": "aff6e4b8-ec21-4cc8-b7ed-c5e9ea12c76b",
+                                "what": "Dinner",
+                                "amount": 600.0,
+                                "currency": "TWD",
+                            }
+                        ],
+                    }
+                },
+            )
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        List the archived records of a group, newest first.
+
+        Args:
+            request (HttpRequest): The HTTP request object, with the cursor of the
+                page in the `cursor` query parameter.
+            group_id (str): The ID of the group.
+
+        Returns:
+            Response: The page of archived records, in the format of the record
+                list, with the URLs of the next and previous pages.
+
+        Raises:
+            NotFound (HTTP_404_NOT_FOUND): If the user can't access the group.
+        """
+        if not Group.objects.filter(
+            Q(members__user=request.user) | Q(owner=request.user),
+            id=kwargs["group_id"],
+        ).exists():
+            return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        page = self.paginate_queryset(self.get_queryset())
+        record_ids = [str(record.id) for record in page]
+        data, _ = get_records_data(
+            ArchivedRecord.objects.filter(id__in=record_ids),
+            (ArchivedFrom, ArchivedTo),
+        )
+        records_by_id = {record["id"]: record for record in data}
+        return self.get_paginated_response(
+            [records_by_id[record_id] for record_id in record_ids]
+        )
+
+
+class HistoricalBalanceView(TracedViewMixin, APIView):
+    """
+    API endpoint for retrieving the balances of a group at a point in time.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "at",
+                openapi.IN_QUERY,
+                description="A date, meaning its end, or an ISO 8601 datetime.",
+                type=openapi.TYPE_STRING,
+                required=True,
+            )
+        ],
+        responses={
+            "200": openapi.Response(
+                description="",
+                examples={
+                    "application/json": [
+                        {
+                            "member_id": "579ca85c-dab2-44b3-a01b-eb49ef77a463",
+                            "currency": "TWD",
+                            "balance": 300.0,
+                        }
+                    ]
+                },
+            )
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Get the balances of a group's members at a point in time.
+
+        The balances start from the latest checkpoint before the time, so only
+        the records since then are added up.
+
+        Args:
+            request (HttpRequest): The HTTP request object, with the point in time
+                in the `at` query parameter.
+            group_id (str): The ID of the group.
+
+        Returns:
+            Response: A JSON response containing the non-zero balances.
+                - member_id (str): The ID of the member.
+                - currency (str): The currency of the balance.
+                - balance (float): The balance at the time.
+
+        Raises:
+            BadRequest (HTTP_400_BAD_REQUEST): If the time is missing or invalid.
+            NotFound (HTTP_404_NOT_FOUND): If the user can't access the group.
+        """
+        group = (
+            Group.objects.filter(
+                Q(members__user=request.user) | Q(owner=request.user),
+                id=kwargs["group_id"],
+            )
+            .distinct()
+            .first()
+        )
+        if group is None:
+            return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        at = parse_point_in_time(request.query_params.get("at", ""))
+        if at is None:
+            return Response(
+                {"detail": "at must be a date or an ISO 8601 datetime"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(get_balances_at(group, at))